@@ -1,27 +1,38 @@
 import os
 import re
+import sys
+import argparse
 import json
-import requests
-import openai
+import functools
+import threading
+import time
 import pandas as pd
 import numpy as np
-from joblib import dump
-from dotenv import load_dotenv
-from shapely.geometry import Point, Polygon
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error
-
-# ────────────────────────── bootstrap & environment ──────────────────────────
-print("Current working directory:", os.getcwd())
-print("Loading .env file…")
-load_dotenv(override=True)
-print("Environment variables loaded")
+import shapely
+from shapely.geometry import Polygon
+
+import metrics
+from cache import SqliteCache
+from crash_ingest import (aggregate_cells, coarsen, finalize, merge_partials,
+                          COLUMNS as CRASH_COLUMNS)
+from directions_client import DirectionsClient, DIRECTIONS_URL
+from flat_forest import FlatForest
+from grid_model import GridLookupModel
+from hotspot_index import HotspotIndex, HotspotTracker
+from hotspot_store import build_hotspot_store, is_current, load_hotspot_store, polygons_from_arrays
+from llm_cache import LLMCache
+from model_store import ModelStore, file_digest, _atomic_write, _write_json
+from risk_cube import RiskCube, aggregate_cube_cells, hour_of_week
+from route_geometry import route_path, resample_path
+
+# Importing this module is side‑effect free: .env is read by the entry points
+# (app.py, main()), hotspots are parsed on first use, and sklearn / openai are
+# imported inside the functions that need them.
 
 # ──────────────────────────── 1. CRASH DATA → MODEL ─────────────────────────
 def load_crash_data(filename: str) -> pd.DataFrame:
-    data = pd.read_csv(filename, low_memory=False)
-    return data[['latitude', 'longitude', 'crash_sev_id']].dropna()
+    # parse only the three columns we keep; see crash_ingest for files too big for memory
+    return pd.read_csv(filename, usecols=CRASH_COLUMNS).dropna()
 
 
 def identify_crash_hotspots(data: pd.DataFrame, grid_size: float = 0.01) -> pd.DataFrame:
@@ -30,81 +41,408 @@ def identify_crash_hotspots(data: pd.DataFrame, grid_size: float = 0.01) -> pd.D
     return data.groupby(['lat_bin', 'lng_bin'])['crash_sev_id'].mean().reset_index()
 
 
-def export_hotspot_json(hotspot_df: pd.DataFrame,
-                        out_path: str = "static/hotspots.json") -> None:
+def export_hotspot_json(hotspot_df: pd.DataFrame, out_path: str = "static/hotspots.json", *,
+                        grid_size: float = 0.01) -> None:
     """
     Convert the hotspot grid → lightweight JSON:
       [{ "lat": 30.26, "lng": -97.74, "weight": 3.4 }, …]
     """
-    records = []
-    for _, row in hotspot_df.iterrows():
-        # centre each grid‑cell so points plot nicely
-        lat_c = float(row['lat_bin']) + 0.005
-        lng_c = float(row['lng_bin']) + 0.005
-        records.append({"lat": lat_c, "lng": lng_c, "weight": float(row['crash_sev_id'])})
-
+    # centre each grid‑cell so points plot nicely
+    records = pd.DataFrame({
+        'lat': hotspot_df['lat_bin'].to_numpy(dtype=float) + grid_size / 2,
+        'lng': hotspot_df['lng_bin'].to_numpy(dtype=float) + grid_size / 2,
+        'weight': hotspot_df['crash_sev_id'].to_numpy(dtype=float),
+    })
     try:
         os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        with open(out_path, "w") as f:
-            json.dump(records, f)
-        print(f"Hotspot JSON exported → {out_path}  ({len(records)} points)")
+        records.to_json(out_path, orient="records", double_precision=6)
+        print(f"Hotspot JSON exported → {out_path}  ({len(records)} points)", file=sys.stderr)
     except Exception as exc:
-        print("Failed to write hotspot JSON:", exc)
+        print("Failed to write hotspot JSON:", exc, file=sys.stderr)
+
+
+# ─── heat‑map pyramid: one file per grid size, picked by map zoom ───
+HEATMAP_DIR = "static/heatmap"
+HEATMAP_FACTORS = (1, 2, 4, 8, 16, 32)    # level grid = base grid_size × factor
+HEATMAP_CELL_PX = 4                      # a level is used once its cells are this wide on screen
+HEATMAP_FORMAT_VERSION = 1
+
+
+def heatmap_min_zoom(grid_size: float) -> int:
+    """Lowest Web‑Mercator zoom at which a `grid_size` cell spans HEATMAP_CELL_PX pixels."""
+    return max(0, int(np.ceil(np.log2(HEATMAP_CELL_PX * 360 / (256 * grid_size)))))
+
+
+def export_hotspot_pyramid(cells: pd.DataFrame, grid_size: float = 0.01,
+                           out_dir: str = HEATMAP_DIR, factors=HEATMAP_FACTORS) -> list[dict]:
+    """
+    Write the hotspot grid at several resolutions from one set of per‑cell
+    (sum, count) partials (crash_ingest.aggregate_cells):
+
+      <dir>/level<i>.bin   little‑endian float32 rows (lat, lng, weight), cell centres
+      <dir>/index.json     grid_size / min_zoom / cell count per level, finest first
+
+    Weights are the mean severity per cell, as in identify_crash_hotspots.
+    Returns the level list written to index.json.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    levels = []
+    for i, factor in enumerate(factors):
+        size = grid_size * factor
+        level = coarsen(cells, factor)
+        centre_lat = (level.index.get_level_values('k_lat').to_numpy(dtype=float) + 0.5) * size
+        centre_lng = (level.index.get_level_values('k_lng').to_numpy(dtype=float) + 0.5) * size
+        weight = level['sum'].to_numpy() / level['count'].to_numpy()
+        rows = np.column_stack([centre_lat, centre_lng, weight]).astype('<f4')
+        name = f"level{i}.bin"
+        _atomic_write(os.path.join(out_dir, name), lambda tmp, rows=rows: rows.tofile(tmp))
+        levels.append(dict(grid_size=round(size, 10), file=name, cells=len(rows),
+                           min_zoom=heatmap_min_zoom(size)))
+    # written last: a reader never sees a manifest pointing at missing levels
+    _write_json(os.path.join(out_dir, "index.json"),
+                dict(version=HEATMAP_FORMAT_VERSION, levels=levels))
+    print(f"Heat‑map pyramid exported → {out_dir}/  "
+          f"({', '.join(str(lv['cells']) for lv in levels)} cells)", file=sys.stderr)
+    return levels
 
 
-def train_model(hotspot_data: pd.DataFrame):
+MODEL_PARAMS = dict(n_estimators=100, random_state=42)
+
+
+def model_params(overrides: dict = None) -> dict:
+    """MODEL_PARAMS with `overrides` (max_depth, max_leaf_nodes, …) applied – what a model is keyed on."""
+    return dict(MODEL_PARAMS, **(overrides or {}))
+
+
+def model_params_from_env():
+    """SAFETY_MODEL_PARAMS: a JSON object of forest parameters (see tune-model), or None."""
+    raw = os.getenv("SAFETY_MODEL_PARAMS")
+    return json.loads(raw) if raw else None
+
+
+def split_cells(hotspot_data: pd.DataFrame):
+    """The fixed 80/20 train/test split of the hotspot cells: X_tr, X_te, y_tr, y_te."""
+    from sklearn.model_selection import train_test_split
+
     X = hotspot_data[['lat_bin', 'lng_bin']]
     y = hotspot_data['crash_sev_id']
-    X_tr, X_te, y_tr, y_te = train_test_split(X, y, test_size=0.2, random_state=42)
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+def fit_forest(hotspot_data: pd.DataFrame, params: dict = None, n_jobs: int = None):
+    """
+    Fit the forest on the training split using `n_jobs` cores (-1 = all).
+    Returns (model, test MSE, fit seconds).
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_squared_error
 
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    X_tr, X_te, y_tr, y_te = split_cells(hotspot_data)
+    model = RandomForestRegressor(**model_params(params), n_jobs=n_jobs)
+    t0 = time.perf_counter()
     model.fit(X_tr, y_tr)
+    fit_s = time.perf_counter() - t0
+    # served predictions are a route at a time: a thread pool per call costs more than it saves
+    model.n_jobs = None
+    return model, mean_squared_error(y_te, model.predict(X_te)), fit_s
+
+
+def train_model(hotspot_data: pd.DataFrame, out_path: str = 'trainedModel.joblib',
+                params: dict = None, n_jobs: int = None):
+    from joblib import dump
 
-    mse = mean_squared_error(y_te, model.predict(X_te))
-    print(f"Mean‑squared‑error on test data: {mse:.3f}")
+    model, mse, fit_s = fit_forest(hotspot_data, params, n_jobs)
+    print(f"Mean‑squared‑error on test data: {mse:.3f}  (fit {fit_s:.1f}s)", file=sys.stderr)
 
-    dump(model, 'trainedModel.joblib')
-    print("Model saved to trainedModel.joblib")
+    if out_path:
+        dump(model, out_path)
+        print(f"Model saved to {out_path}", file=sys.stderr)
     return model
 
+
+def compile_grid_model(model, hotspot_data: pd.DataFrame, grid_size: float = 0.01,
+                       out_path: str = "trainedModel.grid.npz") -> GridLookupModel:
+    """
+    Bake `model` into a raster over the hotspot grid for O(1) scoring.
+    The result is a drop‑in for `model` in calculate_safety_score(s); points
+    outside the raster still go to the forest.
+    """
+    grid = GridLookupModel.compile(model, hotspot_data, grid_size)
+    grid.save(out_path)
+    print(f"Grid model {grid.shape[0]}×{grid.shape[1]} saved to {out_path}", file=sys.stderr)
+    return grid
+
+
+def build_model_artifact(data_path: str = "data.csv", grid_size: float = 0.01,
+                         store_dir: str = "model_store", compile_grid: bool = False,
+                         chunk_rows: int = 500_000, workers: int = 1,
+                         time_cube: bool = False, params: dict = None, n_jobs: int = -1,
+                         flat: bool = False) -> str:
+    """
+    Train on `data_path` (CSV or Parquet, streamed in `chunk_rows` chunks on
+    `workers` processes) and write the artifact(s) to the model store. With
+    `time_cube` the (cell × hour of week) RiskCube is built too, which needs
+    the crash timestamp column; with `flat` the FlatForest export. `params`
+    override MODEL_PARAMS; the forest is fitted on `n_jobs` cores. Returns
+    the key.
+    """
+    store = ModelStore(store_dir)
+    meta = store.key_meta(data_path, grid_size, model_params(params))
+    key = store.key(meta)
+
+    # the per‑cell sums are kept so later crash feeds can be folded in (apply_crash_feed)
+    cells = aggregate_cells(data_path, grid_size, chunk_rows=chunk_rows, workers=workers)
+    hotspot_df = finalize(cells, grid_size)
+    model = train_model(hotspot_df, out_path=None, params=params, n_jobs=n_jobs)
+    store.save_model(key, model, meta)
+    store.save_cells(key, cells)
+    if flat:
+        store.save_flat(key, FlatForest.from_forest(model))
+    if compile_grid:
+        store.save_grid(key, GridLookupModel.compile(model, hotspot_df, grid_size))
+    if time_cube:
+        store.save_cube(key, compile_risk_cube(model, data_path, grid_size, chunk_rows))
+    print(f"Model artifact {key} written to {store_dir}/", file=sys.stderr)
+    return key
+
+
+def compile_risk_cube(model, data_path: str, grid_size: float = 0.01, chunk_rows: int = 500_000,
+                      grid: GridLookupModel = None) -> RiskCube:
+    """
+    The RiskCube of `model` over the crash timestamps in `data_path`. With a
+    `grid` that crash feeds have refreshed, the cube's cells follow its values.
+    """
+    cube = RiskCube.compile(model, aggregate_cube_cells(data_path, grid_size, chunk_rows), grid_size)
+    if grid is not None:
+        rows, cols = np.indices(grid.shape)
+        cube = cube.with_cells(rows.ravel() + grid.lat_idx0, cols.ravel() + grid.lng_idx0,
+                               grid.values.ravel())
+    return cube
+
+
+def load_or_train_model(data_path: str = "data.csv", grid_size: float = 0.01,
+                        store_dir: str = "model_store", compile_grid: bool = False,
+                        time_cube: bool = False, params: dict = None, flat: bool = False):
+    """
+    Load the stored model matching this crash data + parameters (memory‑mapped
+    where joblib can), training and storing it only on a miss. `flat` serves
+    the forest as a FlatForest; with `compile_grid` the grid lookup is
+    returned, backed by the forest; with `time_cube` a RiskCube (predict_at)
+    in front of either.
+    """
+    store = ModelStore(store_dir)
+    key = model_key(data_path, grid_size, store_dir, params)
+
+    model = store.load_model(key)
+    if model is None or (compile_grid and not os.path.exists(store.grid_path(key))):
+        print(f"No model artifact for {key} – training …", file=sys.stderr)
+        build_model_artifact(data_path, grid_size, store_dir, compile_grid, time_cube=time_cube,
+                             params=params, flat=flat)
+        model = store.load_model(key)
+
+    if flat:
+        if not os.path.exists(store.flat_path(key)):      # artifact built without --flat
+            store.save_flat(key, FlatForest.from_forest(model))
+        model = FlatForest.load(store.flat_path(key))
+
+    # crash feeds applied since training live in the grid (and the cube)
+    forest, fed = model, _has_feeds(store, key)
+    if compile_grid or fed:
+        model = GridLookupModel.load(store.grid_path(key), fallback=model)
+    if time_cube:
+        if not os.path.exists(store.cube_path(key)):
+            # from the stored forest: retraining would reset the cells and drop the applied feeds
+            print(f"No risk cube for {key} – building …", file=sys.stderr)
+            store.save_cube(key, compile_risk_cube(forest, data_path, grid_size,
+                                                   grid=model if fed else None))
+        model = RiskCube.load(store.cube_path(key), fallback=model)
+    return model
+
+
+def model_key(data_path: str = "data.csv", grid_size: float = 0.01,
+              store_dir: str = "model_store", params: dict = None) -> str:
+    """Model‑store key of the artifact trained on `data_path` with `params`."""
+    store = ModelStore(store_dir)
+    return store.key(store.key_meta(data_path, grid_size, model_params(params)))
+
+
+def _has_feeds(store: ModelStore, key: str) -> bool:
+    return os.path.exists(store.grid_path(key)) and bool(store.load_cells(key)[1])
+
+
+def apply_crash_feed(feed_path: str, data_path: str = "data.csv", grid_size: float = 0.01,
+                     store_dir: str = "model_store", model=None, params: dict = None):
+    """
+    Fold a file of new crash records into the stored per‑cell aggregates and
+    refresh only the grid cells they touch, without retraining the forest.
+
+    Returns (refreshed GridLookupModel, number of cells updated); applying the
+    same feed twice is a no‑op. `model` is the currently served model, if
+    any – the store is only read when it isn't given; `params` those it was
+    trained with. A stored RiskCube has the same cells refreshed; when the
+    served model is one, the refreshed cube (in front of the grid) is returned.
+    """
+    store = ModelStore(store_dir)
+    key = model_key(data_path, grid_size, store_dir, params)
+    cells, feeds = store.load_cells(key)
+    if cells is None:                    # artifact predates stored aggregates (or is missing)
+        build_model_artifact(data_path, grid_size, store_dir, params=params)
+        cells, feeds = store.load_cells(key)
+
+    served_cube = isinstance(model, RiskCube)
+    cube, model = (model, model.fallback) if served_cube else (None, model)
+    if isinstance(model, GridLookupModel):
+        grid = model
+    elif os.path.exists(store.grid_path(key)):
+        grid = GridLookupModel.load(store.grid_path(key), fallback=store.load_model(key))
+    else:
+        grid = GridLookupModel.compile(model if model is not None else store.load_model(key),
+                                       finalize(cells, grid_size), grid_size)
+
+    if cube is None and os.path.exists(store.cube_path(key)):
+        cube = RiskCube.load(store.cube_path(key), fallback=grid)
+
+    digest = file_digest(feed_path)
+    if digest in feeds:
+        print(f"Crash feed {feed_path} already applied to {key}", file=sys.stderr)
+        return (cube if served_cube else grid), 0
+
+    new = aggregate_cells(feed_path, grid_size)
+    cells = merge_partials([cells, new])
+    touched = cells.loc[new.index]
+    k_lat = touched.index.get_level_values('k_lat')
+    k_lng = touched.index.get_level_values('k_lng')
+    grid = grid.with_cells(k_lat, k_lng, touched['sum'] / touched['count'])
+
+    # grid and cube first: if we die in between, the feed is simply applied again
+    store.save_grid(key, grid)
+    if cube is not None:
+        cube = cube.with_cells(k_lat, k_lng, (touched['sum'] / touched['count']).to_numpy(), fallback=grid)
+        store.save_cube(key, cube)
+    store.save_cells(key, cells, feeds + [digest])
+    print(f"Crash feed {feed_path}: {len(new)} cells refreshed in {key}", file=sys.stderr)
+    return (cube if served_cube else grid), len(new)
+
 # ─────────────────────── 2. GOOGLE ROUTES + SAFETY SCORE ─────────────────────
+_directions_client = None
+_directions_lock = threading.Lock()
+
+
+def get_directions_client() -> DirectionsClient:
+    """
+    Shared Directions client (pooled session + response cache), built on first use.
+    DIRECTIONS_URL overrides the endpoint; DIRECTIONS_CACHE=<file.sqlite> shares
+    the cache between worker processes; DIRECTIONS_CACHE_TTL is in seconds.
+    """
+    global _directions_client
+    if _directions_client is None:
+        with _directions_lock:
+            if _directions_client is None:
+                ttl = float(os.getenv("DIRECTIONS_CACHE_TTL", "300"))
+                cache_path = os.getenv("DIRECTIONS_CACHE")
+                _directions_client = DirectionsClient(
+                    base_url=os.getenv("DIRECTIONS_URL", DIRECTIONS_URL),
+                    cache=SqliteCache(cache_path, ttl=ttl) if cache_path else None,
+                    ttl=ttl,
+                )
+    return _directions_client
+
+
 def get_google_routes(api_key: str, origin: str, destination: str):
-    """Fetch driving routes (with alternatives) from Directions API."""
-    base = "https://maps.googleapis.com/maps/api/directions/json"
-    params = {
-        "origin": origin,
-        "destination": destination,
-        "mode": "driving",
-        "alternatives": "true",
-        "key": api_key
-    }
-    resp = requests.get(base, params=params)
-    try:
-        data = resp.json()
-    except ValueError:
-        print(f"Bad JSON (HTTP {resp.status_code}): {resp.text}")
-        return []
-
-    print("Google Maps API status:", data.get("status"), "| HTTP", resp.status_code)
-    if data.get("error_message"):
-        print("Google Maps error_message:", data["error_message"])
-
-    return data.get("routes", []) if resp.status_code == 200 and data.get("status") == "OK" else []
-
-
-def calculate_safety_score(route: dict, model) -> tuple[float, float]:
-    """Return (safety_score 1‑10, total_duration minutes)."""
-    scores, total_min = [], 0
-    for leg in route['legs']:
-        total_min += leg['duration']['value'] / 60
-        for step in leg['steps']:
-            lat, lng = step['end_location'].values()
-            df = pd.DataFrame([[lat, lng]], columns=['lat_bin', 'lng_bin'])
-            scores.append(model.predict(df)[0])
-    avg = np.mean(scores) if scores else 0
+    """Fetch driving routes (with alternatives) from Directions API."""
+    with metrics.span("google_routes"):
+        return get_directions_client().routes(api_key, origin, destination)
+
+
+async def get_google_routes_async(api_key: str, origin: str, destination: str):
+    """Async get_google_routes (same client cache) for the ASGI server."""
+    with metrics.span("google_routes"):
+        return await get_directions_client().routes_async(api_key, origin, destination)
+
+
+SCORING_MODES = ("steps", "polyline")
+
+
+def _route_samples(route: dict, mode: str, spacing_m: float):
+    """(lat/lng samples, weights or None) that a route is scored on."""
+    if mode == "steps":
+        coords = [(step['end_location']['lat'], step['end_location']['lng'])
+                  for leg in route['legs'] for step in leg['steps']]
+        return np.array(coords, dtype=float).reshape(-1, 2), None
+    if mode == "polyline":
+        # every `spacing_m` along the road, weighted by the length each sample covers
+        return resample_path(route_path(route), spacing_m)
+    raise ValueError(f"Unknown scoring mode {mode!r}; expected one of {SCORING_MODES}")
+
+
+def _score_from_predictions(preds, weights=None) -> float:
+    # NaN = no crash data there (outside every region): left out of the average
+    known = ~np.isnan(preds)
+    if len(preds) and not known.all():
+        preds = preds[known]
+        weights = None if weights is None else np.asarray(weights)[known]
+    avg = np.average(preds, weights=weights) if len(preds) else 0
     score = min(max(10 - avg, 1), 10)
-    score = float(f"{score:.3f}")  # ensure x.xxx format
-    return score, total_min
+    return float(f"{score:.3f}")  # ensure x.xxx format
+
+
+def _sample_etas(route: dict, mode: str, n: int, weights) -> np.ndarray:
+    """Seconds from departure until each sample is reached."""
+    if mode == "steps":
+        secs = [step.get('duration', {}).get('value', 0) for leg in route['legs'] for step in leg['steps']]
+        return np.cumsum(secs, dtype=float)[:n]
+    # polyline samples: spread the route's duration over the distance covered
+    total_s = sum(leg['duration']['value'] for leg in route['legs'])
+    w = np.asarray(weights, dtype=float)
+    return (np.cumsum(w) - w / 2) / max(w.sum(), 1e-9) * total_s
+
+
+def calculate_safety_scores(routes: list[dict], model, mode: str = "steps",
+                            spacing_m: float = 100.0, departure=None) -> list[tuple[float, float]]:
+    """
+    Score several routes with one model.predict over all of their samples.
+    Returns the same (safety_score 1‑10, total_duration minutes) tuple per
+    route as calculate_safety_score.
+
+    mode="steps"     – one sample per step end_location (original behaviour)
+    mode="polyline"  – the route polyline resampled every `spacing_m` metres,
+                       averaged by segment length
+
+    With a `departure` time and a model that has predict_at (RiskCube), each
+    sample is scored for the hour of the week the car should reach it.
+    """
+    with metrics.span("safety_score"):
+        return _safety_scores(routes, model, mode, spacing_m, departure)
+
+
+def _safety_scores(routes, model, mode, spacing_m, departure=None):
+    timed = departure is not None and hasattr(model, "predict_at")
+    samples, weights, durations, etas = [], [], [], []
+    for route in routes:
+        coords, w = _route_samples(route, mode, spacing_m)
+        samples.append(coords)
+        weights.append(w)
+        durations.append(sum(leg['duration']['value'] / 60 for leg in route['legs']))
+        if timed:
+            etas.append(_sample_etas(route, mode, len(coords), w))
+
+    coords = np.concatenate(samples) if samples else np.empty((0, 2))
+    if len(coords) and timed:
+        hours = hour_of_week(departure, np.concatenate(etas))
+        preds = np.asarray(model.predict_at(pd.DataFrame(coords, columns=['lat_bin', 'lng_bin']), hours))
+    elif len(coords):
+        preds = np.asarray(model.predict(pd.DataFrame(coords, columns=['lat_bin', 'lng_bin'])))
+    else:
+        preds = np.empty(0)
+    per_route = np.split(preds, np.cumsum([len(c) for c in samples])[:-1]) if routes else []
+    return [(_score_from_predictions(p, w), total_min)
+            for p, w, total_min in zip(per_route, weights, durations)]
+
+
+def calculate_safety_score(route: dict, model, mode: str = "steps",
+                           spacing_m: float = 100.0, departure=None) -> tuple[float, float]:
+    """Return (safety_score 1‑10, total_duration minutes)."""
+    return calculate_safety_scores([route], model, mode, spacing_m, departure)[0]
 
 # ─────────────── 3. HOTSPOT HELPERS & ENHANCED INSTRUCTIONS ────────────────
 def load_hotspot_polygons(geojson_path="output_files/high_crash_zones.geojson"):
@@ -116,13 +454,125 @@ def load_hotspot_polygons(geojson_path="output_files/high_crash_zones.geojson"):
             coords = feat["geometry"]["coordinates"][0]
             polygons.append(Polygon([(lng, lat) for lat, lng in coords]))
     except Exception as exc:
-        print("Error loading hotspot polygons:", exc)
+        print("Error loading hotspot polygons:", exc, file=sys.stderr)
     return polygons
 
 
-_HOTSPOT_POLYGONS = load_hotspot_polygons()
+HOTSPOT_GEOJSON = "output_files/high_crash_zones.geojson"
+# binary, memory‑mapped copy of the GeoJSON (see hotspot_store); rebuilt when stale
+HOTSPOT_STORE = "output_files/high_crash_zones.hotspots"
+
+_hotspot_index = None
+_hotspot_lock = threading.Lock()
+
+
+# several metros: a manifest of per‑region datasets, loaded on demand (see
+# regions.py). Read on first use, after the entry point has loaded .env.
+_region_set = None
+
+
+def regions_manifest():
+    """REGIONS_MANIFEST path, or None when serving one dataset."""
+    return os.getenv("REGIONS_MANIFEST") or None
+
+
+def get_region_set():
+    """The RegionSet of REGIONS_MANIFEST, or None when serving one dataset."""
+    global _region_set
+    if _region_set is None and regions_manifest():
+        with _hotspot_lock:
+            if _region_set is None:
+                from regions import RegionSet
+                _region_set = RegionSet.from_manifest(
+                    regions_manifest(), store_dir=os.getenv("MODEL_STORE", "model_store"),
+                    memory_budget_mb=float(os.getenv("REGION_MEMORY_MB", "1024")),
+                    compile_grid=os.getenv("SAFETY_MODEL_GRID", "0") == "1",
+                    time_cube=os.getenv("SAFETY_MODEL_TIME", "0") == "1",
+                    params=model_params_from_env(),
+                    flat=os.getenv("SAFETY_MODEL_FLAT", "0") == "1")
+    return _region_set
+
+
+def get_hotspot_index() -> HotspotIndex:
+    """Hotspot polygons + spatial index, loaded on first use (thread‑safe)."""
+    global _hotspot_index
+    if _hotspot_index is None:
+        regions = get_region_set()
+        with _hotspot_lock:
+            if _hotspot_index is None:
+                if regions is not None:
+                    from regions import ShardedHotspotIndex
+                    _hotspot_index = ShardedHotspotIndex(regions)
+                else:
+                    _hotspot_index = _load_hotspot_index()
+    return _hotspot_index
+
+
+def _load_hotspot_index(geojson_path: str = None, store_dir: str = None) -> HotspotIndex:
+    geojson_path = geojson_path or HOTSPOT_GEOJSON
+    store_dir = store_dir or HOTSPOT_STORE
+    try:
+        st = os.stat(geojson_path)
+        version = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+    except OSError:
+        version = "none"
+    # prefer the memory‑mapped binary store; fall back to parsing the GeoJSON
+    try:
+        if not is_current(geojson_path, store_dir):
+            build_hotspot_store(geojson_path, store_dir)
+        arrays = load_hotspot_store(store_dir)
+        return HotspotIndex(polygons_from_arrays(arrays), bboxes=arrays.bboxes, version=version)
+    except (OSError, ValueError, KeyError) as exc:
+        print("Hotspot store unavailable, parsing GeoJSON:", exc, file=sys.stderr)
+        return HotspotIndex(load_hotspot_polygons(geojson_path), version=version)
+
+
+def __getattr__(name):
+    # keep `Route_Safety._HOTSPOT_POLYGONS` working without loading at import
+    if name == "_HOTSPOT_POLYGONS":
+        return get_hotspot_index().polygons
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ─── viewport queries for the map (/hotspots) ───
+HOTSPOT_POLYGON_MIN_ZOOM = 10        # below this only zone centroids are sent
+HOTSPOT_VIEW_REGIONS = 4             # regions one viewport may load (most area in view first)
+
 
-# ─── export centroid + weight for front‑end heat‑map ───
+def hotspot_tolerance(zoom: int) -> float:
+    """Simplification tolerance ≈ one screen pixel at `zoom` (none when zoomed right in)."""
+    return 0.0 if zoom >= 16 else 360.0 / (256 * 2 ** zoom)
+
+
+def hotspot_features(bbox, zoom: int) -> str:
+    """
+    GeoJSON FeatureCollection (as a string) of the zones intersecting
+    bbox = (west, south, east, north). Polygons are simplified for `zoom`;
+    below HOTSPOT_POLYGON_MIN_ZOOM each zone is just its centroid. Every
+    feature carries its centroid as `lat`/`lng` for the heat‑map. With
+    regions, at most HOTSPOT_VIEW_REGIONS of them are read, hotspot index only.
+    """
+    features = ",".join(f for name, index in get_hotspot_index().shards(bbox, HOTSPOT_VIEW_REGIONS)
+                        for f in _zone_features(index, bbox, zoom, name))
+    return f'{{"type":"FeatureCollection","features":[{features}]}}'
+
+
+def _zone_features(index: HotspotIndex, bbox, zoom: int, region: str = "") -> list[str]:
+    ids = index.query_bbox(*bbox)
+    cents = index.centroids[ids]
+    if zoom < HOTSPOT_POLYGON_MIN_ZOOM:
+        geoms = shapely.points(cents)
+    else:
+        geoms = index.simplified(hotspot_tolerance(zoom))[ids]
+    # 6 decimals ≈ 0.1 m – plenty for drawing, and a much smaller payload
+    geoms = shapely.transform(geoms, lambda c: np.round(c, 6))
+    # feature ids stay unique across regions: "austin:12"; plain numbers for one dataset
+    fids = [f'"{region}:{i}"' for i in ids.tolist()] if region else ids.tolist()
+    return [
+        f'{{"type":"Feature","id":{fid},"properties":{{"lat":{lat:.6f},"lng":{lng:.6f}}},"geometry":{g}}}'
+        for fid, (lng, lat), g in zip(fids, cents, shapely.to_geojson(geoms))
+    ]
+
+# ─── export centroid + weight for front‑end heat‑map ───
 def _dump_hotspot_json(polys, out_path="static/hotspots.json"):
     centroids = []
     for poly in polys:
@@ -131,14 +581,96 @@ def _dump_hotspot_json(polys, out_path="static/hotspots.json"):
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     with open(out_path, "w") as f:
         json.dump(centroids, f)
-_dump_hotspot_json(_HOTSPOT_POLYGONS)
 
 
+def ensure_hotspot_json(out_path="static/hotspots.json") -> None:
+    """(Re)write the heat‑map JSON only when it is missing or older than the GeoJSON."""
+    if regions_manifest():
+        return                       # per‑region zones come from /hotspots instead
+    try:
+        if os.path.getmtime(out_path) >= os.path.getmtime(HOTSPOT_GEOJSON):
+            return
+    except OSError:
+        if not os.path.exists(HOTSPOT_GEOJSON):
+            return
+    _dump_hotspot_json(get_hotspot_index().polygons, out_path)
+
 
 def is_in_hotspot(lat: float, lng: float, buffer_m: int = 50) -> bool:
-    buf_deg = buffer_m / 111_320.0     # meters → degrees (approx.)
-    pt = Point(lng, lat)
-    return any(poly.buffer(buf_deg).contains(pt) for poly in _HOTSPOT_POLYGONS)
+    with metrics.span("hotspot_check"):
+        return get_hotspot_index().contains(lat, lng, buffer_m)
+
+
+def nearest_hotspot(lat: float, lng: float, max_distance_m: float = None):
+    """Return (polygon index, distance in metres) of the closest hotspot, or None."""
+    return get_hotspot_index().nearest(lat, lng, max_distance_m)
+
+
+def hotspot_mask(lats, lngs, buffer_m: int = 50) -> np.ndarray:
+    """Batch is_in_hotspot: boolean array for whole GPS sequences / polylines."""
+    with metrics.span("hotspot_check"):
+        return get_hotspot_index().mask(lats, lngs, buffer_m)
+
+
+def hotspot_distances(lats, lngs, max_distance_m: float = None) -> np.ndarray:
+    """Batch nearest_hotspot: metres to the closest zone for every point."""
+    return get_hotspot_index().distances(lats, lngs, max_distance_m)
+
+
+HOTSPOT_LOOKAHEAD_M = 300            # warn this far before a zone on the current heading
+
+
+def hotspot_tracker(lookahead_m: float = HOTSPOT_LOOKAHEAD_M, buffer_m: int = 50) -> HotspotTracker:
+    """Tracker for one GPS stream: in‑zone test + distance to the next zone ahead."""
+    return HotspotTracker(get_hotspot_index(), lookahead_m=lookahead_m, buffer_m=buffer_m)
+
+
+def track_hotspots(lats, lngs, lookahead_m: float = HOTSPOT_LOOKAHEAD_M):
+    """(in_hotspot, metres ahead or None) for each fix of one GPS sequence, in order."""
+    with metrics.span("hotspot_check"):
+        tracker = hotspot_tracker(lookahead_m)
+        return [tracker.update(lat, lng) for lat, lng in zip(lats, lngs)]
+
+
+# ─── LLM completion cache + prompt templates ───
+_llm_cache = None
+_llm_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """
+    Shared memoisation cache for LLM completions. LLM_CACHE=<file.sqlite>
+    adds a persistent tier; LLM_CACHE_SIZE bounds the in‑memory LRU.
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache(maxsize=int(os.getenv("LLM_CACHE_SIZE", "2048")),
+                                      persistent_path=os.getenv("LLM_CACHE"))
+    return _llm_cache
+
+
+@functools.lru_cache(maxsize=32)
+def _read_prompt(path: str, mtime_ns: int) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def load_prompt(path: str) -> str:
+    """Prompt file contents, cached until the file changes on disk."""
+    return _read_prompt(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_voice_prompt(template: str) -> tuple[str, str]:
+    sys_msg, usr_tmpl = template.split("### User Message")
+    return sys_msg.replace("### System Message", "").strip(), usr_tmpl.strip()
+
+
+def load_voice_prompt(path: str = "topic_prompts/voice_route_demo_prompt.txt") -> tuple[str, str]:
+    """(system message, user‑message template) of the voice prompt, parsed once."""
+    return _parse_voice_prompt(load_prompt(path))
 
 
 def _strip_html(instr: str) -> str:
@@ -155,12 +687,16 @@ def _pick(choices: list[str], seed: str) -> str:
     return choices[abs(hash(seed)) % len(choices)]
 
 
-def generate_enhanced_instruction(html_instruction: str, lat: float, lng: float,
-                                  model_name: str = "gpt-3.5-turbo") -> str:
-    """Return a concise, TTS‑friendly cue with contextual caution if in hotspot."""
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+_REPHRASE_PARAMS = dict(temperature=0.3, top_p=0.9, max_tokens=40)
+_VOICE_PARAMS    = dict(temperature=0, top_p=0.1, max_tokens=30)
 
-    alert = "High‑crash zone ahead. " if is_in_hotspot(lat, lng) else ""
+
+def _instruction_parts(html_instruction: str, lat: float, lng: float,
+                       in_hotspot: bool = None) -> tuple[str, str, str]:
+    """(alert, plain instruction, caution) – everything but the LLM rewrite."""
+    if in_hotspot is None:
+        in_hotspot = is_in_hotspot(lat, lng)
+    alert = "High‑crash zone ahead. " if in_hotspot else ""
     nav_plain = _strip_html(html_instruction)
 
     caution = ""
@@ -171,73 +707,126 @@ def generate_enhanced_instruction(html_instruction: str, lat: float, lng: float,
             caution = ", " + _pick(_RIGHT_CAUTIONS, nav_plain) + "."
         else:
             caution = ", " + _pick(_STRAIGHT_CAUTIONS, nav_plain) + "."
-    spoken = f"{alert}{nav_plain}{caution}"
+    return alert, nav_plain, caution
 
-    if len(spoken.split()) <= 28:
-        return spoken
 
-    # If too long, ask GPT to condense
+def _rephrase_messages(nav_plain: str) -> list[dict]:
     prompt = (
         "Rewrite the following driving instruction so it is under 20 words, "
         "clear and TTS‑friendly. Keep units.\n\n"
         f"Instruction: \"{nav_plain}\""
     )
+    return [{"role": "user", "content": prompt}]
+
+
+def generate_enhanced_instruction(html_instruction: str, lat: float, lng: float,
+                                  model_name: str = "gpt-3.5-turbo",
+                                  in_hotspot: bool = None) -> str:
+    """
+    Return a concise, TTS‑friendly cue with contextual caution if in hotspot.
+    Pass `in_hotspot` when it is already known (e.g. from hotspot_mask).
+    """
+    alert, nav_plain, caution = _instruction_parts(html_instruction, lat, lng, in_hotspot)
+    spoken = f"{alert}{nav_plain}{caution}"
+
+    if len(spoken.split()) <= 28:
+        return spoken
+
+    # If too long, ask GPT to condense
+    try:
+        short_nav = get_llm_cache().complete(model_name, _rephrase_messages(nav_plain),
+                                             **_REPHRASE_PARAMS)
+        return f"{alert}{short_nav}{caution}"
+    except Exception as exc:
+        print("LLM rephrase failed:", exc, file=sys.stderr)
+        return spoken
+
+
+async def generate_enhanced_instruction_async(html_instruction: str, lat: float, lng: float,
+                                              model_name: str = "gpt-3.5-turbo",
+                                              in_hotspot: bool = None) -> str:
+    """Async generate_enhanced_instruction for the ASGI server."""
+    alert, nav_plain, caution = _instruction_parts(html_instruction, lat, lng, in_hotspot)
+    spoken = f"{alert}{nav_plain}{caution}"
+
+    if len(spoken.split()) <= 28:
+        return spoken
+
     try:
-        resp = openai.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            top_p=0.9,
-            max_tokens=40
-        )
-        short_nav = resp.choices[0].message.content.strip()
+        short_nav = await get_llm_cache().complete_async(model_name, _rephrase_messages(nav_plain),
+                                                         **_REPHRASE_PARAMS)
         return f"{alert}{short_nav}{caution}"
     except Exception as exc:
-        print("LLM rephrase failed:", exc)
+        print("LLM rephrase failed:", exc, file=sys.stderr)
         return spoken
 
 # ────────────────── 4. CONTINUOUS GPS DEMO VOICE UPDATE ──────────────────
-def generate_voice_update(lat, lng, prev_lat, prev_lng,
-                          model_name="gpt-3.5-turbo"):
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+_HOTSPOT_VOICE_ALERT = "High‑crash zone ahead. Proceed with caution."
+_HOTSPOT_AHEAD_ALERT = "High‑crash zone in about {metres} metres. Prepare to slow down."
 
-    if is_in_hotspot(lat, lng):
-        return "High‑crash zone ahead. Proceed with caution."
 
-    with open("topic_prompts/voice_route_demo_prompt.txt") as f:
-        template = f.read()
-    sys_msg, usr_tmpl = template.split("### User Message")
-    usr_msg = usr_tmpl.strip().format(
+def _hotspot_alert(in_hotspot: bool, ahead_m: float = None):
+    if in_hotspot:
+        return _HOTSPOT_VOICE_ALERT
+    if ahead_m is not None:
+        return _HOTSPOT_AHEAD_ALERT.format(metres=max(10, int(round(ahead_m, -1))))
+    return None
+
+
+def _voice_messages(lat, lng, prev_lat, prev_lng) -> list[dict]:
+    sys_msg, usr_tmpl = load_voice_prompt()
+    usr_msg = usr_tmpl.format(
         latitude=lat, longitude=lng,
         prev_latitude=prev_lat, prev_longitude=prev_lng
     )
-    resp = openai.chat.completions.create(
-        model=model_name,
-        messages=[
-            {"role": "system", "content": sys_msg.replace("### System Message", "").strip()},
-            {"role": "user",   "content": usr_msg}
-        ],
-        temperature=0,
-        top_p=0.1,
-        max_tokens=30
-    )
-    return resp.choices[0].message.content.strip()
+    return [
+        {"role": "system", "content": sys_msg},
+        {"role": "user",   "content": usr_msg}
+    ]
 
-# ───────────────────────────── 5. CLI DEMO ─────────────────────────────
-def main():
+
+def generate_voice_update(lat, lng, prev_lat, prev_lng,
+                          model_name="gpt-3.5-turbo", in_hotspot=None, ahead_m=None):
+    """
+    Spoken update for one GPS fix. `ahead_m` (from a HotspotTracker) warns
+    about a zone on the current heading before the driver reaches it.
+    """
+    if in_hotspot is None:
+        in_hotspot = is_in_hotspot(lat, lng)
+    alert = _hotspot_alert(in_hotspot, ahead_m)
+    if alert:
+        return alert
+
+    return get_llm_cache().complete(model_name, _voice_messages(lat, lng, prev_lat, prev_lng),
+                                    **_VOICE_PARAMS)
+
+
+async def generate_voice_update_async(lat, lng, prev_lat, prev_lng,
+                                      model_name="gpt-3.5-turbo", in_hotspot=None, ahead_m=None):
+    """Async generate_voice_update for the ASGI server."""
+    if in_hotspot is None:
+        in_hotspot = is_in_hotspot(lat, lng)
+    alert = _hotspot_alert(in_hotspot, ahead_m)
+    if alert:
+        return alert
+
+    return await get_llm_cache().complete_async(model_name, _voice_messages(lat, lng, prev_lat, prev_lng),
+                                                **_VOICE_PARAMS)
+
+# ───────────────────────────── 5. CLI ─────────────────────────────
+def demo():
     api_key = os.getenv("GOOGLE_MAPS_API_KEY")
     if not api_key or api_key == "your_api_key_here":
         raise ValueError("GOOGLE_MAPS_API_KEY is missing or placeholder.")
 
-    data = load_crash_data("data.csv")
-    hotspot_df = identify_crash_hotspots(data)
-    model = train_model(hotspot_df)
+    cells = aggregate_cells("data.csv")
+    model = train_model(finalize(cells, 0.01))
 
     # export hotspots for front‑end heat‑map
-    export_hotspot_json(hotspot_df)
+    export_hotspot_pyramid(cells, 0.01)
 
     routes = get_google_routes(api_key, "Austin, TX", "Houston, TX")
-    scores = [calculate_safety_score(r, model) for r in routes]
+    scores = calculate_safety_scores(routes, model)
 
     for i, (route, (score, dur)) in enumerate(zip(routes, scores), 1):
         print(f"Route {i}:  Safety {score:.2f}/10  •  {dur:.1f} min")
@@ -249,5 +838,144 @@ def main():
     print(f"Safest Route: {safest + 1}  ({scores[safest][0]:.2f}/10)")
 
 
+def run_fleet(trips_path: str, out: str = "-", data_path: str = "data.csv", grid_size: float = 0.01,
+              store_dir: str = "model_store", compile_grid: bool = False, record: str = None,
+              offline: bool = False, rate: float = 10.0, **options) -> int:
+    """
+    Score a trip list (CSV/JSONL of origin,destination) to JSONL (`out` path
+    or "-" for stdout) or Parquet (*.parquet). `record` is a sqlite file of
+    Directions responses: filled while online, the only source when
+    `offline`. Other keyword options go to fleet.analyze_trips.
+    """
+    import fleet
+
+    trips = fleet.read_trips(trips_path)
+    model = load_or_train_model(data_path, grid_size, store_dir=store_dir, compile_grid=compile_grid)
+    if offline:
+        if not record:
+            raise ValueError("offline runs need the Directions recording (record=...)")
+        directions, limiter = fleet.RecordedDirections(SqliteCache(record)), None
+    else:
+        directions = (DirectionsClient(base_url=os.getenv("DIRECTIONS_URL", DIRECTIONS_URL),
+                                       cache=SqliteCache(record), ttl=None)
+                      if record else get_directions_client())
+        limiter = fleet.rate_limiter(rate)
+
+    results = fleet.analyze_trips(trips, model, directions, os.getenv("GOOGLE_MAPS_API_KEY"),
+                                  limiter=limiter, **options)
+    if out.endswith((".parquet", ".pq")):
+        n = fleet.write_parquet(results, out)
+    else:
+        n = fleet.write_jsonl(results, sys.stdout if out == "-" else out)
+    print(f"{n} trips scored → {out}", file=sys.stderr)
+    return n
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    parser = argparse.ArgumentParser(description="SmartDrive route safety tools")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("demo", help="score Austin → Houston alternatives (default)")
+
+    build = sub.add_parser("build-model", help="train and store a model artifact offline")
+    build.add_argument("--data", default="data.csv", help="crash data (.csv or .parquet)")
+    build.add_argument("--grid-size", type=float, default=0.01)
+    build.add_argument("--store", default="model_store", help="artifact directory")
+    build.add_argument("--grid", action="store_true", help="also compile the grid lookup")
+    build.add_argument("--time-cube", action="store_true", help="also build the hour‑of‑week risk cube")
+    build.add_argument("--chunk-rows", type=int, default=500_000, help="rows parsed per chunk")
+    build.add_argument("--workers", type=int, default=1, help="parse chunks in N processes")
+    build.add_argument("--n-jobs", type=int, default=-1, help="cores to fit the forest on (-1 = all)")
+    build.add_argument("--n-estimators", type=int, help="trees (default %d)" % MODEL_PARAMS["n_estimators"])
+    build.add_argument("--max-depth", type=int, help="cap tree depth")
+    build.add_argument("--max-leaf-nodes", type=int, help="cap leaves per tree")
+    build.add_argument("--params", help="forest parameters as JSON (e.g. from tune-model)")
+    build.add_argument("--flat", action="store_true", help="also export the FlatForest arrays")
+
+    tune = sub.add_parser("tune-model", help="compare forest sizes: MSE, latency, artifact size")
+    tune.add_argument("--data", default="data.csv", help="crash data (.csv or .parquet)")
+    tune.add_argument("--grid-size", type=float, default=0.01)
+    tune.add_argument("--chunk-rows", type=int, default=500_000, help="rows parsed per chunk")
+    tune.add_argument("--workers", type=int, default=1, help="parse chunks in N processes")
+    tune.add_argument("--n-jobs", type=int, default=-1, help="cores to fit each forest on (-1 = all)")
+    tune.add_argument("--tolerance", type=float, default=0.02, help="relative MSE loss accepted")
+    tune.add_argument("--repeats", type=int, default=50, help="timed single‑row predicts per model")
+    tune.add_argument("--build", action="store_true", help="store the picked model (with --flat arrays)")
+    tune.add_argument("--store", default="model_store", help="artifact directory")
+
+    hot = sub.add_parser("build-hotspots", help="convert the hotspot GeoJSON to the binary store")
+    hot.add_argument("--geojson", default=HOTSPOT_GEOJSON)
+    hot.add_argument("--out", default=HOTSPOT_STORE)
+
+    heat = sub.add_parser("export-heatmap", help="write the multi‑resolution heat‑map files")
+    heat.add_argument("--data", default="data.csv", help="crash data (.csv or .parquet)")
+    heat.add_argument("--grid-size", type=float, default=0.01, help="finest level")
+    heat.add_argument("--levels", type=int, default=len(HEATMAP_FACTORS), help="each level doubles the grid")
+    heat.add_argument("--out", default=HEATMAP_DIR)
+    heat.add_argument("--chunk-rows", type=int, default=500_000, help="rows parsed per chunk")
+    heat.add_argument("--workers", type=int, default=1, help="parse chunks in N processes")
+
+    trips = sub.add_parser("fleet", help="score a trip list in bulk")
+    trips.add_argument("trips", help="trips .csv (origin,destination[,id]) or .jsonl")
+    trips.add_argument("--out", default="-", help="results .jsonl or .parquet (default: stdout)")
+    trips.add_argument("--data", default="data.csv", help="crash data the model was trained on")
+    trips.add_argument("--grid-size", type=float, default=0.01)
+    trips.add_argument("--store", default="model_store", help="artifact directory")
+    trips.add_argument("--grid", action="store_true", help="score with the compiled grid lookup")
+    trips.add_argument("--scoring", choices=SCORING_MODES, default="steps")
+    trips.add_argument("--spacing-m", type=float, default=100.0)
+    trips.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="scoring processes")
+    trips.add_argument("--batch-size", type=int, default=64, help="trips per predict")
+    trips.add_argument("--concurrency", type=int, default=8, help="Directions lookups in flight")
+    trips.add_argument("--rate", type=float, default=10.0, help="Directions requests/s (0 = no limit)")
+    trips.add_argument("--record", help="sqlite file of Directions responses to fill / replay")
+    trips.add_argument("--offline", action="store_true", help="answer only from --record")
+
+    feed = sub.add_parser("apply-feed", help="fold new crash records into the stored model")
+    feed.add_argument("feed", help="new crash records (.csv or .parquet)")
+    feed.add_argument("--data", default="data.csv", help="crash data the model was trained on")
+    feed.add_argument("--grid-size", type=float, default=0.01)
+    feed.add_argument("--store", default="model_store", help="artifact directory")
+
+    args = parser.parse_args(argv)
+    if args.command == "build-model":
+        params = json.loads(args.params) if args.params else {}
+        for name in ("n_estimators", "max_depth", "max_leaf_nodes"):
+            if getattr(args, name) is not None:
+                params[name] = getattr(args, name)
+        build_model_artifact(args.data, args.grid_size, args.store, args.grid,
+                             chunk_rows=args.chunk_rows, workers=args.workers, time_cube=args.time_cube,
+                             params=params or None, n_jobs=args.n_jobs, flat=args.flat)
+    elif args.command == "tune-model":
+        from model_tuning import pick, sweep
+        hotspot_df = finalize(aggregate_cells(args.data, args.grid_size, args.chunk_rows, args.workers),
+                              args.grid_size)
+        best = pick(sweep(hotspot_df, n_jobs=args.n_jobs, repeats=args.repeats), args.tolerance)
+        print(f"Picked (MSE {best['mse']:.4f}, {best['model_bytes'] / 2**20:.2f} MB, "
+              f"{best['flat_us']:.0f} µs flat): SAFETY_MODEL_PARAMS='{json.dumps(best['params'])}'")
+        if args.build:
+            build_model_artifact(args.data, args.grid_size, args.store, chunk_rows=args.chunk_rows,
+                                 workers=args.workers, params=best['params'] or None,
+                                 n_jobs=args.n_jobs, flat=True)
+    elif args.command == "build-hotspots":
+        arrays = build_hotspot_store(args.geojson, args.out)
+        print(f"{len(arrays)} hotspot polygons ({len(arrays.coords)} vertices) written to {args.out}/")
+    elif args.command == "export-heatmap":
+        cells = aggregate_cells(args.data, args.grid_size, args.chunk_rows, args.workers)
+        export_hotspot_pyramid(cells, args.grid_size, args.out,
+                               factors=tuple(2 ** i for i in range(args.levels)))
+    elif args.command == "fleet":
+        run_fleet(args.trips, args.out, args.data, args.grid_size, args.store, args.grid,
+                  record=args.record, offline=args.offline, rate=args.rate, mode=args.scoring,
+                  spacing_m=args.spacing_m, concurrency=args.concurrency, workers=args.workers,
+                  batch_size=args.batch_size)
+    elif args.command == "apply-feed":
+        apply_crash_feed(args.feed, args.data, args.grid_size, args.store)
+    else:
+        demo()
+
+
 if __name__ == "__main__":
     main()
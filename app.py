@@ -3,23 +3,45 @@ from flask import (
     render_template,
     request,
     jsonify,
-    session,
     Response,
     send_file,          # ← NEW
+    g,
 )
-from flask_session import Session
-import openai, os, json, logging, numpy as np
+import gc, os, json, gzip, hmac, math, time, uuid, hashlib, logging, tempfile, threading, numpy as np
 from dotenv import load_dotenv
 
 from Route_Safety import (
     get_google_routes,
-    calculate_safety_score,
-    train_model,
-    identify_crash_hotspots,
-    load_crash_data,
+    calculate_safety_scores,
+    SCORING_MODES,
+    load_or_train_model,
+    apply_crash_feed,
+    model_key,
+    model_params_from_env,
+    ensure_hotspot_json,
     generate_voice_update,
     generate_enhanced_instruction,
+    hotspot_mask,
+    track_hotspots,
+    hotspot_features,
+    get_hotspot_index,
+    get_region_set,
+    get_llm_cache,
+    get_directions_client,
 )
+import assistant
+import fleet
+import metrics
+from cache import LRUCache
+
+try:
+    import brotli                    # optional: /hotspots falls back to gzip
+except ImportError:
+    brotli = None
+from model_store import ModelStore
+from pipeline import prefetch_map
+from regions import ShardedModel
+from risk_cube import parse_departure
 
 # ──────────────────────────────────────────────
 # basic setup
@@ -28,22 +50,132 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()                        # .env
-openai.api_key        = os.getenv("OPENAI_API_KEY")
 google_maps_api_key   = os.getenv("GOOGLE_MAPS_API_KEY")
 VOICE_MODEL           = os.getenv("VOICE_MODEL", "gpt-3.5-turbo")
+PIPELINE_WIDTH        = int(os.getenv("STREAM_PIPELINE_WIDTH", "4"))
 
 app = Flask(__name__)
-app.config.update(SESSION_PERMANENT=False, SESSION_TYPE="filesystem")
-Session(app)
 
 # ──────────────────────────────────────────────
-# ML safety model (warm‑up at startup)
+# ML safety model (loaded from the model store on first use,
+# trained only on a miss). Crash feeds swap in a refreshed model;
+# other workers notice the store changed and reload it.
 # ──────────────────────────────────────────────
-logger.info("Training safety model …")
-_safety_model = train_model(
-    identify_crash_hotspots(load_crash_data("data.csv"))
-)
-logger.info("✓ safety model ready")
+CRASH_DATA            = os.getenv("CRASH_DATA", "data.csv")
+MODEL_STORE           = os.getenv("MODEL_STORE", "model_store")
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))   # s, 0 = never
+
+_safety_model = None
+_safety_model_stamp = None
+_safety_model_checked = 0.0
+_safety_model_lock = threading.Lock()
+_crash_feed_lock = threading.Lock()
+
+
+def _store_stamp():
+    """mtime of the stored per‑cell aggregates – changes whenever a feed is applied."""
+    store = ModelStore(MODEL_STORE)
+    try:
+        return os.stat(store.cells_path(model_key(CRASH_DATA, store_dir=MODEL_STORE,
+                                                   params=model_params_from_env()))).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_safety_model():
+    global _safety_model, _safety_model_stamp
+    regions = get_region_set()
+    if regions is not None:
+        # REGIONS_MANIFEST: one model per region, each loaded when a route first reaches it
+        _safety_model = ShardedModel(regions)
+        logger.info("✓ safety model sharded over %d regions", len(regions))
+        return
+    logger.info("Loading safety model …")
+    model = load_or_train_model(
+        CRASH_DATA,
+        store_dir=MODEL_STORE,
+        # score by raster lookup; the forest stays as fallback outside the grid
+        compile_grid=os.getenv("SAFETY_MODEL_GRID", "0") == "1",
+        # hour‑of‑week risk cube: requests with departure_time are scored for when they drive
+        time_cube=os.getenv("SAFETY_MODEL_TIME", "0") == "1",
+        # forest parameters picked by `Route_Safety.py tune-model`, served as flat arrays
+        params=model_params_from_env(),
+        flat=os.getenv("SAFETY_MODEL_FLAT", "0") == "1",
+    )
+    _safety_model_stamp = _store_stamp()
+    _safety_model = model                    # one reference swap; readers never see half a model
+    logger.info("✓ safety model ready")
+
+
+def get_safety_model():
+    global _safety_model_checked
+    if _safety_model is None:
+        with _safety_model_lock:
+            if _safety_model is None:
+                _load_safety_model()
+    elif MODEL_RELOAD_INTERVAL and time.monotonic() - _safety_model_checked > MODEL_RELOAD_INTERVAL:
+        _safety_model_checked = time.monotonic()
+        if _store_stamp() != _safety_model_stamp:
+            with _safety_model_lock:
+                if _store_stamp() != _safety_model_stamp:
+                    _load_safety_model()
+    return _safety_model
+
+
+def set_safety_model(model):
+    """Atomically replace the served model (requests in flight keep the old one)."""
+    global _safety_model, _safety_model_stamp
+    with _safety_model_lock:
+        _safety_model_stamp = _store_stamp()
+        _safety_model = model
+
+
+def preload():
+    """
+    Load the safety model and hotspot index now rather than on the first
+    request. Call it once in a parent process before it forks workers
+    (gunicorn preload_app, see gunicorn.conf.py): the workers then share the
+    pages copy‑on‑write instead of each holding its own copy. gc.freeze()
+    moves what exists so far out of the collector's reach, so collections in
+    the workers don't write to (and so un‑share) those pages.
+    """
+    get_safety_model()
+    get_hotspot_index().warm()
+    gc.freeze()
+
+
+# heat‑map JSON for the front end (a stat() unless the GeoJSON changed)
+ensure_hotspot_json()
+
+# ──────────────────────────────────────────────
+# request metrics (METRICS=1; see metrics.py) – spans inside the
+# handlers feed /metrics and, with SERVER_TIMING=1, a Server-Timing header
+# ──────────────────────────────────────────────
+@app.before_request
+def _start_request_timing():
+    if metrics.enabled:
+        g.request_timing = (time.perf_counter(), metrics.start_request())
+
+
+@app.after_request
+def _finish_request_timing(response):
+    started = g.pop("request_timing", None)
+    if started is not None:
+        t0, token = started
+        timing = metrics.end_request(token, request.endpoint or "unmatched", time.perf_counter() - t0)
+        if timing:
+            response.headers["Server-Timing"] = timing
+    return response
+
+
+def _directions_cache_stats():
+    import Route_Safety
+    client = Route_Safety._directions_client
+    return client.cache.stats() if client is not None and hasattr(client.cache, "stats") else None
+
+
+metrics.register_cache("llm", lambda: get_llm_cache().stats())
+metrics.register_cache("directions", _directions_cache_stats)
 
 # ──────────────────────────────────────────────
 # routes
@@ -54,6 +186,44 @@ def home():
 
 
 # ---------- 1. analyse multiple routes ----------
+def scoring_options(data: dict) -> tuple[str, float]:
+    """(mode, spacing_m) from a request body; ValueError on bad input."""
+    # "steps" (default) or "polyline" – dense sampling along the route geometry
+    mode = data.get("scoring", "steps")
+    if mode not in SCORING_MODES:
+        raise ValueError(f"scoring must be one of {', '.join(SCORING_MODES)}")
+    try:
+        spacing_m = float(data.get("spacing_m", 100))
+    except (TypeError, ValueError):
+        spacing_m = 0
+    if spacing_m <= 0:
+        raise ValueError("spacing_m must be a positive number")
+    return mode, spacing_m
+
+
+def departure_option(data: dict):
+    """`departure_time` of a request body (ISO 8601, epoch seconds or "now") or None."""
+    return parse_departure(data.get("departure_time"))
+
+
+def route_details(routes: list, scores: list) -> tuple[list, int]:
+    """Per‑route summary for the front end + index of the safest route."""
+    details = []
+    for r, (score, mins) in zip(routes, scores):
+        details.append(
+            dict(
+                safety_score=score,
+                duration=mins,
+                distance=r["legs"][0]["distance"]["text"],
+                steps=[s["html_instructions"] for s in r["legs"][0]["steps"][:3]],
+            )
+        )
+
+    # index of safest route (highest score)
+    safest_idx = int(np.argmax([d["safety_score"] for d in details]))
+    return details, safest_idx
+
+
 @app.route("/analyze_route", methods=["POST"])
 def analyze_route():
     data  = request.json or {}
@@ -62,25 +232,20 @@ def analyze_route():
     if not (start and end):
         return jsonify(error="Please provide both start and end locations"), 400
 
+    try:
+        mode, spacing_m = scoring_options(data)
+        departure = departure_option(data)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
     try:
         routes = get_google_routes(google_maps_api_key, start, end)
         if not routes:
             return jsonify(error="No routes found"), 404
 
-        details = []
-        for r in routes:
-            score, mins = calculate_safety_score(r, _safety_model)
-            details.append(
-                dict(
-                    safety_score=score,
-                    duration=mins,
-                    distance=r["legs"][0]["distance"]["text"],
-                    steps=[s["html_instructions"] for s in r["legs"][0]["steps"][:3]],
-                )
-            )
-
-        # index of safest route (highest score)
-        safest_idx = int(np.argmax([d["safety_score"] for d in details]))
+        # one batched predict over every step of every alternative
+        scores  = calculate_safety_scores(routes, get_safety_model(), mode, spacing_m, departure)
+        details, safest_idx = route_details(routes, scores)
 
         return jsonify(routes=routes, route_details=details, safest_index=safest_idx)
     except Exception as exc:  # noqa
@@ -88,7 +253,65 @@ def analyze_route():
         return jsonify(error=str(exc)), 500
 
 
+# ---------- 1b. bulk: a fleet's trip list in one request ----------
+BULK_MAX_TRIPS   = int(os.getenv("BULK_MAX_TRIPS", "1000"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+# one Directions budget for every bulk request this process serves (0 = no limit)
+_bulk_limiter = fleet.rate_limiter(float(os.getenv("BULK_DIRECTIONS_RATE", "20")))
+
+
+@app.route("/analyze_routes", methods=["POST"])
+def analyze_routes():
+    """
+    Bulk /analyze_route. Body: JSON {"trips": [{id?, origin, destination}, …]}
+    or a multipart `trips` file (.csv / .jsonl), plus the usual scoring
+    options. Streams one JSON line per trip, in order, as soon as its batch
+    is scored (application/x-ndjson); see fleet.analyze_trips for the format.
+    """
+    upload = request.files.get("trips")
+    options = request.form if upload else (request.get_json(silent=True) or {})
+    try:
+        if upload:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "trips.jsonl" if upload.filename.endswith((".jsonl", ".ndjson"))
+                                    else "trips.csv")
+                upload.save(path)
+                trips = fleet.read_trips(path)
+        else:
+            trips = fleet.parse_trips(options.get("trips") or [])
+        mode, spacing_m = scoring_options(options)
+    except (ValueError, TypeError) as exc:       # UnicodeDecodeError / JSONDecodeError are ValueErrors
+        return jsonify(error=str(exc)), 400
+    if not trips:
+        return jsonify(error="Provide a non-empty `trips` list or file"), 400
+    if len(trips) > BULK_MAX_TRIPS:
+        return jsonify(error=f"At most {BULK_MAX_TRIPS} trips per request"), 413
+
+    results = fleet.analyze_trips(
+        trips, get_safety_model(), get_directions_client(), google_maps_api_key,
+        mode=mode, spacing_m=spacing_m, concurrency=BULK_CONCURRENCY, limiter=_bulk_limiter,
+    )
+    return Response((json.dumps(r) + "\n" for r in results), mimetype="application/x-ndjson")
+
+
 # ---------- 2. stream a chosen route (or gps sequence) ----------
+def route_sequence(route: dict) -> list[dict]:
+    """Turn‑by‑turn points (step end + instruction) of a Directions route."""
+    return [
+        dict(
+            latitude=s["end_location"]["lat"],
+            longitude=s["end_location"]["lng"],
+            html_instructions=s["html_instructions"],
+        )
+        for s in route["legs"][0]["steps"]
+    ]
+
+
+def pipeline_width(data: dict) -> int:
+    """How many points ahead to generate concurrently (1 = serial)."""
+    return max(1, min(int(data.get("pipeline_width", PIPELINE_WIDTH)), 16))
+
+
 @app.route("/stream_route", methods=["POST"])
 def stream_route():
     """
@@ -126,37 +349,45 @@ def stream_route():
         if route_idx >= len(routes):
             return jsonify(error="route_index out of range"), 400
 
-        chosen   = routes[route_idx]
-        steps    = chosen["legs"][0]["steps"]
-        seq      = [
-            dict(
-                latitude=s["end_location"]["lat"],
-                longitude=s["end_location"]["lng"],
-                html_instructions=s["html_instructions"],
-            )
-            for s in steps
-        ]
+        seq           = route_sequence(routes[route_idx])
         enhanced_turn = True
 
+    lats = [pt["latitude"] for pt in seq]
+    lngs = [pt["longitude"] for pt in seq]
+    if enhanced_turn:
+        # hotspot test for the whole sequence in one vectorised call
+        in_zone, ahead = hotspot_mask(lats, lngs), [None] * len(seq)
+    else:
+        # a live track: follow the heading and warn before entering a zone
+        in_zone, ahead = zip(*track_hotspots(lats, lngs)) if seq else ((), ())
+
+    try:
+        width = pipeline_width(data)
+    except (TypeError, ValueError):
+        return jsonify(error="pipeline_width must be an integer"), 400
+
+    def instruction(i):
+        pt, prev = seq[i], seq[max(i - 1, 0)]
+        lat, lng = pt["latitude"], pt["longitude"]
+        if enhanced_turn:
+            return generate_enhanced_instruction(
+                pt["html_instructions"], lat, lng,
+                model_name=VOICE_MODEL, in_hotspot=bool(in_zone[i]),
+            )
+        return generate_voice_update(
+            lat, lng, prev["latitude"], prev["longitude"],
+            model_name=VOICE_MODEL, in_hotspot=bool(in_zone[i]), ahead_m=ahead[i],
+        )
+
     # --------------------------------------------------
     #  SSE generator
     # --------------------------------------------------
     def event_stream():
-        prev = seq[0]
-        for pt in seq:
+        # texts arrive in order; closing the stream cancels the look‑ahead
+        texts = metrics.timed_iter("sse_event", prefetch_map(instruction, range(len(seq)), width))
+        for pt, text in zip(seq, texts):
             lat, lng = pt["latitude"], pt["longitude"]
-
-            if enhanced_turn:
-                text = generate_enhanced_instruction(
-                    pt["html_instructions"], lat, lng, model_name=VOICE_MODEL
-                )
-            else:
-                text = generate_voice_update(
-                    lat, lng, prev["latitude"], prev["longitude"], model_name=VOICE_MODEL
-                )
-
             yield f"data: {json.dumps(dict(text=text, latitude=lat, longitude=lng))}\n\n"
-            prev = pt
 
         # arrival
         arr = dict(
@@ -168,39 +399,173 @@ def stream_route():
     return Response(event_stream(), mimetype="text/event-stream")
 
 
-# ---------- 3. tiny helper routes ----------
+# ---------- 3. admin: fold in a crash feed ----------
+@app.route("/admin/crash_feed", methods=["POST"])
+def crash_feed():
+    """
+    Apply new crash records without a restart. Send the file as multipart
+    `feed` (.csv / .parquet) or JSON {"path": "<file on this host>"} with
+    header `X-Admin-Token: $ADMIN_TOKEN`. Disabled when ADMIN_TOKEN is unset.
+    Refused (409) while REGIONS_MANIFEST shards the model: the feed would
+    replace every region with one statewide grid.
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token or not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token):
+        return jsonify(error="forbidden"), 403
+    if get_region_set() is not None:
+        return jsonify(error="Crash feeds are not supported while REGIONS_MANIFEST is set; "
+                             "rebuild the region artifacts instead"), 409
+
+    upload = request.files.get("feed")
+    path = None if upload else (request.get_json(silent=True) or {}).get("path")
+    if not upload and not path:
+        return jsonify(error="Provide a `feed` file or a `path`"), 400
+
+    with _crash_feed_lock, tempfile.TemporaryDirectory() as tmp:
+        if upload:
+            suffix = ".parquet" if upload.filename.endswith((".parquet", ".pq")) else ".csv"
+            path = os.path.join(tmp, "feed" + suffix)
+            upload.save(path)
+        try:
+            model, n_cells = apply_crash_feed(path, CRASH_DATA, store_dir=MODEL_STORE,
+                                              model=get_safety_model(), params=model_params_from_env())
+        except (OSError, ValueError, KeyError) as exc:
+            logger.exception("crash feed failed")
+            return jsonify(error=str(exc)), 400
+        if n_cells:
+            set_safety_model(model)
+    return jsonify(cells_updated=n_cells)
+
+
+# ---------- 4. hotspot zones for the map viewport ----------
+HOTSPOT_MAX_AGE = int(os.getenv("HOTSPOT_MAX_AGE", "300"))
+# encoded bodies by (etag, encoding) – viewports snap to tiles, so users share entries
+_hotspot_responses = LRUCache(maxsize=512)
+metrics.register_cache("hotspot_responses", _hotspot_responses.stats)
+
+
+def _snap_bbox(west, south, east, north, zoom):
+    """Grow the box outward to whole map tiles at `zoom` (stable URLs → cache hits)."""
+    step = 360.0 / 2 ** zoom
+    return (math.floor(west / step) * step, math.floor(south / step) * step,
+            math.ceil(east / step) * step, math.ceil(north / step) * step)
+
+
+def _pick_encoding(accept_encoding: str) -> str:
+    """brotli (if installed) or gzip when the client accepts it; '' = identity."""
+    if "br" in accept_encoding and brotli is not None:
+        return "br"
+    return "gzip" if "gzip" in accept_encoding else ""
+
+
+def _encode(body: bytes, encoding: str) -> tuple[bytes, str]:
+    if len(body) < 1024 or not encoding:
+        return body, ""
+    if encoding == "br":
+        return brotli.compress(body, quality=5), "br"
+    return gzip.compress(body, compresslevel=6), "gzip"
+
+
+@app.route("/hotspots")
+def hotspots():
+    """
+    High‑crash zones in a viewport: `bbox=west,south,east,north` (degrees) and
+    `zoom` (map zoom level). GeoJSON, compressed, with a weak ETag so the
+    browser revalidates with If-None-Match and gets a 304 when nothing changed.
+    """
+    try:
+        west, south, east, north = (float(v) for v in request.args["bbox"].split(","))
+        zoom = max(0, min(int(request.args.get("zoom", 12)), 22))
+    except (KeyError, ValueError):
+        return jsonify(error="bbox=west,south,east,north and integer zoom required"), 400
+    if not (west < east and south < north):
+        return jsonify(error="bbox must be west < east and south < north"), 400
+
+    bbox = _snap_bbox(west, south, east, north, zoom)
+    version = get_hotspot_index().version
+    etag = hashlib.sha1(f"{version}|{zoom}|{bbox}".encode()).hexdigest()[:20]
+
+    headers = {"Cache-Control": f"public, max-age={HOTSPOT_MAX_AGE}", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304, headers=headers)
+        resp.set_etag(etag, weak=True)
+        return resp
+
+    wanted = _pick_encoding(request.headers.get("Accept-Encoding", ""))
+    cached = _hotspot_responses.get((etag, wanted))
+    if cached is None:
+        cached = _encode(hotspot_features(bbox, zoom).encode(), wanted)
+        _hotspot_responses.set((etag, wanted), cached)
+    body, encoding = cached
+
+    resp = Response(body, mimetype="application/geo+json", headers=headers)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.set_etag(etag, weak=True)
+    return resp
+
+
+# ---------- 5. tiny helper routes ----------
 @app.route("/chat", methods=["POST"])
 def chat():
-    try:
-        user_msg = request.json.get("message")
-        if not user_msg:
-            return jsonify(error="No message provided"), 400
-
-        convo = session.setdefault("conversation", [])
-        with open("topic_prompts/initial_prompt.txt") as f:
-            system_prompt = f.read()
-
-        msgs = [{"role": "system", "content": system_prompt}] + convo[-10:] + [
-            {"role": "user", "content": user_msg}
-        ]
-        resp = openai.chat.completions.create(
-            model="gpt-3.5-turbo", messages=msgs, temperature=0.7, max_tokens=500
-        )
-        bot = resp.choices[0].message.content
-        convo.append({"role": "assistant", "content": bot})
-        session.modified = True
-        return jsonify(response=bot)
-    except Exception as exc:  # noqa
-        logger.exception("chat endpoint failed")
-        return jsonify(error=str(exc)), 500
+    """
+    {"message": …} → {"response": …}; with "stream": true (or Accept:
+    text/event-stream) the reply streams as SSE `{"delta": …}` events,
+    then `{"done": true}`. History lives in the chat store, not the cookie.
+    """
+    data     = request.get_json(silent=True) or {}
+    user_msg = data.get("message")
+    if not user_msg:
+        return jsonify(error="No message provided"), 400
+
+    sid   = request.cookies.get(assistant.SESSION_COOKIE) or uuid.uuid4().hex
+    store = assistant.get_chat_store()
+    msgs  = assistant.chat_messages(store.history(sid), user_msg)
+
+    if data.get("stream") or "text/event-stream" in request.headers.get("Accept", ""):
+        def event_stream():
+            parts = []
+            try:
+                for text in assistant.stream_reply(msgs):
+                    parts.append(text)
+                    yield assistant.sse(dict(delta=text))
+            except Exception as exc:  # noqa
+                logger.exception("chat stream failed")
+                yield assistant.sse(dict(error=str(exc)))
+                return
+            store.append(sid, user_msg, "".join(parts))
+            yield assistant.sse(dict(done=True))
+
+        resp = Response(event_stream(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    else:
+        try:
+            bot = assistant.complete(msgs)
+        except Exception as exc:  # noqa
+            logger.exception("chat endpoint failed")
+            return jsonify(error=str(exc)), 500
+        store.append(sid, user_msg, bot)
+        resp = jsonify(response=bot)
+    resp.set_cookie(assistant.SESSION_COOKIE, sid, httponly=True, samesite="Lax")
+    return resp
 
 
 @app.route("/clear_session")
 def clear_session():
-    session.clear()
+    sid = request.cookies.get(assistant.SESSION_COOKIE)
+    if sid:
+        assistant.get_chat_store().clear(sid)
     return jsonify(status="session cleared")
 
 
+# ---------- 6. Prometheus metrics ----------
+@app.route("/metrics")
+def metrics_endpoint():
+    if not metrics.enabled:
+        return jsonify(error="metrics are disabled (set METRICS=1)"), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 # ----------  entrypoint ----------
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080)
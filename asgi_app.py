@@ -0,0 +1,219 @@
+"""
+ASGI entry point:  uvicorn asgi_app:app --workers N
+
+The I/O‑heavy endpoints (/analyze_route, /stream_route, /chat) run as native
+coroutines – Directions and OpenAI calls are awaited on one event loop, so a
+worker holds thousands of open streams without a thread each. Everything
+else (/, static files, /clear_session) is served by the Flask app mounted
+underneath.
+"""
+import json
+import time
+import uuid
+import functools
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_app
+import assistant
+import metrics
+from pipeline import aprefetch_map
+from Route_Safety import (
+    get_google_routes_async,
+    calculate_safety_scores,
+    generate_enhanced_instruction_async,
+    generate_voice_update_async,
+    get_llm_cache,
+    hotspot_mask,
+    track_hotspots,
+)
+
+logger = flask_app.logger
+
+def _timed(endpoint):
+    """Request metrics + Server-Timing for the native endpoints (as app.py's hooks do)."""
+    @functools.wraps(endpoint)
+    async def wrapper(request: Request):
+        if not metrics.enabled:
+            return await endpoint(request)
+        t0, token = time.perf_counter(), metrics.start_request()
+        response = await endpoint(request)
+        timing = metrics.end_request(token, endpoint.__name__, time.perf_counter() - t0)
+        if timing:
+            response.headers["Server-Timing"] = timing
+        return response
+    return wrapper
+
+
+async def _json_body(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+# ---------- 1. analyse multiple routes ----------
+async def analyze_route(request: Request):
+    data  = await _json_body(request)
+    start = data.get("start")
+    end   = data.get("end")
+    if not (start and end):
+        return JSONResponse(dict(error="Please provide both start and end locations"), 400)
+
+    try:
+        mode, spacing_m = flask_app.scoring_options(data)
+        departure = flask_app.departure_option(data)
+    except ValueError as exc:
+        return JSONResponse(dict(error=str(exc)), 400)
+
+    try:
+        routes = await get_google_routes_async(flask_app.google_maps_api_key, start, end)
+        if not routes:
+            return JSONResponse(dict(error="No routes found"), 404)
+
+        # model load / predict are CPU work – keep them off the event loop
+        model  = await run_in_threadpool(flask_app.get_safety_model)
+        scores = await run_in_threadpool(calculate_safety_scores, routes, model, mode, spacing_m,
+                                         departure)
+        details, safest_idx = flask_app.route_details(routes, scores)
+
+        return JSONResponse(dict(routes=routes, route_details=details, safest_index=safest_idx))
+    except Exception as exc:  # noqa
+        logger.exception("analyze_route failed")
+        return JSONResponse(dict(error=str(exc)), 500)
+
+
+# ---------- 2. stream a chosen route (or gps sequence) ----------
+async def stream_route(request: Request):
+    """Same two modes and event format as the Flask /stream_route."""
+    data = await _json_body(request)
+
+    if "gps_sequence" in data:
+        seq           = data["gps_sequence"]
+        enhanced_turn = False
+    else:
+        start = data.get("start")
+        end   = data.get("end")
+        if not (start and end):
+            return JSONResponse(dict(error="Provide gps_sequence OR start & end"), 400)
+
+        route_idx = int(data.get("route_index", 0))
+        routes    = await get_google_routes_async(flask_app.google_maps_api_key, start, end)
+        if not routes:
+            return JSONResponse(dict(error="No routes found"), 404)
+        if route_idx >= len(routes):
+            return JSONResponse(dict(error="route_index out of range"), 400)
+
+        seq           = flask_app.route_sequence(routes[route_idx])
+        enhanced_turn = True
+
+    lats = [pt["latitude"] for pt in seq]
+    lngs = [pt["longitude"] for pt in seq]
+    # off the loop: the first call loads (or builds) the hotspot index
+    if enhanced_turn:
+        # hotspot test for the whole sequence in one vectorised call
+        in_zone, ahead = await run_in_threadpool(hotspot_mask, lats, lngs), [None] * len(seq)
+    else:
+        # a live track: follow the heading and warn before entering a zone
+        tracked = await run_in_threadpool(track_hotspots, lats, lngs) if seq else []
+        in_zone, ahead = zip(*tracked) if seq else ((), ())
+
+    try:
+        width = flask_app.pipeline_width(data)
+    except (TypeError, ValueError):
+        return JSONResponse(dict(error="pipeline_width must be an integer"), 400)
+
+    async def instruction(i):
+        pt, prev = seq[i], seq[max(i - 1, 0)]
+        lat, lng = pt["latitude"], pt["longitude"]
+        if enhanced_turn:
+            return await generate_enhanced_instruction_async(
+                pt["html_instructions"], lat, lng,
+                model_name=flask_app.VOICE_MODEL, in_hotspot=bool(in_zone[i]),
+            )
+        return await generate_voice_update_async(
+            lat, lng, prev["latitude"], prev["longitude"],
+            model_name=flask_app.VOICE_MODEL, in_hotspot=bool(in_zone[i]), ahead_m=ahead[i],
+        )
+
+    async def event_stream():
+        # a client disconnect cancels this generator and, with it, the look‑ahead
+        texts = metrics.atimed_iter("sse_event", aprefetch_map(instruction, range(len(seq)), width))
+        async for pt, text in _azip(seq, texts):
+            lat, lng = pt["latitude"], pt["longitude"]
+            yield f"data: {json.dumps(dict(text=text, latitude=lat, longitude=lng))}\n\n"
+
+        arr = dict(
+            latitude=seq[-1]["latitude"],
+            longitude=seq[-1]["longitude"],
+        )
+        yield f"data: {json.dumps(arr)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+async def _azip(items, aiterable):
+    it = iter(items)
+    async for value in aiterable:
+        yield next(it), value
+
+
+# ---------- 3. chat ----------
+async def chat(request: Request):
+    """Same request/response (and SSE streaming) contract as the Flask /chat."""
+    data     = await _json_body(request)
+    user_msg = data.get("message")
+    if not user_msg:
+        return JSONResponse(dict(error="No message provided"), 400)
+
+    sid   = request.cookies.get(assistant.SESSION_COOKIE) or uuid.uuid4().hex
+    # the chat store is sqlite by default: its reads and writes run off the loop
+    store = await run_in_threadpool(assistant.get_chat_store)
+    msgs  = assistant.chat_messages(await run_in_threadpool(store.history, sid), user_msg)
+    client = get_llm_cache().async_client()
+
+    if data.get("stream") or "text/event-stream" in request.headers.get("accept", ""):
+        async def event_stream():
+            parts = []
+            try:
+                async for text in assistant.astream_reply(client, msgs):
+                    parts.append(text)
+                    yield assistant.sse(dict(delta=text))
+            except Exception as exc:  # noqa
+                logger.exception("chat stream failed")
+                yield assistant.sse(dict(error=str(exc)))
+                return
+            await run_in_threadpool(store.append, sid, user_msg, "".join(parts))
+            yield assistant.sse(dict(done=True))
+
+        response = StreamingResponse(event_stream(), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    else:
+        try:
+            with metrics.span("llm"):
+                resp = await client.chat.completions.create(
+                    model=assistant.CHAT_MODEL, messages=msgs, **assistant.CHAT_PARAMS
+                )
+            bot = resp.choices[0].message.content
+        except Exception as exc:  # noqa
+            metrics.failure("openai")
+            logger.exception("chat endpoint failed")
+            return JSONResponse(dict(error=str(exc)), 500)
+        await run_in_threadpool(store.append, sid, user_msg, bot)
+        response = JSONResponse(dict(response=bot))
+    response.set_cookie(assistant.SESSION_COOKIE, sid, httponly=True, samesite="lax")
+    return response
+
+
+app = Starlette(routes=[
+    Route("/analyze_route", _timed(analyze_route), methods=["POST"]),
+    Route("/stream_route", _timed(stream_route), methods=["POST"]),
+    Route("/chat", _timed(chat), methods=["POST"]),
+    Mount("/", app=WSGIMiddleware(flask_app.app)),
+])
@@ -0,0 +1,154 @@
+"""
+Chat assistant plumbing shared by app.py and asgi_app.py: the history store,
+the cached system prompt and (streamed) completions.
+
+History is keyed by an `sd_session` cookie and kept in one of
+
+    SESSION_BACKEND=sqlite   SESSION_DB file, shared by every worker on the host (default)
+    SESSION_BACKEND=memory   this process's LRU – single‑worker setups only: a
+                             follow‑up served by another worker starts afresh
+
+Either way a conversation keeps its last CHAT_HISTORY messages, expires
+CHAT_SESSION_TTL seconds after its last turn, and at most CHAT_SESSIONS_MAX
+conversations are held.
+"""
+import os
+import json
+import time
+import functools
+import threading
+
+import metrics
+from cache import LRUCache, SqliteCache
+
+SESSION_COOKIE = "sd_session"
+CHAT_PROMPT = "topic_prompts/initial_prompt.txt"
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+CHAT_PARAMS = dict(temperature=0.7, max_tokens=500)
+CHAT_CONTEXT = 10                    # history messages sent with each question
+
+
+class ChatStore:
+    """Bounded, expiring chat histories by session id, on any get/update/delete cache."""
+
+    def __init__(self, cache, max_messages: int = 20):
+        self.cache = cache
+        self.max_messages = max_messages
+
+    def history(self, sid: str) -> list[dict]:
+        return self.cache.get(sid) or []
+
+    def append(self, sid: str, user_msg: str, reply: str) -> None:
+        turn = [{"role": "user", "content": user_msg}, {"role": "assistant", "content": reply}]
+        # one atomic read‑modify‑write: concurrent turns in a session both land
+        self.cache.update(sid, lambda history: ((history or []) + turn)[-self.max_messages:])
+
+    def clear(self, sid: str) -> None:
+        self.cache.delete(sid)
+
+
+def make_chat_store(backend: str = None) -> ChatStore:
+    # sqlite by default: gunicorn.conf.py runs a worker per CPU, and each needs the same history
+    backend = backend or os.getenv("SESSION_BACKEND", "sqlite")
+    ttl = float(os.getenv("CHAT_SESSION_TTL", "3600"))
+    maxsize = int(os.getenv("CHAT_SESSIONS_MAX", "10000"))
+    if backend == "memory":
+        cache = LRUCache(maxsize=maxsize, ttl=ttl)
+    elif backend == "sqlite":
+        cache = SqliteCache(os.getenv("SESSION_DB", "chat_sessions.sqlite"), ttl=ttl, maxsize=maxsize)
+    else:
+        raise ValueError(f"SESSION_BACKEND must be memory or sqlite, not {backend!r}")
+    return ChatStore(cache, max_messages=int(os.getenv("CHAT_HISTORY", "20")))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chat_store() -> ChatStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = make_chat_store()
+    return _store
+
+
+@functools.lru_cache(maxsize=1)
+def system_prompt() -> str:
+    """The assistant's system prompt, read once per process."""
+    with open(CHAT_PROMPT) as f:
+        return f.read()
+
+
+def chat_messages(history: list[dict], user_msg: str) -> list[dict]:
+    return ([{"role": "system", "content": system_prompt()}] + history[-CHAT_CONTEXT:]
+            + [{"role": "user", "content": user_msg}])
+
+
+def sse(obj: dict) -> str:
+    return f"data: {json.dumps(obj)}\n\n"
+
+
+# ─────────────────────────── completions ───────────────────────────
+_client = None
+
+
+def client():
+    """Synchronous OpenAI client (pooled connections), built on first use."""
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def _delta(chunk) -> str:
+    return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+
+
+def complete(messages: list[dict]) -> str:
+    try:
+        with metrics.span("llm"):
+            resp = client().chat.completions.create(model=CHAT_MODEL, messages=messages, **CHAT_PARAMS)
+    except Exception:
+        metrics.failure("openai")
+        raise
+    return resp.choices[0].message.content
+
+
+def stream_reply(messages: list[dict]):
+    """Yield the reply's text fragments as the API produces them."""
+    t0 = time.perf_counter()
+    first = True
+    try:
+        for chunk in client().chat.completions.create(model=CHAT_MODEL, messages=messages,
+                                                      stream=True, **CHAT_PARAMS):
+            text = _delta(chunk)
+            if text:
+                if first and metrics.enabled:
+                    metrics.SPANS.observe("llm_first_token", time.perf_counter() - t0)
+                first = False
+                yield text
+    except Exception:
+        metrics.failure("openai")
+        raise
+
+
+async def astream_reply(aclient, messages: list[dict]):
+    """Async stream_reply() on an openai.AsyncOpenAI client."""
+    t0 = time.perf_counter()
+    first = True
+    try:
+        stream = await aclient.chat.completions.create(model=CHAT_MODEL, messages=messages,
+                                                       stream=True, **CHAT_PARAMS)
+        async for chunk in stream:
+            text = _delta(chunk)
+            if text:
+                if first and metrics.enabled:
+                    metrics.SPANS.observe("llm_first_token", time.perf_counter() - t0)
+                first = False
+                yield text
+    except Exception:
+        metrics.failure("openai")
+        raise
@@ -0,0 +1,61 @@
+"""
+Offline fleet scoring throughput vs number of worker processes.
+
+    python -m benchmarks.bench_fleet --trips 5000 --steps 40 --workers 1 2 4 8
+
+Directions come from a recording (SqliteCache) of synthetic routes, so the
+run needs no network and measures fetch-from-recording + batched scoring.
+The model is a forest trained on synthetic crashes, shared with the workers
+by fork.
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from Route_Safety import identify_crash_hotspots, train_model
+from benchmarks.synthetic import make_crash_data, make_route
+from cache import SqliteCache
+from directions_client import DirectionsClient
+import fleet
+
+
+def record_trips(path: str, n_trips: int, steps: int, alternatives: int = 3) -> list[dict]:
+    cache = SqliteCache(path)
+    trips = []
+    for i in range(n_trips):
+        trip = dict(id=i, origin=f"Depot {i}", destination=f"Customer {i}")
+        routes = [dict(make_route(steps, seed=i * alternatives + a), summary=f"alt {a}")
+                  for a in range(alternatives)]
+        cache.set(DirectionsClient.cache_key(trip["origin"], trip["destination"]), routes)
+        trips.append(trip)
+    return trips
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--trips", type=int, default=5_000)
+    ap.add_argument("--steps", type=int, default=40, help="steps per route (3 alternatives per trip)")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--batch-size", type=int, default=64)
+    args = ap.parse_args(argv)
+
+    model = train_model(identify_crash_hotspots(make_crash_data(200_000)), out_path=None)
+    with tempfile.TemporaryDirectory() as tmp:
+        record = os.path.join(tmp, "directions.sqlite")
+        trips = record_trips(record, args.trips, args.steps)
+        print(f"{args.trips} trips × 3 routes × {args.steps} steps, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'seconds':>8} {'trips/s':>9} {'speed-up':>9}")
+        base = None
+        for workers in args.workers:
+            directions = fleet.RecordedDirections(SqliteCache(record))
+            t0 = time.perf_counter()
+            n = sum(1 for _ in fleet.analyze_trips(trips, model, directions, workers=workers,
+                                                   batch_size=args.batch_size))
+            secs = time.perf_counter() - t0
+            base = base or n / secs
+            print(f"{workers:>8} {secs:>8.2f} {n / secs:>9.0f} {n / secs / base:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
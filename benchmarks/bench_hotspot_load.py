@@ -0,0 +1,74 @@
+"""
+Hotspot index load: GeoJSON vs the memory-mapped binary store.
+
+    python -m benchmarks.bench_hotspot_load [--geojson PATH]
+
+Each format is loaded in fresh processes (as a worker would on start-up),
+after all imports; reports the median time to a ready HotspotIndex and how
+much the load raised peak and resident memory.
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time, re, sys
+geojson, store, fmt = sys.argv[1:4]
+from hotspot_index import HotspotIndex
+from hotspot_store import load_hotspot_store, polygons_from_arrays
+from Route_Safety import load_hotspot_polygons
+
+def status(key):
+    return int(re.search(key + r":\\s+(\\d+)", open("/proc/self/status").read()).group(1))
+
+base = status("VmRSS")
+t0 = time.perf_counter()
+if fmt == "geojson":
+    index = HotspotIndex(load_hotspot_polygons(geojson))
+else:
+    arrays = load_hotspot_store(store)
+    index = HotspotIndex(polygons_from_arrays(arrays), bboxes=arrays.bboxes)
+secs = time.perf_counter() - t0
+print(secs, status("VmHWM") - base, status("VmRSS") - base)
+"""
+
+
+def _probe(geojson, store, fmt):
+    out = subprocess.run([sys.executable, "-c", PROBE, geojson, store, fmt],
+                         check=True, capture_output=True, text=True, cwd=ROOT)
+    secs, peak, resident = out.stdout.split()
+    return float(secs), int(peak) / 1024, int(resident) / 1024
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--geojson", default=os.path.join(ROOT, "output_files/high_crash_zones.geojson"))
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    from hotspot_store import build_hotspot_store
+
+    with tempfile.TemporaryDirectory() as store:
+        arrays = build_hotspot_store(args.geojson, store)
+        sizes = {"geojson": os.path.getsize(args.geojson),
+                 "binary": sum(os.path.getsize(os.path.join(store, f)) for f in os.listdir(store))}
+        print(f"{len(arrays)} polygons, {len(arrays.coords)} vertices")
+        print(f"{'format':>8} {'on disk KiB':>12} {'load ms':>8} {'+peak MiB':>10} {'+RSS MiB':>9}")
+        results = {}
+        for fmt in ("geojson", "binary"):
+            runs = [_probe(args.geojson, store, fmt) for _ in range(args.repeat)]
+            secs = statistics.median(r[0] for r in runs)
+            peak = statistics.median(r[1] for r in runs)
+            resident = statistics.median(r[2] for r in runs)
+            results[fmt] = dict(load_ms=secs * 1e3, peak_mib=peak, rss_mib=resident)
+            print(f"{fmt:>8} {sizes[fmt] / 1024:>12.0f} {secs * 1e3:>8.1f} {peak:>10.1f} {resident:>9.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Peak memory and time: in-memory vs streamed hotspot aggregation.
+
+    python -m benchmarks.bench_ingest --rows 2000000
+
+Writes a crash export with the three columns we use plus `--extra` text
+columns (the statewide export is wide), then runs each path in a fresh
+process and reports its wall time and peak RSS (Linux only; worker
+processes, if any, are not included).
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import tempfile
+
+import numpy as np
+
+from benchmarks.synthetic import make_crash_data
+
+RUNNERS = {
+    # the pre‑streaming load_crash_data: parse every column, then select
+    "full-read": "import pandas as pd\n"
+                 "from Route_Safety import identify_crash_hotspots\n"
+                 "data = pd.read_csv(path, low_memory=False)[['latitude', 'longitude', 'crash_sev_id']].dropna()\n"
+                 "identify_crash_hotspots(data)",
+    "in-memory": "from Route_Safety import load_crash_data, identify_crash_hotspots\n"
+                 "identify_crash_hotspots(load_crash_data(path))",
+    "streamed":  "from crash_ingest import aggregate_hotspots\n"
+                 "aggregate_hotspots(path, chunk_rows=chunk_rows, workers=workers)",
+}
+
+
+def write_export(path: str, rows: int, extra: int) -> None:
+    data = make_crash_data(rows)
+    rng = np.random.default_rng(1)
+    for i in range(extra):
+        data[f"field_{i}"] = rng.choice(["N/A", "DRY", "WET", "DAYLIGHT", "DARK, LIGHTED"], rows)
+    data.to_csv(path, index=False)
+
+
+def _run(name: str, path: str, chunk_rows: int, workers: int) -> tuple[float, float]:
+    # VmHWM rather than ru_maxrss: the latter survives exec, so it would report this parent
+    code = (
+        "import time, re\n"
+        f"path, chunk_rows, workers = {path!r}, {chunk_rows}, {workers}\n"
+        "t0 = time.perf_counter()\n"
+        f"{RUNNERS[name]}\n"
+        "print(time.perf_counter() - t0,"
+        " re.search(r'VmHWM:\\s+(\\d+)', open('/proc/self/status').read()).group(1))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    secs, peak_kib = out.stdout.split()[-2:]
+    return float(secs), int(peak_kib) / 1024
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--extra", type=int, default=20, help="unused text columns in the export")
+    ap.add_argument("--chunk-rows", type=int, default=500_000)
+    ap.add_argument("--workers", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "crashes.csv")
+        write_export(path, args.rows, args.extra)
+        print(f"{args.rows:,} rows, {os.path.getsize(path) / 2**20:.0f} MiB on disk")
+        print(f"{'path':>10} {'seconds':>8} {'peak MiB':>9}")
+        for name in RUNNERS:
+            secs, peak = _run(name, path, args.chunk_rows, args.workers)
+            print(f"{name:>10} {secs:>8.2f} {peak:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Per-step vs batched safety scoring.
+
+    python -m benchmarks.bench_safety_score
+
+Scores three alternatives per request, as /analyze_route does, with the old
+one-DataFrame-per-step loop and with calculate_safety_scores.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from Route_Safety import identify_crash_hotspots, train_model, calculate_safety_scores
+from benchmarks.synthetic import make_crash_data, make_route
+
+
+def per_step_scores(routes, model):
+    """The original calculate_safety_score loop: one predict per step."""
+    out = []
+    for route in routes:
+        scores, total_min = [], 0
+        for leg in route['legs']:
+            total_min += leg['duration']['value'] / 60
+            for step in leg['steps']:
+                lat, lng = step['end_location'].values()
+                df = pd.DataFrame([[lat, lng]], columns=['lat_bin', 'lng_bin'])
+                scores.append(model.predict(df)[0])
+        avg = np.mean(scores) if scores else 0
+        out.append((float(f"{min(max(10 - avg, 1), 10):.3f}"), total_min))
+    return out
+
+
+def _time(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    model = train_model(identify_crash_hotspots(make_crash_data(20_000)))
+    print(f"{'steps/route':>12} {'per-step ms':>12} {'batched ms':>11} {'speed-up':>9}")
+    for n_steps in (10, 50, 100, 200):
+        routes = [make_route(n_steps, seed=s) for s in range(3)]
+        assert per_step_scores(routes, model) == calculate_safety_scores(routes, model)
+        slow = _time(lambda: per_step_scores(routes, model), repeat=1)
+        fast = _time(lambda: calculate_safety_scores(routes, model))
+        print(f"{n_steps:>12} {slow * 1e3:>12.1f} {fast * 1e3:>11.1f} {slow / fast:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
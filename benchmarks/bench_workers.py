@@ -0,0 +1,109 @@
+"""
+Per-worker memory with and without preloading the model before the fork.
+
+    python -m benchmarks.bench_workers --workers 4
+
+Each mode forks `--workers` processes that score routes and test GPS fixes
+against the hotspot index, then report their memory while all are alive:
+
+    per-worker   every worker loads the model and index itself (no preload)
+    preload      the parent loads them once, the workers inherit them (fork)
+    preload+gc   as preload, plus gc.freeze() before forking (app.preload())
+
+Private = pages only that worker holds (what each extra worker costs);
+PSS splits shared pages between their users. Linux only (/proc smaps_rollup).
+"""
+import gc
+import os
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import AUSTIN, make_crash_data
+
+MODES = ("per-worker", "preload", "preload+gc")
+
+
+def _memory_mb() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return dict(rss=fields["Rss"], pss=fields["Pss"],
+                private=fields["Private_Clean"] + fields["Private_Dirty"])
+
+
+def _load(model_path: str):
+    import joblib
+    from Route_Safety import _load_hotspot_index
+    model = joblib.load(model_path, mmap_mode="r")
+    index = _load_hotspot_index()
+    index.buffered_tree(50)
+    return model, index
+
+
+def _work(model, index, rounds: int = 20) -> None:
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(rounds):
+        pts = np.column_stack([AUSTIN[0] + rng.uniform(-0.2, 0.2, 500),
+                               AUSTIN[1] + rng.uniform(-0.2, 0.2, 500)])
+        model.predict(pd.DataFrame(pts, columns=["lat_bin", "lng_bin"]))
+        index.mask(pts[:, 0], pts[:, 1])
+        gc.collect()                       # a long-lived worker collects sooner or later
+
+
+def _worker(model_path, loaded, results, done):
+    t0 = time.perf_counter()
+    model, index = loaded if loaded is not None else _load(model_path)
+    ready = time.perf_counter() - t0
+    _work(model, index)
+    results.put(dict(_memory_mb(), ready_s=ready))
+    done.wait()                            # stay alive so PSS is split across all workers
+
+
+def run_mode(mode: str, model_path: str, workers: int, loaded=None) -> dict:
+    ctx = mp.get_context("fork")
+    results, done = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(model_path, loaded, results, done))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    done.set()
+    for p in procs:
+        p.join()
+    return {k: float(np.mean([r[k] for r in rows])) for k in rows[0]}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--crashes", type=int, default=200_000, help="synthetic crashes to train on")
+    args = ap.parse_args(argv)
+
+    from Route_Safety import identify_crash_hotspots, train_model
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "model.joblib")
+        train_model(identify_crash_hotspots(make_crash_data(args.crashes)), out_path=model_path)
+        gc.collect()
+        print(f"model file {os.path.getsize(model_path) / 2**20:.1f} MB, {args.workers} workers")
+        print(f"{'mode':>12} {'private MB':>11} {'PSS MB':>8} {'RSS MB':>8} {'ready s':>8}")
+        loaded = None
+        for mode in MODES:
+            if mode != "per-worker" and loaded is None:
+                loaded = _load(model_path)                 # in the parent, before forking
+            if mode == "preload+gc":
+                gc.freeze()
+            row = run_mode(mode, model_path, args.workers, loaded)
+            print(f"{mode:>12} {row['private']:>11.1f} {row['pss']:>8.1f} {row['rss']:>8.1f}"
+                  f" {row['ready_s']:>8.3f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
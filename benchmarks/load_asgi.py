@@ -0,0 +1,142 @@
+"""
+Concurrent /stream_route load: ASGI (asgi_app) vs the threaded Flask server.
+
+    python -m benchmarks.load_asgi --streams 2000 --points 5 --latency 0.5 --flask
+
+OpenAI is replaced by a local async stub that answers after `--latency`
+seconds, so the numbers measure how many in-flight LLM waits one worker
+process can hold. The stub, the server under test and the load driver each
+get their own process. Every stream uses distinct coordinates so the LLM
+cache never short-circuits a call.
+"""
+import os
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing as mp
+
+import httpx
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"nothing listening on {port}")
+
+
+def fake_openai(latency: float) -> Starlette:
+    async def completions(request):
+        body = await request.json()
+        await asyncio.sleep(latency)
+        return JSONResponse(dict(
+            id="chatcmpl-bench", object="chat.completion", created=0, model=body["model"],
+            choices=[dict(index=0, finish_reason="stop",
+                          message=dict(role="assistant", content="Continue straight."))],
+        ))
+    return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+
+# ───────────────────────── server processes ─────────────────────────
+def _run_openai(port: int, latency: float) -> None:
+    import uvicorn
+    uvicorn.run(fake_openai(latency), host="127.0.0.1", port=port, log_level="warning", backlog=8192)
+
+
+def _run_asgi(port: int) -> None:
+    import uvicorn
+    logging.disable(logging.INFO)
+    from asgi_app import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=8192)
+
+
+def _run_flask(port: int) -> None:
+    from werkzeug.serving import make_server
+    logging.disable(logging.INFO)
+    from app import app
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+# ──────────────────────────── driver ────────────────────────────
+async def _drive(url: str, streams: int, points: int) -> tuple[float, np.ndarray, int]:
+    """Open `streams` concurrent SSE requests; returns (wall s, latencies, failures)."""
+    # several small pools – one pool with thousands of connections is itself the bottleneck
+    clients = [httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=64))
+               for _ in range(max(1, streams // 64))]
+
+    async def one(i):
+        # far from any Austin hotspot so every point goes to the LLM
+        seq = [dict(latitude=40.0 + i * 1e-3, longitude=-100.0 - j * 1e-3) for j in range(points)]
+        t0 = time.perf_counter()
+        try:
+            resp = await clients[i % len(clients)].post(url, json=dict(gps_sequence=seq, pipeline_width=points))
+            ok = resp.status_code == 200 and resp.text.count("data: ") == points + 1
+        except httpx.HTTPError:
+            ok = False
+        return time.perf_counter() - t0, ok
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(streams)))
+    wall = time.perf_counter() - t0
+    for client in clients:
+        await client.aclose()
+    lat = np.array([r[0] for r in results])
+    return wall, lat, sum(not r[1] for r in results)
+
+
+def _bench(name: str, target, streams: int, points: int) -> None:
+    port = _free_port()
+    proc = mp.Process(target=target, args=(port,), daemon=True)
+    proc.start()
+    try:
+        _wait_port(port)
+        wall, lat, failed = asyncio.run(_drive(f"http://127.0.0.1:{port}/stream_route", streams, points))
+    finally:
+        proc.terminate()
+    print(f"{name:>6} {streams:>8} {wall:>8.2f} {streams * points / wall:>10.0f}"
+          f" {np.percentile(lat, 50) * 1e3:>9.0f} {np.percentile(lat, 95) * 1e3:>9.0f} {failed:>7}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--streams", type=int, default=2000)
+    ap.add_argument("--points", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.5, help="fake OpenAI latency (s)")
+    ap.add_argument("--flask", action="store_true", help="also run the threaded Flask server")
+    args = ap.parse_args(argv)
+
+    openai_port = _free_port()
+    stub = mp.Process(target=_run_openai, args=(openai_port, args.latency), daemon=True)
+    stub.start()
+    _wait_port(openai_port)
+    # inherited by the server processes
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    print(f"{'server':>6} {'streams':>8} {'wall s':>8} {'points/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'failed':>7}")
+    try:
+        _bench("asgi", _run_asgi, args.streams, args.points)
+        if args.flask:
+            _bench("flask", _run_flask, args.streams, args.points)
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Latency / throughput suite with a JSON record for comparing runs.
+
+    python -m benchmarks.suite --out bench.json
+    python -m benchmarks.suite --out new.json --compare bench.json   # exit 1 on regression
+
+Micro benchmarks (crash binning, route scoring, hotspot lookups and loading)
+run on synthetic data of increasing size. The end-to-end cases drive
+/analyze_route and /stream_route through the Flask app with Google
+Directions and OpenAI replaced by the local stand-ins in tests/stub_servers,
+answering after `--directions-latency` / `--llm-latency` seconds. Every
+request uses distinct inputs so the response caches never short-circuit it.
+
+Each case records p50 / p95 / mean latency per call and calls per second;
+--compare flags any p50 or p95 that grew, or throughput that fell, by more
+than --tolerance.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import itertools
+import contextlib
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.synthetic import AUSTIN, make_crash_data, make_route
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = {  # per case: full run, --quick
+    "identify_crash_hotspots": ([10_000, 100_000, 1_000_000], [10_000]),
+    "calculate_safety_score":  ([10, 100, 1_000], [10]),
+    "calculate_safety_score_at": ([10, 100, 1_000], [10]),
+    "is_in_hotspot":           ([1], [1]),
+    "load_hotspot_polygons":   ([1], [1]),
+    "analyze_route":           ([1, 8], [1]),
+    "stream_route":            ([5, 20], [5]),
+}
+
+
+# ─────────────────────────── cases ───────────────────────────
+# each returns (fn(i) doing one call, calls to time, concurrency)
+def case_identify_crash_hotspots(size, ctx):
+    from Route_Safety import identify_crash_hotspots
+    data = make_crash_data(size)
+    return lambda i: identify_crash_hotspots(data.copy()), 5 if size >= 1_000_000 else 20, 1
+
+
+def case_calculate_safety_score(size, ctx):
+    from Route_Safety import calculate_safety_score
+    model = ctx.model()
+    routes = [make_route(size, seed=s) for s in range(8)]
+    return lambda i: calculate_safety_score(routes[i % 8], model), 50, 1
+
+
+def case_calculate_safety_score_at(size, ctx):
+    # time-aware: RiskCube lookups at each step's hour of week
+    from Route_Safety import calculate_safety_score
+    cube = ctx.risk_cube()
+    routes = [make_route(size, seed=s) for s in range(8)]
+    return lambda i: calculate_safety_score(routes[i % 8], cube, departure="2024-03-08 17:00"), 50, 1
+
+
+def case_is_in_hotspot(size, ctx):
+    from Route_Safety import is_in_hotspot, get_hotspot_index
+    get_hotspot_index()                          # load outside the timed calls
+    rng = np.random.default_rng(0)
+    pts = np.column_stack([AUSTIN[0] + rng.uniform(-0.2, 0.2, 1000),
+                           AUSTIN[1] + rng.uniform(-0.2, 0.2, 1000)])
+    return lambda i: is_in_hotspot(*pts[i % len(pts)]), 2_000, 1
+
+
+def case_load_hotspot_polygons(size, ctx):
+    from Route_Safety import load_hotspot_polygons, HOTSPOT_GEOJSON
+    return lambda i: load_hotspot_polygons(os.path.join(ROOT, HOTSPOT_GEOJSON)), 10, 1
+
+
+def case_analyze_route(concurrency, ctx):
+    app = ctx.flask_app()
+    n = 40 * concurrency
+
+    def call(i):
+        # distinct origin per call: a Directions cache hit would skip the stand-in
+        resp = app.test_client().post("/analyze_route",
+                                      json=dict(start=f"Austin, TX #{ctx.nonce()}", end="Houston, TX"))
+        assert resp.status_code == 200, resp.data
+    return call, n, concurrency
+
+
+def case_stream_route(points, ctx):
+    app = ctx.flask_app()
+
+    def call(i):
+        # far from any Austin hotspot, fresh coordinates: every point reaches the LLM
+        base = 40.0 + ctx.nonce() * 1e-3
+        seq = [dict(latitude=base, longitude=-100.0 - j * 1e-3) for j in range(points)]
+        resp = app.test_client().post("/stream_route", json=dict(gps_sequence=seq))
+        assert resp.get_data(as_text=True).count("data: ") == points + 1
+    return call, 20, 1
+
+
+CASES = {name[len("case_"):]: fn for name, fn in globals().items() if name.startswith("case_")}
+
+
+class Context:
+    """Lazily built shared fixtures: trained model, stand-in servers, Flask app."""
+
+    def __init__(self, directions_latency: float, llm_latency: float):
+        self.directions_latency = directions_latency
+        self.llm_latency = llm_latency
+        self._model = self._app = self._cube = None
+        self._servers = []
+        self._counter = itertools.count()
+
+    def nonce(self) -> int:
+        return next(self._counter)        # unique across cases and threads
+
+    def model(self):
+        if self._model is None:
+            from Route_Safety import identify_crash_hotspots, train_model
+            self._model = train_model(identify_crash_hotspots(make_crash_data(20_000)), out_path=None)
+        return self._model
+
+    def risk_cube(self):
+        if self._cube is None:
+            import pandas as pd
+            from risk_cube import RiskCube, TIMESTAMP, cube_partials
+            data = make_crash_data(20_000)
+            rng = np.random.default_rng(0)
+            data[TIMESTAMP] = (pd.Timestamp("2024-01-01")
+                               + pd.to_timedelta(rng.integers(0, 365 * 86_400, len(data)), unit="s"))
+            self._cube = RiskCube.compile(self.model(), cube_partials(data, 0.01))
+        return self._cube
+
+    def flask_app(self):
+        if self._app is None:
+            sys.path.append(os.path.join(ROOT, "tests"))
+            from stub_servers import FakeDirectionsServer, FakeOpenAIServer
+            directions = FakeDirectionsServer(latency=self.directions_latency).__enter__()
+            llm = FakeOpenAIServer(latency=self.llm_latency).__enter__()
+            self._servers += [directions, llm]
+            # the module-level OpenAI client reads these when first used
+            os.environ["OPENAI_BASE_URL"] = llm.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+            import Route_Safety
+            from directions_client import DirectionsClient
+            Route_Safety._directions_client = DirectionsClient(base_url=directions.url, retries=0)
+            import app as app_module
+            app_module.set_safety_model(self.model())
+            self._app = app_module.app
+        return self._app
+
+    def close(self):
+        for server in self._servers:
+            server.__exit__(None, None, None)
+
+
+# ─────────────────────────── runner ───────────────────────────
+def run_case(fn, calls: int, concurrency: int, warmup: int = 2) -> dict:
+    for i in range(warmup):
+        fn(i)
+
+    def timed(i):
+        t0 = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            lat = np.fromiter(pool.map(timed, range(calls)), float, calls)
+    else:
+        lat = np.fromiter((timed(i) for i in range(calls)), float, calls)
+    wall = time.perf_counter() - t0
+    return dict(calls=calls, concurrency=concurrency,
+                p50_ms=float(np.percentile(lat, 50) * 1e3),
+                p95_ms=float(np.percentile(lat, 95) * 1e3),
+                mean_ms=float(lat.mean() * 1e3),
+                ops_per_s=calls / wall)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_suite(only: str = None, quick: bool = False, directions_latency: float = 0.02,
+              llm_latency: float = 0.05) -> dict:
+    ctx = Context(directions_latency, llm_latency)
+    results = []
+    try:
+        for name, case in CASES.items():
+            if only and not re.search(only, name):
+                continue
+            for size in SIZES[name][quick]:
+                with contextlib.redirect_stdout(io.StringIO()):   # per-request prints
+                    fn, calls, concurrency = case(size, ctx)
+                    if quick:
+                        calls = max(5, calls // 10)
+                    res = dict(name=name, size=size, **run_case(fn, calls, concurrency))
+                print(f"{name:>24} {size:>9} {res['p50_ms']:>9.2f} {res['p95_ms']:>9.2f}"
+                      f" {res['ops_per_s']:>10.1f}", flush=True)
+                results.append(res)
+    finally:
+        ctx.close()
+    return dict(
+        meta=dict(commit=_git_commit(), python=platform.python_version(),
+                  machine=platform.machine(), cpus=os.cpu_count(), time=time.time(),
+                  quick=quick, directions_latency=directions_latency, llm_latency=llm_latency),
+        results=results,
+    )
+
+
+def compare(new: dict, base: dict, tolerance: float = 0.2) -> list[str]:
+    """Regressions of `new` against `base`: p50/p95 up or ops/s down by more than `tolerance`."""
+    before = {(r["name"], r["size"]): r for r in base["results"]}
+    problems = []
+    for r in new["results"]:
+        old = before.get((r["name"], r["size"]))
+        if old is None:
+            continue
+        label = f"{r['name']}[{r['size']}]"
+        for key in ("p50_ms", "p95_ms"):
+            if r[key] > old[key] * (1 + tolerance):
+                problems.append(f"{label} {key} {old[key]:.2f} → {r[key]:.2f}")
+        if r["ops_per_s"] < old["ops_per_s"] * (1 - tolerance):
+            problems.append(f"{label} ops_per_s {old['ops_per_s']:.1f} → {r['ops_per_s']:.1f}")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--out", help="write results to this JSON file")
+    ap.add_argument("--compare", help="baseline JSON from an earlier run")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    ap.add_argument("--only", help="regex on case names")
+    ap.add_argument("--quick", action="store_true", help="smallest sizes, fewer calls")
+    ap.add_argument("--directions-latency", type=float, default=0.02, help="fake Directions latency (s)")
+    ap.add_argument("--llm-latency", type=float, default=0.05, help="fake OpenAI latency (s)")
+    args = ap.parse_args(argv)
+
+    print(f"{'case':>24} {'size':>9} {'p50 ms':>9} {'p95 ms':>9} {'ops/s':>10}")
+    logging.disable(logging.INFO)
+    try:
+        report = run_suite(args.only, args.quick, args.directions_latency, args.llm_latency)
+    finally:
+        logging.disable(logging.NOTSET)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for line in problems:
+            print("REGRESSION", line)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Synthetic crash data and Directions-style routes for the benchmarks."""
+import numpy as np
+import pandas as pd
+
+AUSTIN = (30.2672, -97.7431)
+
+
+def make_crash_data(n_rows: int, seed: int = 0, spread: float = 0.25) -> pd.DataFrame:
+    """Crash records scattered around Austin with the columns load_crash_data keeps."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'latitude':     AUSTIN[0] + rng.uniform(-spread, spread, n_rows),
+        'longitude':    AUSTIN[1] + rng.uniform(-spread, spread, n_rows),
+        'crash_sev_id': rng.integers(1, 6, n_rows),
+    })
+
+
+def make_route(n_steps: int, seed: int = 0, spread: float = 0.2) -> dict:
+    """A single-leg route whose steps walk randomly around Austin."""
+    rng = np.random.default_rng(seed)
+    lats = AUSTIN[0] + rng.uniform(-spread, spread, n_steps)
+    lngs = AUSTIN[1] + rng.uniform(-spread, spread, n_steps)
+    steps = [
+        {
+            'end_location': {'lat': float(lat), 'lng': float(lng)},
+            'html_instructions': f'Step {i}',
+            'duration': {'value': 60},
+        }
+        for i, (lat, lng) in enumerate(zip(lats, lngs))
+    ]
+    return {
+        'legs': [{
+            'distance': {'text': f'{n_steps} mi'},
+            'duration': {'value': 60 * n_steps},
+            'steps': steps,
+        }]
+    }
@@ -0,0 +1,188 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with an optional per-entry TTL (seconds)."""
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires, value = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def update(self, key: str, fn, ttl: Optional[float] = None):
+        """Set `key` to fn(current value, or None) under the lock; returns the new value."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            item = self._data.get(key)
+            now = time.monotonic()
+            value = fn(item[1] if item is not None and (item[0] is None or item[0] > now) else None)
+            self._data[key] = (None if ttl is None else now + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, size=len(self))
+
+
+class SqliteCache:
+    """
+    Persistent cache in a sqlite file, shared by every worker process on the
+    host. Values are stored as JSON, so they must be JSON-serialisable.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, maxsize: Optional[int] = None):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        with self._conn() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS cache ("
+                       " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                       " expires REAL, touched REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; sqlite handles cross-process locking
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        with self._conn() as db:
+            row = db.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                db.execute("UPDATE cache SET touched = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return json.loads(row[0])
+            if row is not None:
+                db.execute("DELETE FROM cache WHERE key = ?", (key,))
+        self.misses += 1
+        return default
+
+    def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires = None if ttl is None else now + ttl
+        with self._conn() as db:
+            self._put(db, key, value, expires, now)
+
+    def update(self, key: str, fn, ttl: Optional[float] = None):
+        """
+        Set `key` to fn(current value, or None) in one write transaction, so
+        concurrent updates – from any thread or process – never lose one
+        another's changes. Returns the new value.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._conn() as db:
+            db.execute("BEGIN IMMEDIATE")          # take the write lock before reading
+            row = db.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            value = fn(json.loads(row[0]) if row is not None and (row[1] is None or row[1] > now) else None)
+            self._put(db, key, value, None if ttl is None else now + ttl, now)
+        return value
+
+    def _put(self, db: sqlite3.Connection, key: str, value, expires, now: float) -> None:
+        db.execute("INSERT OR REPLACE INTO cache (key, value, expires, touched) VALUES (?, ?, ?, ?)",
+                   (key, json.dumps(value), expires, now))
+        if self.maxsize is not None:
+            db.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache"
+                       " ORDER BY touched DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+
+    def delete(self, key: str) -> None:
+        with self._conn() as db:
+            db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._conn() as db:
+            db.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, size=len(self))
+
+
+class TieredCache:
+    """In-memory LRU in front of an optional persistent tier (e.g. SqliteCache)."""
+
+    def __init__(self, memory: LRUCache, persistent=None):
+        self.memory = memory
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is _MISSING and self.persistent is not None:
+            value = self.persistent.get(key, _MISSING)
+            if value is not _MISSING:
+                self.memory.set(key, value)      # promote
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        self.memory.set(key, value, ttl)
+        if self.persistent is not None:
+            self.persistent.set(key, value, ttl)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, size=len(self.memory))
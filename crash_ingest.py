@@ -0,0 +1,173 @@
+"""
+Out‑of‑core crash ingestion.
+
+aggregate_hotspots(path) gives the same frame as
+identify_crash_hotspots(load_crash_data(path)) without holding the file in
+memory: only latitude/longitude/crash_sev_id are parsed, a chunk at a time,
+and each chunk is folded into per‑cell (sum, count) partials that are merged
+at the end. Peak memory is one chunk plus the number of occupied cells.
+
+CSV files are split into byte ranges (aligned to line starts) so chunks can
+be parsed in parallel worker processes; Parquet files are read by row group.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['latitude', 'longitude', 'crash_sev_id']
+# coordinates stay float64 so the cell binning matches the in‑memory path bit for bit;
+# severity codes are small integers, exact in float32
+DTYPES = {'latitude': 'float64', 'longitude': 'float64', 'crash_sev_id': 'float32'}
+
+
+def _is_parquet(path: str) -> bool:
+    return path.endswith((".parquet", ".pq"))
+
+
+def cell_partials(chunk: pd.DataFrame, grid_size: float) -> pd.DataFrame:
+    """Per‑cell severity sum/count of one chunk, indexed by integer cell (k_lat, k_lng)."""
+    chunk = chunk[COLUMNS].dropna()
+    return (
+        pd.DataFrame({
+            'k_lat': chunk['latitude'].to_numpy() // grid_size,
+            'k_lng': chunk['longitude'].to_numpy() // grid_size,
+            'sev_sum': chunk['crash_sev_id'].to_numpy(dtype=np.float64),
+        })
+        .groupby(['k_lat', 'k_lng'], sort=False)['sev_sum']
+        .agg(['sum', 'count'])
+    )
+
+
+def _empty_partials(grid_size: float) -> pd.DataFrame:
+    return cell_partials(pd.DataFrame(columns=COLUMNS, dtype=float), grid_size)
+
+
+def merge_partials(parts: list) -> pd.DataFrame:
+    """Add up (sum, count) partials; the result is sorted by cell."""
+    return pd.concat(parts).groupby(level=['k_lat', 'k_lng']).sum()
+
+
+def coarsen(cells: pd.DataFrame, factor: int) -> pd.DataFrame:
+    """
+    Merge `factor` × `factor` blocks of (sum, count) cells into one, i.e. the
+    partials at `factor` times the grid size without re‑reading the data.
+    """
+    if factor == 1:
+        return cells
+    k_lat = cells.index.get_level_values('k_lat').to_numpy() // factor
+    k_lng = cells.index.get_level_values('k_lng').to_numpy() // factor
+    return cells.groupby([pd.Index(k_lat, name='k_lat'), pd.Index(k_lng, name='k_lng')]).sum()
+
+
+def finalize(cells: pd.DataFrame, grid_size: float) -> pd.DataFrame:
+    """(sum, count) per cell → the lat_bin/lng_bin/crash_sev_id mean frame."""
+    k_lat = cells.index.get_level_values('k_lat').to_numpy(dtype=float)
+    k_lng = cells.index.get_level_values('k_lng').to_numpy(dtype=float)
+    return pd.DataFrame({
+        'lat_bin': k_lat * grid_size,
+        'lng_bin': k_lng * grid_size,
+        'crash_sev_id': cells['sum'].to_numpy() / cells['count'].to_numpy(),
+    })
+
+
+# ───────────────────────────── CSV ─────────────────────────────
+def _csv_ranges(path: str, block_bytes: int) -> tuple[list[str], list[tuple[int, int]]]:
+    with open(path, "rb") as f:
+        header = f.readline()
+        body_start = f.tell()
+    names = pd.read_csv(io.BytesIO(header), nrows=0).columns.tolist()
+    size = os.path.getsize(path)
+    starts = range(body_start, size, block_bytes)
+    return names, [(s, min(s + block_bytes, size)) for s in starts]
+
+
+def _read_block(path: str, start: int, end: int) -> bytes:
+    """Whole lines whose first byte falls in [start, end)."""
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()                  # finish the line that straddles `start`
+        pos = f.tell()
+        if pos >= end:
+            return b""
+        data = f.read(end - pos)
+        if not data.endswith(b"\n"):
+            data += f.readline()
+    return data
+
+
+def _csv_block_partials(path: str, names: list[str], start: int, end: int,
+                        grid_size: float) -> pd.DataFrame:
+    data = _read_block(path, start, end)
+    if not data.strip():
+        return _empty_partials(grid_size)
+    chunk = pd.read_csv(io.BytesIO(data), header=None, names=names,
+                        usecols=COLUMNS, dtype=DTYPES)
+    return cell_partials(chunk, grid_size)
+
+
+def _csv_partials(path: str, grid_size: float, chunk_rows: int, workers: int):
+    if workers <= 1:
+        for chunk in pd.read_csv(path, usecols=COLUMNS, dtype=DTYPES, chunksize=chunk_rows):
+            yield cell_partials(chunk, grid_size)
+        return
+
+    # byte ranges sized like `chunk_rows` rows of this file; assumes no quoted
+    # newlines inside records (true for the crash exports)
+    with open(path, "rb") as f:
+        f.readline()
+        sample = f.read(1 << 20)
+    bytes_per_row = max(1, len(sample) // max(1, sample.count(b"\n")))
+    names, ranges = _csv_ranges(path, chunk_rows * bytes_per_row)
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_csv_block_partials, path, names, s, e, grid_size) for s, e in ranges]
+        for fut in futures:
+            yield fut.result()
+
+
+# ─────────────────────────── Parquet ───────────────────────────
+def _parquet_group_partials(path: str, group: int, grid_size: float) -> pd.DataFrame:
+    import pyarrow.parquet as pq
+
+    table = pq.ParquetFile(path).read_row_group(group, columns=COLUMNS)
+    return cell_partials(table.to_pandas(), grid_size)
+
+
+def _parquet_partials(path: str, grid_size: float, chunk_rows: int, workers: int):
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    if workers <= 1:
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=COLUMNS):
+            yield cell_partials(batch.to_pandas(), grid_size)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_parquet_group_partials, path, g, grid_size)
+                   for g in range(pf.num_row_groups)]
+        for fut in futures:
+            yield fut.result()
+
+
+# ───────────────────────────── API ─────────────────────────────
+def aggregate_cells(path: str, grid_size: float = 0.01, chunk_rows: int = 500_000,
+                    workers: int = 1, merge_every: int = 16) -> pd.DataFrame:
+    """Per‑cell (sum, count) of a CSV or Parquet crash file, sorted by cell."""
+    read = _parquet_partials if _is_parquet(path) else _csv_partials
+    pending = []
+    for part in read(path, grid_size, chunk_rows, workers):
+        pending.append(part)
+        if len(pending) > merge_every:           # keep the partials list short
+            pending = [merge_partials(pending)]
+    return merge_partials(pending) if pending else _empty_partials(grid_size)
+
+
+def aggregate_hotspots(path: str, grid_size: float = 0.01, chunk_rows: int = 500_000,
+                       workers: int = 1) -> pd.DataFrame:
+    """
+    Streamed identify_crash_hotspots(load_crash_data(path)) for a CSV or
+    Parquet file. `workers` > 1 parses chunks in that many processes.
+    """
+    return finalize(aggregate_cells(path, grid_size, chunk_rows, workers), grid_size)
@@ -0,0 +1,191 @@
+import json
+import sys
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+from cache import LRUCache
+
+DIRECTIONS_URL = "https://maps.googleapis.com/maps/api/directions/json"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Directions answers that are not the API failing
+OK_STATUSES = ("OK", "ZERO_RESULTS", "NOT_FOUND")
+
+
+def _norm(place: str) -> str:
+    return " ".join(str(place).lower().split())
+
+
+class DirectionsClient:
+    """
+    Google Directions client with
+
+      • one pooled keep‑alive `requests.Session` (timeouts + retry/backoff),
+      • a response cache (LRUCache, SqliteCache, or anything with get/set),
+      • request coalescing – concurrent identical lookups share one HTTP call.
+
+    routes_async() is the asyncio twin (pooled httpx.AsyncClient) sharing the
+    same cache, for the ASGI server.
+    """
+
+    def __init__(self, base_url: str = DIRECTIONS_URL, cache=None,
+                 timeout: tuple[float, float] = (3.05, 10.0), retries: int = 3,
+                 backoff: float = 0.3, pool_size: int = 20, ttl: float = 300.0):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.ttl = ttl
+        self.cache = cache if cache is not None else LRUCache(maxsize=512, ttl=ttl)
+
+        retry = Retry(total=retries, backoff_factor=backoff,
+                      status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset(["GET"]), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._ainflight: dict[str, asyncio.Future] = {}
+        self._ahttp = []
+        self._ahttp_loop = None
+        self._ahttp_next = 0
+
+    @staticmethod
+    def cache_key(origin: str, destination: str, mode: str = "driving") -> str:
+        return f"directions|{_norm(origin)}|{_norm(destination)}|{_norm(mode)}"
+
+    def routes(self, api_key: str, origin: str, destination: str, mode: str = "driving") -> list:
+        """Routes (with alternatives) for origin → destination; [] on API errors."""
+        key = self.cache_key(origin, destination, mode)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+        if not leader:
+            return fut.result()
+
+        try:
+            routes = self._fetch(api_key, origin, destination, mode)
+            if routes:                       # never cache failures / empty answers
+                self.cache.set(key, routes, self.ttl)
+            fut.set_result(routes)
+            return routes
+        except BaseException as exc:
+            fut.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    @staticmethod
+    def _params(api_key: str, origin: str, destination: str, mode: str) -> dict:
+        return {
+            "origin": origin,
+            "destination": destination,
+            "mode": mode,
+            "alternatives": "true",
+            "key": api_key
+        }
+
+    @staticmethod
+    def _parse(status_code: int, text: str) -> list:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            print(f"Bad JSON (HTTP {status_code}): {text}", file=sys.stderr)
+            metrics.failure("directions")
+            return []
+
+        print("Google Maps API status:", data.get("status"), "| HTTP", status_code, file=sys.stderr)
+        if data.get("error_message"):
+            print("Google Maps error_message:", data["error_message"], file=sys.stderr)
+        if status_code != 200 or data.get("status") not in OK_STATUSES:
+            metrics.failure("directions")
+
+        return data.get("routes", []) if status_code == 200 and data.get("status") == "OK" else []
+
+    def _fetch(self, api_key: str, origin: str, destination: str, mode: str) -> list:
+        try:
+            resp = self.session.get(self.base_url, params=self._params(api_key, origin, destination, mode),
+                                    timeout=self.timeout)
+        except requests.RequestException:
+            metrics.failure("directions")
+            raise
+        return self._parse(resp.status_code, resp.text)
+
+    # ───────────────────────────── asyncio ─────────────────────────────
+    async def routes_async(self, api_key: str, origin: str, destination: str,
+                           mode: str = "driving") -> list:
+        """
+        Async routes(): same cache, coalescing via one task per lookup. Every
+        caller awaits the task through asyncio.shield, so a cancelled request
+        stops waiting without cancelling the lookup for the others.
+        """
+        key = self.cache_key(origin, destination, mode)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._ainflight.get(key)
+        if task is None:
+            task = self._ainflight[key] = asyncio.ensure_future(
+                self._lookup_async(key, api_key, origin, destination, mode))
+            # mark the outcome retrieved even when every waiter was cancelled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    async def _lookup_async(self, key: str, api_key: str, origin: str, destination: str,
+                            mode: str) -> list:
+        try:
+            routes = await self._fetch_async(api_key, origin, destination, mode)
+            if routes:
+                self.cache.set(key, routes, self.ttl)
+            return routes
+        finally:
+            self._ainflight.pop(key, None)
+
+    def _async_http(self, shards: int = 8):
+        """Round‑robin over a few small httpx pools (see LLMCache.async_client)."""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._ahttp_loop is not loop:
+            limits = httpx.Limits(max_connections=self.pool_size * 4,
+                                  max_keepalive_connections=self.pool_size)
+            timeout = httpx.Timeout(self.timeout[1], connect=self.timeout[0])
+            self._ahttp = [
+                httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(retries=self.retries, limits=limits),
+                                  timeout=timeout)
+                for _ in range(shards)
+            ]
+            self._ahttp_loop = loop
+        self._ahttp_next = (self._ahttp_next + 1) % len(self._ahttp)
+        return self._ahttp[self._ahttp_next]
+
+    async def _fetch_async(self, api_key: str, origin: str, destination: str, mode: str) -> list:
+        params = self._params(api_key, origin, destination, mode)
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self._async_http().get(self.base_url, params=params)
+            except Exception:            # httpx.HTTPError; httpx is imported lazily
+                metrics.failure("directions")
+                raise
+            if resp.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+        return self._parse(resp.status_code, resp.text)
@@ -0,0 +1,105 @@
+"""
+A fitted RandomForestRegressor flattened into a handful of numpy arrays.
+
+    flat = FlatForest.from_forest(model)
+    flat.predict(X)                  # same numbers as model.predict(X)
+
+Every tree's nodes are concatenated into shared feature / threshold / child
+/ value arrays; `roots` holds each tree's first node. Leaves point at
+themselves, so predict() walks all (sample, tree) pairs down one level per
+vectorised step, dropping the pairs that reached a leaf, and averages the
+leaf values. There is no input validation, joblib dispatch or per‑tree
+Python call, which is most of what sklearn spends on a one‑row predict; on
+large batches of deep trees sklearn's compiled traversal is still faster
+(and GridLookupModel faster than both).
+"""
+import numpy as np
+import pandas as pd
+
+from grid_model import FEATURES
+
+
+class FlatForest:
+    """
+    feature   (n_nodes,) int8     split feature of each node (0 on leaves)
+    threshold (n_nodes,) float64  go left when x[feature] <= threshold
+    left      (n_nodes,) int32    child node ids; a leaf's children are itself
+    right     (n_nodes,) int32
+    value     (n_nodes,) float64  mean target of the node
+    roots     (n_trees,) int32    first node of each tree
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, value: np.ndarray, roots: np.ndarray,
+                 chunk_rows: int = 8_192):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.chunk_rows = chunk_rows
+
+    @classmethod
+    def from_forest(cls, model) -> "FlatForest":
+        """Flatten a fitted single‑output RandomForestRegressor (or any list of its trees)."""
+        trees = [est.tree_ for est in getattr(model, "estimators_", model)]
+        sizes = np.array([t.node_count for t in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        feature, threshold, left, right, value = [], [], [], [], []
+        for t, off in zip(trees, offsets):
+            ids = np.arange(t.node_count)
+            leaf = t.children_left < 0
+            feature.append(np.where(leaf, 0, t.feature))
+            threshold.append(np.where(leaf, 0.0, t.threshold))
+            left.append(np.where(leaf, ids, t.children_left) + off)
+            right.append(np.where(leaf, ids, t.children_right) + off)
+            value.append(t.value[:, 0, 0])
+        return cls(np.concatenate(feature).astype(np.int8), np.concatenate(threshold),
+                   np.concatenate(left).astype(np.int32), np.concatenate(right).astype(np.int32),
+                   np.concatenate(value).astype(np.float64), offsets.astype(np.int32))
+
+    def __len__(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right,
+                                      self.value, self.roots))
+
+    # ───────────────────────────── predict ─────────────────────────────
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        n, n_trees = X.shape[0], len(self.roots)
+        node = np.tile(self.roots, n)                    # pair i = (sample i // n_trees, tree)
+        offset = np.repeat(np.arange(n) * X.shape[1], n_trees)
+        flat_x = X.ravel()
+        active = np.arange(node.size)
+        while active.size:
+            at = node[active]
+            go_left = flat_x[offset[active] + self.feature[at]] <= self.threshold[at]
+            step = np.where(go_left, self.left[at], self.right[at])
+            node[active] = step
+            active = active[step != at]                  # a leaf steps to itself
+        return self.value[node].reshape(n, n_trees).mean(axis=1)
+
+    def predict(self, X) -> np.ndarray:
+        """Mean leaf value over the trees for each [lat, lng] row."""
+        if isinstance(X, pd.DataFrame):
+            X = X[FEATURES].to_numpy()
+        # sklearn compares float32 features against float64 thresholds; so do we
+        X = np.asarray(X, dtype=np.float32).reshape(-1, len(FEATURES))
+        if len(X) <= self.chunk_rows:
+            return self._predict(X)
+        return np.concatenate([self._predict(X[i:i + self.chunk_rows])
+                               for i in range(0, len(X), self.chunk_rows)])
+
+    # ────────────────────────── persistence ──────────────────────────
+    def save(self, path) -> None:
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, value=self.value, roots=self.roots)
+
+    @classmethod
+    def load(cls, path: str) -> "FlatForest":
+        with np.load(path) as npz:
+            return cls(npz['feature'], npz['threshold'], npz['left'], npz['right'],
+                       npz['value'], npz['roots'])
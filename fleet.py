@@ -0,0 +1,257 @@
+"""
+Bulk route analysis for fleet trip lists.
+
+    analyze_trips(trips, model, directions, ...)  →  one result dict per trip, in order
+
+Directions are fetched on a thread pool (rate‑limited, through the shared
+DirectionsClient cache). Trips are scored in batches – every route of every
+trip in a batch in one model.predict – either in‑process or on a pool of
+worker processes that inherit the already loaded model (fork) instead of
+each loading their own.
+
+A Directions recording (SqliteCache file, see RecordedDirections) lets the
+same trip list be re‑scored offline, e.g. after the model is retrained.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from directions_client import DirectionsClient
+from pipeline import prefetch_map
+
+
+# ───────────────────────────── input ─────────────────────────────
+def _trip(row: dict, i: int) -> dict:
+    if not isinstance(row, dict):
+        raise ValueError(f"trip {i}: expected an object with origin and destination")
+    origin = row.get("origin") or row.get("start")
+    destination = row.get("destination") or row.get("end")
+    if not (origin and destination):
+        raise ValueError(f"trip {i}: origin and destination are required")
+    return dict(id=row.get("id", i), origin=str(origin), destination=str(destination))
+
+
+def parse_trips(rows) -> list[dict]:
+    """[{id?, origin|start, destination|end}, …] → normalised trips (ValueError if malformed)."""
+    return [_trip(row, i) for i, row in enumerate(rows)]
+
+
+def read_trips(path: str) -> list[dict]:
+    """Trips from a CSV (origin,destination[,id] header) or a JSONL file."""
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            return parse_trips(json.loads(line) for line in f if line.strip())
+        return parse_trips(csv.DictReader(f))
+
+
+# ─────────────────────────── directions ───────────────────────────
+class RateLimiter:
+    """Token bucket shared by threads: at most `rate` calls per second, bursts of `burst`."""
+
+    def __init__(self, rate: float, burst: int = None):
+        if not rate > 0:
+            raise ValueError(f"rate must be > 0 calls/s, not {rate!r} (use no limiter for no limit)")
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1                 # reserve a slot, possibly in the future
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+def rate_limiter(rate: float):
+    """RateLimiter at `rate` calls/s, or None – no limit – when rate <= 0."""
+    return RateLimiter(rate) if rate > 0 else None
+
+
+class RecordedDirections:
+    """
+    Directions answered only from a recording – the SqliteCache a
+    DirectionsClient(cache=SqliteCache(path), ttl=None) filled. No network;
+    trips that were never recorded get no routes.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def routes(self, api_key: str, origin: str, destination: str, mode: str = "driving") -> list:
+        return self.cache.get(DirectionsClient.cache_key(origin, destination, mode)) or []
+
+
+def fetch_routes(trips, directions, api_key: str = None, concurrency: int = 8,
+                 limiter: RateLimiter = None):
+    """Yield (trip, routes) in trip order, `concurrency` lookups in flight."""
+    def lookup(trip):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return trip, directions.routes(api_key, trip["origin"], trip["destination"])
+        except Exception as exc:             # one bad trip must not end the run
+            print(f"Directions failed for trip {trip['id']}: {exc}", file=sys.stderr)
+            return trip, []
+    return prefetch_map(lookup, trips, concurrency)
+
+
+# ──────────────────────────── scoring ────────────────────────────
+def _slim(route: dict) -> dict:
+    """Only what scoring and the summary read – far less to pickle to a worker."""
+    return dict(
+        summary=route.get("summary", ""),
+        overview_polyline=route.get("overview_polyline", {}),
+        legs=[dict(distance=leg.get("distance", {}), duration=leg["duration"],
+                   steps=[{k: s[k] for k in ("start_location", "end_location", "polyline") if k in s}
+                          for s in leg["steps"]])
+              for leg in route["legs"]],
+    )
+
+
+def score_batch(batch: list, model, mode: str = "steps", spacing_m: float = 100.0) -> list[dict]:
+    """Result per (trip, routes) pair; every route in the batch is scored in one predict."""
+    from Route_Safety import calculate_safety_scores
+
+    all_routes = [r for _, routes in batch for r in routes]
+    scores = calculate_safety_scores(all_routes, model, mode, spacing_m) if all_routes else []
+    results, i = [], 0
+    for trip, routes in batch:
+        per_route = [
+            dict(safety_score=score, duration=mins, summary=r.get("summary", ""),
+                 distance=r["legs"][0].get("distance", {}).get("text", ""))
+            for r, (score, mins) in zip(routes, scores[i:i + len(routes)])
+        ]
+        i += len(routes)
+        result = dict(trip, routes=per_route)
+        if per_route:
+            result["safest_index"] = int(np.argmax([r["safety_score"] for r in per_route]))
+        else:
+            result["error"] = "No routes found"
+        results.append(result)
+    return results
+
+
+# model for worker processes: inherited on fork, or sent once per worker otherwise
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    if model is not None:
+        _worker_model = model
+
+
+def _score_in_worker(batch, mode, spacing_m):
+    return score_batch(batch, _worker_model, mode, spacing_m)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _batches(pairs, size: int):
+    batch = []
+    for pair in pairs:
+        batch.append(pair)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def analyze_trips(trips, model, directions, api_key: str = None, *, mode: str = "steps",
+                  spacing_m: float = 100.0, concurrency: int = 8, limiter: RateLimiter = None,
+                  workers: int = 1, batch_size: int = 64):
+    """
+    Yield one result per trip, in order:
+      {id, origin, destination, routes: [{safety_score, duration, distance, summary}],
+       safest_index}   – or `error` instead of safest_index when there are no routes.
+
+    `workers` > 1 scores batches in that many processes, each holding the one
+    `model` (copy‑on‑write after fork). Memory is bounded: only a few batches
+    are fetched or scored ahead of the consumer.
+    """
+    if workers <= 1:
+        pairs = fetch_routes(trips, directions, api_key, concurrency, limiter)
+        for batch in _batches(pairs, batch_size):
+            yield from score_batch(batch, model, mode, spacing_m)
+        return
+
+    global _worker_model
+    fork = "fork" in mp.get_all_start_methods()
+    _worker_model = model if fork else None
+    pool = ProcessPoolExecutor(workers, mp_context=mp.get_context("fork" if fork else None),
+                               initializer=_init_worker, initargs=(None if fork else model,))
+    try:
+        # start every worker now, before the fetch threads exist (fork + threads don't mix)
+        for fut in [pool.submit(_ready) for _ in range(workers)]:
+            fut.result()
+        pairs = fetch_routes(trips, directions, api_key, concurrency, limiter)
+        batches = (
+            [(trip, [_slim(r) for r in routes]) for trip, routes in batch]
+            for batch in _batches(pairs, batch_size)
+        )
+        def score(batch):
+            return pool.submit(_score_in_worker, batch, mode, spacing_m).result()
+
+        for results in prefetch_map(score, batches, workers * 2):
+            yield from results
+    finally:
+        pool.shutdown(cancel_futures=True)
+        _worker_model = None
+
+
+# ──────────────────────────── output ────────────────────────────
+def write_jsonl(results, out) -> int:
+    """One JSON object per line to a path or open text file; returns the count."""
+    if isinstance(out, str):
+        with open(out, "w") as f:
+            return write_jsonl(results, f)
+    n = 0
+    for n, result in enumerate(results, 1):
+        out.write(json.dumps(result) + "\n")
+    return n
+
+
+def _flatten(result: dict) -> list[dict]:
+    base = dict(id=str(result["id"]), origin=result["origin"], destination=result["destination"])
+    if not result["routes"]:
+        return [dict(base, route_index=None, safety_score=None, duration=None, distance=None,
+                     summary=None, safest=None, error=result.get("error"))]
+    return [dict(base, route_index=i, safest=i == result["safest_index"], error=None, **route)
+            for i, route in enumerate(result["routes"])]
+
+
+def write_parquet(results, path: str, rows_per_group: int = 10_000) -> int:
+    """One row per (trip, route), written a row group at a time; returns the trip count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("id", pa.string()), ("origin", pa.string()), ("destination", pa.string()),
+                        ("route_index", pa.int32()), ("safety_score", pa.float64()),
+                        ("duration", pa.float64()), ("distance", pa.string()),
+                        ("summary", pa.string()), ("safest", pa.bool_()), ("error", pa.string())])
+    n, rows = 0, []
+    with pq.ParquetWriter(path, schema) as writer:
+        for n, result in enumerate(results, 1):
+            rows += _flatten(result)
+            if len(rows) >= rows_per_group:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                rows = []
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    return n
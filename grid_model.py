@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+FEATURES = ['lat_bin', 'lng_bin']
+
+
+class GridLookupModel:
+    """
+    A safety model "compiled" into a dense raster over the hotspot grid.
+
+    The forest is only ever trained on `lat_bin`/`lng_bin` cell origins, so
+    its output is evaluated once per cell origin and stored. predict() then
+    snaps each point to its cell exactly like identify_crash_hotspots does
+    (`(x // grid_size)`) and reads the array. Points outside the raster go to
+    `fallback` (usually the original forest) or, without one, to the nearest
+    edge cell.
+
+    This is not the forest evaluated at the raw coordinate. The forest's
+    split thresholds fall between training origins – at half‑cell midpoints,
+    or anywhere inside a cell where a bootstrap sample skipped rows – so
+    across one cell it answers with a mix of neighbouring cells' leaves. A
+    raw point can therefore score anything the forest predicts within its
+    cell; on fully grown forests the two disagree for most raw points, on
+    average by a little under the cell‑to‑cell spread. The raster gives every
+    point the value learned for its own cell, which is what the training
+    data describes.
+    """
+
+    def __init__(self, values: np.ndarray, lat_idx0: int, lng_idx0: int,
+                 grid_size: float, fallback=None):
+        self.values = values
+        self.lat_idx0 = int(lat_idx0)
+        self.lng_idx0 = int(lng_idx0)
+        self.grid_size = float(grid_size)
+        self.fallback = fallback
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.values.shape
+
+    # ───────────────────────────── build ─────────────────────────────
+    @classmethod
+    def compile(cls, model, hotspot_df: pd.DataFrame, grid_size: float = 0.01,
+                chunk_rows: int = 500_000, keep_fallback: bool = True) -> "GridLookupModel":
+        """Evaluate `model` on every cell of the bounding box of `hotspot_df`."""
+        lat_k = np.rint(hotspot_df['lat_bin'].to_numpy() / grid_size).astype(np.int64)
+        lng_k = np.rint(hotspot_df['lng_bin'].to_numpy() / grid_size).astype(np.int64)
+        lat_idx0, lng_idx0 = int(lat_k.min()), int(lng_k.min())
+        n_lat = int(lat_k.max()) - lat_idx0 + 1
+        n_lng = int(lng_k.max()) - lng_idx0 + 1
+
+        # same floats identify_crash_hotspots produces: k * grid_size
+        lat_bins = np.arange(lat_idx0, lat_idx0 + n_lat, dtype=float) * grid_size
+        lng_bins = np.arange(lng_idx0, lng_idx0 + n_lng, dtype=float) * grid_size
+
+        values = np.empty(n_lat * n_lng, dtype=np.float32)
+        rows_per_chunk = max(1, chunk_rows // n_lng)
+        for start in range(0, n_lat, rows_per_chunk):
+            lat_chunk = lat_bins[start:start + rows_per_chunk]
+            grid = pd.DataFrame({
+                'lat_bin': np.repeat(lat_chunk, n_lng),
+                'lng_bin': np.tile(lng_bins, len(lat_chunk)),
+            })
+            values[start * n_lng:(start + len(lat_chunk)) * n_lng] = model.predict(grid)
+
+        return cls(values.reshape(n_lat, n_lng), lat_idx0, lng_idx0, grid_size,
+                   fallback=model if keep_fallback else None)
+
+    def with_cells(self, lat_k, lng_k, cell_values) -> "GridLookupModel":
+        """
+        Copy of this raster with cells (integer indices `x // grid_size`) set to
+        `cell_values`, grown to cover them if needed. The copy leaves `self`
+        untouched, so a serving process can swap models without locking.
+        """
+        lat_k = np.asarray(lat_k, dtype=np.int64)
+        lng_k = np.asarray(lng_k, dtype=np.int64)
+        n_lat, n_lng = self.values.shape
+        lat0 = min(self.lat_idx0, int(lat_k.min(initial=self.lat_idx0)))
+        lng0 = min(self.lng_idx0, int(lng_k.min(initial=self.lng_idx0)))
+        lat1 = max(self.lat_idx0 + n_lat, int(lat_k.max(initial=lat0)) + 1)
+        lng1 = max(self.lng_idx0 + n_lng, int(lng_k.max(initial=lng0)) + 1)
+
+        # new border cells: the fallback's prediction, or the nearest edge value
+        pad = ((self.lat_idx0 - lat0, lat1 - self.lat_idx0 - n_lat),
+               (self.lng_idx0 - lng0, lng1 - self.lng_idx0 - n_lng))
+        values = np.pad(self.values, pad, mode="edge")
+        if self.fallback is not None and values.size > self.values.size:
+            fresh = np.ones(values.shape, dtype=bool)
+            fresh[pad[0][0]:pad[0][0] + n_lat, pad[1][0]:pad[1][0] + n_lng] = False
+            rows, cols = np.nonzero(fresh)
+            cells = pd.DataFrame({'lat_bin': (rows + lat0) * self.grid_size,
+                                  'lng_bin': (cols + lng0) * self.grid_size})
+            values[rows, cols] = self.fallback.predict(cells)
+
+        values[lat_k - lat0, lng_k - lng0] = cell_values
+        return GridLookupModel(values, lat0, lng0, self.grid_size, fallback=self.fallback)
+
+    # ───────────────────────────── query ─────────────────────────────
+    def cell_index(self, lats, lngs) -> tuple[np.ndarray, np.ndarray]:
+        """Raster row/col for each point (may fall outside the raster)."""
+        rows = np.floor_divide(np.asarray(lats, dtype=float), self.grid_size).astype(np.int64) - self.lat_idx0
+        cols = np.floor_divide(np.asarray(lngs, dtype=float), self.grid_size).astype(np.int64) - self.lng_idx0
+        return rows, cols
+
+    def predict(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            X = X[FEATURES].to_numpy(dtype=float)
+        X = np.asarray(X, dtype=float).reshape(-1, 2)
+        rows, cols = self.cell_index(X[:, 0], X[:, 1])
+        n_lat, n_lng = self.values.shape
+        inside = (rows >= 0) & (rows < n_lat) & (cols >= 0) & (cols < n_lng)
+
+        if inside.all():
+            return self.values[rows, cols].astype(float)
+
+        out = np.empty(len(X), dtype=float)
+        out[inside] = self.values[rows[inside], cols[inside]]
+        outside = ~inside
+        if self.fallback is not None:
+            out[outside] = self.fallback.predict(pd.DataFrame(X[outside], columns=FEATURES))
+        else:
+            out[outside] = self.values[np.clip(rows[outside], 0, n_lat - 1),
+                                       np.clip(cols[outside], 0, n_lng - 1)]
+        return out
+
+    # ────────────────────────── persistence ──────────────────────────
+    def save(self, path: str) -> None:
+        np.savez(path, values=self.values,
+                 origin=np.array([self.lat_idx0, self.lng_idx0], dtype=np.int64),
+                 grid_size=np.array(self.grid_size))
+
+    @classmethod
+    def load(cls, path: str, fallback=None) -> "GridLookupModel":
+        with np.load(path) as npz:
+            lat_idx0, lng_idx0 = npz['origin']
+            return cls(npz['values'], lat_idx0, lng_idx0, float(npz['grid_size']),
+                       fallback=fallback)
@@ -0,0 +1,23 @@
+"""
+gunicorn settings: load the model and hotspot index once in the master,
+then fork workers that share them copy‑on‑write.
+
+    gunicorn app:app                                        # Flask
+    gunicorn asgi_app:app -k uvicorn.workers.UvicornWorker  # ASGI
+
+WEB_WORKERS (default: CPU count) and PORT (8080) override the defaults.
+Preloading means code changes need a full restart, not a HUP.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_WORKERS", os.cpu_count() or 1))
+preload_app = True
+
+
+def when_ready(server):
+    # runs in the master after the app is imported, before any worker forks;
+    # only the model and the geometry load here – no sockets or sqlite handles
+    import app
+    app.preload()
+    server.log.info("model and hotspot index preloaded for %d workers", workers)
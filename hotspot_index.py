@@ -0,0 +1,239 @@
+import threading
+from typing import Optional
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import Point
+
+# meters → degrees (approx.), same conversion Route_Safety has always used
+M_PER_DEG = 111_320.0
+
+
+class HotspotIndex:
+    """
+    R-tree over the crash-hotspot polygons.
+
+    Polygons are buffered once per buffer size and the buffered set gets its
+    own STRtree, so a lookup is a tree query over a handful of candidates
+    instead of a scan over every zone.
+    """
+
+    def __init__(self, polygons, bboxes: Optional[np.ndarray] = None, version: str = ""):
+        self.polygons = list(polygons)
+        self.version = version              # identifies the source data (HTTP ETags)
+        self._geoms = np.asarray(self.polygons, dtype=object)
+        self._tree = STRtree(self._geoms)
+        # overall extent (minx, miny, maxx, maxy): points outside skip the tree
+        if len(self.polygons):
+            b = shapely.bounds(self._geoms) if bboxes is None else np.asarray(bboxes)
+            self.extent = (b[:, 0].min(), b[:, 1].min(), b[:, 2].max(), b[:, 3].max())
+        else:
+            self.extent = None
+        self._buffered: dict[float, STRtree] = {}
+        self._simplified: dict[float, np.ndarray] = {}
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.polygons)
+
+    def buffered_tree(self, buffer_m: float) -> STRtree:
+        """
+        STRtree over the polygons buffered by `buffer_m` (built once, cached).
+        The buffered polygons are prepared before the tree is published and
+        are read‑only from then on, so trackers on many threads share them.
+        """
+        tree = self._buffered.get(buffer_m)
+        if tree is None:
+            with self._lock:
+                tree = self._buffered.get(buffer_m)
+                if tree is None:
+                    buffered = shapely.buffer(self._geoms, buffer_m / M_PER_DEG)
+                    shapely.prepare(buffered)
+                    tree = STRtree(buffered)
+                    self._buffered[buffer_m] = tree
+        return tree
+
+    def simplified(self, tolerance_deg: float) -> np.ndarray:
+        """All polygons simplified to `tolerance_deg` (computed once per tolerance)."""
+        if tolerance_deg <= 0:
+            return self._geoms
+        geoms = self._simplified.get(tolerance_deg)
+        if geoms is None:
+            with self._lock:
+                geoms = self._simplified.get(tolerance_deg)
+                if geoms is None:
+                    geoms = shapely.simplify(self._geoms, tolerance_deg, preserve_topology=True)
+                    self._simplified[tolerance_deg] = geoms
+        return geoms
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """(P, 2) lng/lat centroid of every polygon."""
+        if self._centroids is None:
+            self._centroids = shapely.get_coordinates(shapely.centroid(self._geoms)).reshape(-1, 2)
+        return self._centroids
+
+    def query_bbox(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> np.ndarray:
+        """Sorted indices of the polygons intersecting a lng/lat box."""
+        if not self.polygons:
+            return np.empty(0, dtype=np.int64)
+        hits = self._tree.query(shapely.box(min_lng, min_lat, max_lng, max_lat), predicate="intersects")
+        return np.sort(hits)
+
+    def buffered_within(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float,
+                        buffer_m: float = 50) -> np.ndarray:
+        """Polygons grown by `buffer_m` that intersect a lng/lat box."""
+        if not self.polygons:
+            return np.empty(0, dtype=object)
+        tree = self.buffered_tree(buffer_m)
+        ids = tree.query(shapely.box(min_lng, min_lat, max_lng, max_lat), predicate="intersects")
+        return tree.geometries.take(ids)
+
+    def shards(self, bbox, limit=None) -> list[tuple[str, "HotspotIndex"]]:
+        """(name, index) of every part covering bbox – one unnamed part here (see regions)."""
+        return [("", self)]
+
+    def warm(self, buffer_m: float = 50) -> None:
+        """Build the lazily computed structures now (before a fork)."""
+        self.buffered_tree(buffer_m)
+        self.centroids
+
+    def contains(self, lat: float, lng: float, buffer_m: float = 50) -> bool:
+        """True if (lat, lng) lies inside any hotspot grown by `buffer_m` metres."""
+        if not self.polygons:
+            return False
+        hits = self.buffered_tree(buffer_m).query(Point(lng, lat), predicate="within")
+        return hits.size > 0
+
+    def nearest(self, lat: float, lng: float,
+                max_distance_m: Optional[float] = None) -> Optional[tuple[int, float]]:
+        """
+        Return (polygon index, distance in metres) of the closest hotspot,
+        or None if there is none within `max_distance_m`. Distance is 0 inside a zone.
+        """
+        if not self.polygons:
+            return None
+        max_deg = None if max_distance_m is None else max_distance_m / M_PER_DEG
+        idx, dist = self._tree.query_nearest(Point(lng, lat), max_distance=max_deg,
+                                             return_distance=True, all_matches=False)
+        if idx.size == 0:
+            return None
+        return int(idx[0]), float(dist[0]) * M_PER_DEG
+
+    def mask(self, lats, lngs, buffer_m: float = 50) -> np.ndarray:
+        """Vectorised `contains` → boolean array, one entry per (lat, lng)."""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        out = np.zeros(lats.shape, dtype=bool)
+        if not self.polygons or lats.size == 0:
+            return out
+        pad = buffer_m / M_PER_DEG
+        minx, miny, maxx, maxy = self.extent
+        flat_lat, flat_lng = lats.ravel(), lngs.ravel()
+        near = np.flatnonzero((flat_lng >= minx - pad) & (flat_lng <= maxx + pad)
+                              & (flat_lat >= miny - pad) & (flat_lat <= maxy + pad))
+        if near.size == 0:
+            return out
+        pts = shapely.points(flat_lng[near], flat_lat[near])
+        hit_pts, _ = self.buffered_tree(buffer_m).query(pts, predicate="within")
+        out.ravel()[near[hit_pts]] = True
+        return out
+
+    def distances(self, lats, lngs, max_distance_m: Optional[float] = None) -> np.ndarray:
+        """
+        Vectorised `nearest` → distance in metres to the closest hotspot for each
+        point (0 inside a zone, inf when nothing lies within `max_distance_m`).
+        """
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        out = np.full(lats.shape, np.inf)
+        if not self.polygons or lats.size == 0:
+            return out
+        max_deg = None if max_distance_m is None else max_distance_m / M_PER_DEG
+        pts = shapely.points(lngs.ravel(), lats.ravel())
+        (pt_idx, _), dist = self._tree.query_nearest(pts, max_distance=max_deg,
+                                                      return_distance=True, all_matches=False)
+        out.ravel()[pt_idx] = dist * M_PER_DEG
+        return out
+
+
+class HotspotTracker:
+    """
+    Hotspot state of one moving vehicle, fix after fix.
+
+    Keeps the (buffered) zones within `radius_m` of where the neighbourhood
+    was last fetched and only goes back to the index once the vehicle gets
+    within `lookahead_m` of that neighbourhood's edge – so at 10 Hz nearly
+    every update() is a test against a handful of nearby polygons.
+
+    update() returns (in_hotspot, metres to the next zone straight ahead or
+    None). The heading comes from successive fixes; moves shorter than
+    `min_move_m` (GPS jitter) keep the last heading.
+    """
+
+    def __init__(self, index: HotspotIndex, lookahead_m: float = 300, buffer_m: float = 50,
+                 radius_m: float = 2_000, min_move_m: float = 3):
+        if radius_m <= lookahead_m:
+            raise ValueError("radius_m must be larger than lookahead_m")
+        self.index = index
+        self.lookahead_m = lookahead_m
+        self.buffer_m = buffer_m
+        self.radius_m = radius_m
+        self.min_move_m = min_move_m
+        self.heading = None                  # (east, north) unit vector
+        self.refreshes = 0
+        self.updates = 0
+        self._centre = None
+        self._zones = np.empty(0, dtype=object)
+        self._last = None
+
+    def _refresh(self, lat: float, lng: float, cos_lat: float) -> None:
+        self.refreshes += 1
+        self._centre = (lat, lng)
+        dlat = self.radius_m / M_PER_DEG
+        dlng = dlat / cos_lat
+        # already prepared by buffered_tree: shared across streams, never mutated here
+        self._zones = self.index.buffered_within(lng - dlng, lat - dlat, lng + dlng, lat + dlat,
+                                                 self.buffer_m)
+
+    def update(self, lat: float, lng: float) -> tuple[bool, Optional[float]]:
+        self.updates += 1
+        cos_lat = max(np.cos(np.radians(lat)), 1e-6)
+        if self._last is not None:
+            east = (lng - self._last[1]) * M_PER_DEG * cos_lat
+            north = (lat - self._last[0]) * M_PER_DEG
+            moved = np.hypot(east, north)
+            if moved >= self.min_move_m:
+                self.heading = (east / moved, north / moved)
+                self._last = (lat, lng)
+        else:
+            self._last = (lat, lng)
+
+        # the look‑ahead ray must stay inside the cached neighbourhood
+        margin = self.radius_m - self.lookahead_m
+        if (self._centre is None
+                or abs(lat - self._centre[0]) * M_PER_DEG > margin
+                or abs(lng - self._centre[1]) * M_PER_DEG * cos_lat > margin):
+            self._refresh(lat, lng, cos_lat)
+        if self._zones.size == 0:
+            return False, None
+
+        if shapely.contains_xy(self._zones, lng, lat).any():
+            return True, None
+        if self.heading is None:
+            return False, None
+        east, north = self.heading
+        ray = shapely.LineString([(lng, lat),
+                                  (lng + east * self.lookahead_m / (M_PER_DEG * cos_lat),
+                                   lat + north * self.lookahead_m / M_PER_DEG)])
+        hits = self._zones[shapely.intersects(self._zones, ray)]
+        if hits.size == 0:
+            return False, None
+        entry = shapely.get_coordinates(shapely.intersection(hits, ray))
+        along = shapely.line_locate_point(ray, shapely.points(entry), normalized=True)
+        return False, float(along.min()) * self.lookahead_m
+
+    def stats(self) -> dict:
+        return dict(updates=self.updates, refreshes=self.refreshes, zones=int(self._zones.size))
@@ -0,0 +1,90 @@
+"""
+Compact binary form of the hotspot GeoJSON.
+
+    <dir>/coords.npy    (N, 2) float64 lng/lat of every ring vertex, ring after ring
+    <dir>/offsets.npy   (P + 1,) int64 start of ring i in coords (offsets[-1] == N)
+    <dir>/bboxes.npy    (P, 4) float64 minx, miny, maxx, maxy per polygon
+    <dir>/meta.json     format version + the GeoJSON stat it was built from
+
+The arrays are memory‑mapped on load – pages are shared between worker
+processes through the page cache – and turned into shapely polygons with one
+vectorised call instead of a Python loop per vertex.
+"""
+import os
+import json
+from typing import NamedTuple
+
+import numpy as np
+import shapely
+
+from model_store import _atomic_write, _write_json
+
+FORMAT_VERSION = 1
+
+
+class HotspotArrays(NamedTuple):
+    coords: np.ndarray
+    offsets: np.ndarray
+    bboxes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+def geojson_to_arrays(geojson_path: str) -> HotspotArrays:
+    """Outer rings of the GeoJSON polygons (stored lat/lng) → lng/lat arrays."""
+    with open(geojson_path) as f:
+        features = json.load(f).get("features", [])
+    rings = [np.asarray(feat["geometry"]["coordinates"][0], dtype=float).reshape(-1, 2)[:, ::-1]
+             for feat in features]
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(r) for r in rings])
+    coords = np.ascontiguousarray(np.concatenate(rings)) if rings else np.empty((0, 2))
+    bboxes = np.array([[*r.min(axis=0), *r.max(axis=0)] for r in rings]).reshape(-1, 4)
+    return HotspotArrays(coords, offsets, bboxes)
+
+
+def _source_stamp(geojson_path: str) -> dict:
+    st = os.stat(geojson_path)
+    return dict(size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+
+def _save_npy(path: str, arr: np.ndarray) -> None:
+    with open(path, "wb") as f:        # file object: np.save won't add a suffix
+        np.save(f, arr)
+
+
+def build_hotspot_store(geojson_path: str, out_dir: str) -> HotspotArrays:
+    """Convert the GeoJSON once; each file is written atomically, meta.json last."""
+    arrays = geojson_to_arrays(geojson_path)
+    os.makedirs(out_dir, exist_ok=True)
+    for name, arr in arrays._asdict().items():
+        _atomic_write(os.path.join(out_dir, f"{name}.npy"), lambda tmp, arr=arr: _save_npy(tmp, arr))
+    _write_json(os.path.join(out_dir, "meta.json"),
+                dict(version=FORMAT_VERSION, polygons=len(arrays),
+                     source=_source_stamp(geojson_path)))
+    return arrays
+
+
+def is_current(geojson_path: str, out_dir: str) -> bool:
+    """True if `out_dir` holds a store built from the GeoJSON as it is now."""
+    try:
+        with open(os.path.join(out_dir, "meta.json")) as f:
+            meta = json.load(f)
+        return meta.get("version") == FORMAT_VERSION and meta.get("source") == _source_stamp(geojson_path)
+    except (OSError, ValueError):
+        return False
+
+
+def load_hotspot_store(out_dir: str, mmap: bool = True) -> HotspotArrays:
+    mode = "r" if mmap else None
+    return HotspotArrays(*(np.load(os.path.join(out_dir, f"{name}.npy"), mmap_mode=mode)
+                           for name in HotspotArrays._fields))
+
+
+def polygons_from_arrays(arrays: HotspotArrays) -> np.ndarray:
+    """All polygons in one vectorised shapely call → object array."""
+    if len(arrays) == 0:
+        return np.empty(0, dtype=object)
+    ring_ids = np.repeat(np.arange(len(arrays)), np.diff(arrays.offsets))
+    return shapely.polygons(shapely.linearrings(arrays.coords, indices=ring_ids))
@@ -0,0 +1,115 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+
+import metrics
+from cache import LRUCache, SqliteCache, TieredCache
+
+
+def completion_key(model: str, messages: list[dict], **params) -> str:
+    """Stable key for a chat completion: model + prompt + sampling parameters."""
+    blob = json.dumps(dict(model=model, messages=messages, params=params), sort_keys=True)
+    return "llm|" + hashlib.sha256(blob.encode()).hexdigest()
+
+
+class LLMCache:
+    """
+    Memoised OpenAI chat completions. Identical (model, messages, params)
+    requests are answered from the cache – LRU in memory, optionally backed
+    by a sqlite file shared between processes – with hit/miss counters.
+    """
+
+    def __init__(self, maxsize: int = 2048, persistent_path: str = None, ttl: float = None,
+                 async_shards: int = 32, async_pool: int = 32):
+        persistent = SqliteCache(persistent_path, ttl=ttl) if persistent_path else None
+        self.cache = TieredCache(LRUCache(maxsize=maxsize, ttl=ttl), persistent)
+        self._lock = threading.Lock()
+        self.calls = 0          # completions actually sent to the API
+        self.async_shards = max(1, async_shards)
+        self.async_pool = async_pool
+        self._aclients = []
+        self._aclient_loop = None
+        self._aclient_next = 0
+
+    @property
+    def hits(self) -> int:
+        return self.cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self.cache.misses
+
+    def stats(self) -> dict:
+        return dict(self.cache.stats(), calls=self.calls)
+
+    def complete(self, model: str, messages: list[dict], **params) -> str:
+        """Stripped completion text for this request, from cache when possible."""
+        key = completion_key(model, messages, **params)
+        text = self.cache.get(key)
+        if text is not None:
+            return text
+
+        import openai
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+        try:
+            with metrics.span("llm"):
+                resp = openai.chat.completions.create(model=model, messages=messages, **params)
+        except Exception:
+            metrics.failure("openai")
+            raise
+        text = resp.choices[0].message.content.strip()
+        with self._lock:
+            self.calls += 1
+        self.cache.set(key, text)
+        return text
+
+    def async_client(self):
+        """
+        openai.AsyncOpenAI client for the running loop, round‑robin over
+        `async_shards` clients. httpcore's pool bookkeeping is linear in its
+        connection count per request, so one pool with thousands of
+        in‑flight calls goes quadratic; several small pools stay flat.
+        """
+        import httpx
+        import openai
+
+        loop = asyncio.get_running_loop()
+        if self._aclient_loop is not loop:
+            limits = httpx.Limits(max_connections=self.async_pool,
+                                  max_keepalive_connections=self.async_pool)
+            self._aclients = [
+                openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"),
+                                   http_client=httpx.AsyncClient(limits=limits, timeout=600.0))
+                for _ in range(self.async_shards)
+            ]
+            self._aclient_loop = loop
+        self._aclient_next = (self._aclient_next + 1) % len(self._aclients)
+        return self._aclients[self._aclient_next]
+
+    async def _off_loop(self, fn, *args):
+        """Cache get/set; in a worker thread when the sqlite tier makes it blocking."""
+        if self.cache.persistent is None:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def complete_async(self, model: str, messages: list[dict], **params) -> str:
+        """Async complete() for the ASGI server; shares the same cache."""
+        key = completion_key(model, messages, **params)
+        text = await self._off_loop(self.cache.get, key)
+        if text is not None:
+            return text
+
+        try:
+            with metrics.span("llm"):
+                resp = await self.async_client().chat.completions.create(
+                    model=model, messages=messages, **params)
+        except Exception:
+            metrics.failure("openai")
+            raise
+        text = resp.choices[0].message.content.strip()
+        with self._lock:
+            self.calls += 1
+        await self._off_loop(self.cache.set, key, text)
+        return text
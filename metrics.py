@@ -0,0 +1,219 @@
+"""
+In‑process latency histograms and counters, rendered in the Prometheus text
+format for /metrics.
+
+    with metrics.span("google_routes"):
+        ...
+
+METRICS=1 turns collection on. When it is off, span() hands back one shared
+no‑op context manager and failure() returns at once, so the instrumented code
+pays a function call per site. SERVER_TIMING=1 additionally reports the
+spans of each request in a Server-Timing response header (only spans that
+finish before the headers are sent – not the body of a stream).
+
+Values are per process; with several workers, scrape each one or put a
+Prometheus aggregator in front.
+"""
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import nullcontext
+
+enabled = os.getenv("METRICS", "0") == "1"
+server_timing = enabled and os.getenv("SERVER_TIMING", "0") == "1"
+
+# seconds; covers an in‑memory lookup up to a slow LLM answer
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(name: str, value: str, extra: str = "") -> str:
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'{{{name}="{value}"{extra}}}'
+
+
+class Histogram:
+    """Latency histogram with one label (e.g. span name)."""
+
+    def __init__(self, name: str, help: str, label: str, buckets=BUCKETS):
+        self.name, self.help, self.label = name, help, label
+        self.buckets = tuple(buckets)
+        self._series: dict[str, list] = {}       # label → [bucket counts…, +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label: str, seconds: float) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += seconds
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for label, series in sorted(snapshot.items()):
+            total = 0
+            for bound, n in zip(self.buckets + ("+Inf",), series):
+                total += n
+                le = f',le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label, label, le)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.label, label)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label, label)} {total}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one label."""
+
+    def __init__(self, name: str, help: str, label: str):
+        self.name, self.help, self.label = name, help, label
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label: str, n: float = 1) -> None:
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + n
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"] + [
+            f"{self.name}{_labels(self.label, label)} {value}" for label, value in sorted(values.items())
+        ]
+
+
+SPANS = Histogram("smartdrive_span_seconds", "Time spent in instrumented sections.", "span")
+REQUESTS = Histogram("smartdrive_request_seconds", "Time to response headers per endpoint.", "endpoint")
+FAILURES = Counter("smartdrive_external_failures_total", "Failed calls to external APIs.", "service")
+
+# name → callable returning a cache's stats() dict (or None), read at scrape
+# time – the caches keep their own counters, so a hit costs nothing extra
+_cache_collectors: dict[str, callable] = {}
+
+
+def register_cache(name: str, stats) -> None:
+    """Report the hits/misses of `stats()` (a cache's stats dict, or None) under `name`."""
+    _cache_collectors[name] = stats
+
+
+# ─────────────────────────── spans ───────────────────────────
+_request_spans: contextvars.ContextVar = contextvars.ContextVar("request_spans", default=None)
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.t0
+        SPANS.observe(self.name, seconds)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((self.name, seconds))
+        return False
+
+
+_NULL = nullcontext()
+
+
+def span(name: str):
+    """Context manager timing a section into smartdrive_span_seconds{span=name}."""
+    return _Span(name) if enabled else _NULL
+
+
+def timed_iter(name: str, iterable):
+    """
+    Iterate `iterable`, timing how long each item takes to arrive (e.g. the
+    wait before every SSE event). Closing the wrapper closes `iterable`.
+    """
+    return _timed_iter(name, iterable) if enabled else iterable
+
+
+def _timed_iter(name, iterable):
+    it = iter(iterable)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            SPANS.observe(name, time.perf_counter() - t0)
+            yield item
+    finally:
+        if hasattr(it, "close"):
+            it.close()
+
+
+def atimed_iter(name: str, aiterable):
+    """Async timed_iter()."""
+    return _atimed_iter(name, aiterable) if enabled else aiterable
+
+
+async def _atimed_iter(name, aiterable):
+    it = aiterable.__aiter__()
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = await it.__anext__()
+            except StopAsyncIteration:
+                return
+            SPANS.observe(name, time.perf_counter() - t0)
+            yield item
+    finally:
+        if hasattr(it, "aclose"):
+            await it.aclose()
+
+
+def failure(service: str) -> None:
+    """Count a failed call to an external service."""
+    if enabled:
+        FAILURES.inc(service)
+
+
+# ──────────────────────── per request ────────────────────────
+def start_request():
+    """Begin collecting this request's spans; returns a token for end_request()."""
+    return _request_spans.set([]) if server_timing else None
+
+
+def end_request(token, endpoint: str, seconds: float) -> str:
+    """Record the request; returns its Server-Timing header value ('' if off)."""
+    REQUESTS.observe(endpoint, seconds)
+    if token is None:
+        return ""
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    totals: dict[str, float] = {}
+    for name, secs in spans:
+        totals[name] = totals.get(name, 0.0) + secs
+    totals["total"] = seconds
+    return ", ".join(f"{name};dur={secs * 1e3:.1f}" for name, secs in totals.items())
+
+
+# ─────────────────────────── export ───────────────────────────
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = SPANS.render() + REQUESTS.render() + FAILURES.render()
+    hits, misses = [], []
+    for name, stats in sorted(_cache_collectors.items()):
+        s = stats()
+        if s:
+            hits.append(f"smartdrive_cache_hits_total{_labels('cache', name)} {s['hits']}")
+            misses.append(f"smartdrive_cache_misses_total{_labels('cache', name)} {s['misses']}")
+    lines += ["# HELP smartdrive_cache_hits_total Cache lookups answered from the cache.",
+              "# TYPE smartdrive_cache_hits_total counter", *hits,
+              "# HELP smartdrive_cache_misses_total Cache lookups that missed.",
+              "# TYPE smartdrive_cache_misses_total counter", *misses]
+    return "\n".join(lines) + "\n"
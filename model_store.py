@@ -0,0 +1,190 @@
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# bump when the artifact layout or training pipeline changes incompatibly
+ARTIFACT_VERSION = 1
+
+
+def file_digest(path: str, chunk_bytes: int = 1 << 20) -> str:
+    """sha256 of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_bytes), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _atomic_write(path: str, write) -> None:
+    """Write via a temp file + os.replace so concurrent readers never see half a file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_json(path: str, obj) -> None:
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(obj, f, indent=2)
+    _atomic_write(path, write)
+
+
+class ModelStore:
+    """
+    Directory of trained safety-model artifacts keyed by
+    (crash-data content hash, grid_size, training params, library versions).
+
+      <root>/safety-<key>.joblib      fitted forest
+      <root>/safety-<key>.grid.npz    optional compiled GridLookupModel
+      <root>/safety-<key>.cube.npz    optional hour‑of‑week RiskCube
+      <root>/safety-<key>.flat.npz    optional FlatForest export of the forest
+      <root>/safety-<key>.cells.npz   per‑cell severity sum/count + applied feeds
+      <root>/safety-<key>.json        metadata (what the key was built from)
+      <root>/digests.json             file stat → sha256 cache
+    """
+
+    def __init__(self, root: str = "model_store"):
+        self.root = root
+
+    # ─────────────────────────── keys ───────────────────────────
+    def data_digest(self, data_path: str) -> str:
+        """
+        Content hash of the crash data. The hash is remembered against the
+        file's size + mtime so restarts don't re-read a large CSV.
+        """
+        st = os.stat(data_path)
+        stamp = f"{os.path.abspath(data_path)}:{st.st_size}:{st.st_mtime_ns}"
+        cache_path = os.path.join(self.root, "digests.json")
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        if stamp not in cache:
+            cache[stamp] = file_digest(data_path)
+            os.makedirs(self.root, exist_ok=True)
+            _write_json(cache_path, cache)
+        return cache[stamp]
+
+    def key_meta(self, data_path: str, grid_size: float, params: dict) -> dict:
+        """Everything an artifact depends on; hashed by key()."""
+        import sklearn
+
+        return dict(
+            version=ARTIFACT_VERSION,
+            data_sha256=self.data_digest(data_path),
+            grid_size=grid_size,
+            params=params,
+            sklearn=sklearn.__version__,
+        )
+
+    @staticmethod
+    def key(meta: dict) -> str:
+        blob = json.dumps(meta, sort_keys=True).encode()
+        return hashlib.sha256(blob).hexdigest()[:16]
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.root, f"safety-{key}{suffix}")
+
+    # ─────────────────────────── I/O ────────────────────────────
+    def load_model(self, key: str, mmap_mode: str = "r"):
+        """Return the stored forest for `key`, or None on a miss."""
+        import joblib
+
+        path = self._path(key, ".joblib")
+        if not os.path.exists(path):
+            return None
+        return joblib.load(path, mmap_mode=mmap_mode)
+
+    def save_model(self, key: str, model, meta: dict = None) -> str:
+        import joblib
+
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key, ".joblib")
+        # uncompressed so numpy buffers can be memory-mapped on load
+        _atomic_write(path, lambda p: joblib.dump(model, p))
+        if meta is not None:
+            _write_json(self._path(key, ".json"), meta)
+        return path
+
+    def grid_path(self, key: str) -> str:
+        return self._path(key, ".grid.npz")
+
+    def save_grid(self, key: str, grid) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        path = self.grid_path(key)
+
+        def write(tmp):
+            with open(tmp, "wb") as f:   # file object: np.savez won't add a suffix
+                grid.save(f)
+        _atomic_write(path, write)
+        return path
+
+    def cube_path(self, key: str) -> str:
+        return self._path(key, ".cube.npz")
+
+    def save_cube(self, key: str, cube) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        path = self.cube_path(key)
+
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                cube.save(f)
+        _atomic_write(path, write)
+        return path
+
+    def flat_path(self, key: str) -> str:
+        return self._path(key, ".flat.npz")
+
+    def save_flat(self, key: str, flat) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        path = self.flat_path(key)
+
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                flat.save(f)
+        _atomic_write(path, write)
+        return path
+
+    # ───────────────────── per‑cell aggregates ─────────────────────
+    def cells_path(self, key: str) -> str:
+        return self._path(key, ".cells.npz")
+
+    def save_cells(self, key: str, cells: pd.DataFrame, feeds: list[str] = ()) -> str:
+        """
+        Persist (sum, count) per cell together with the digests of the feeds
+        folded into them – one file, so the two can never disagree.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = self.cells_path(key)
+
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                np.savez(f,
+                         k_lat=cells.index.get_level_values('k_lat').to_numpy(dtype=float),
+                         k_lng=cells.index.get_level_values('k_lng').to_numpy(dtype=float),
+                         sum=cells['sum'].to_numpy(dtype=float),
+                         count=cells['count'].to_numpy(dtype=np.int64),
+                         feeds=np.array(list(feeds), dtype=str))
+        _atomic_write(path, write)
+        return path
+
+    def load_cells(self, key: str):
+        """(cells frame, applied feed digests) for `key`, or (None, []) on a miss."""
+        path = self.cells_path(key)
+        if not os.path.exists(path):
+            return None, []
+        with np.load(path) as npz:
+            index = pd.MultiIndex.from_arrays([npz['k_lat'], npz['k_lng']], names=['k_lat', 'k_lng'])
+            cells = pd.DataFrame({'sum': npz['sum'], 'count': npz['count']}, index=index)
+            return cells, npz['feeds'].tolist()
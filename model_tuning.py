@@ -0,0 +1,97 @@
+"""
+Forest size vs accuracy vs latency, to pick the parameters we serve.
+
+    results = sweep(hotspot_df)             # one row per configuration
+    best = pick(results, tolerance=0.02)    # smallest, then fastest, within 2 % of the best MSE
+
+The model is fitted on only two features, so depth and leaf count can
+usually be capped well below sklearn's "grow until pure" default without
+losing accuracy – and a capped forest is a fraction of the size, loads
+faster and predicts faster. Each configuration is fitted on all cores and
+measured on the same held‑out split train_model reports.
+"""
+import io
+import time
+
+import numpy as np
+
+from flat_forest import FlatForest
+
+# what the CLI sweeps: the current default first, then progressively smaller forests
+CONFIGS = [
+    dict(),
+    dict(max_depth=20),
+    dict(max_depth=16, min_samples_leaf=2),
+    dict(max_depth=12, max_leaf_nodes=2048),
+    dict(n_estimators=50, max_depth=12, max_leaf_nodes=1024),
+    dict(n_estimators=50, max_depth=10, max_leaf_nodes=512),
+    dict(n_estimators=25, max_depth=10, max_leaf_nodes=512),
+    dict(n_estimators=25, max_depth=8, max_leaf_nodes=256),
+]
+
+
+def _median_s(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def _joblib_bytes(model) -> int:
+    import joblib
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    return buf.getbuffer().nbytes
+
+
+def measure(hotspot_data, params: dict, n_jobs: int = -1, repeats: int = 50,
+            batch_rows: int = 10_000) -> dict:
+    """Fit one configuration and measure its accuracy, size and predict latency."""
+    from Route_Safety import fit_forest, model_params, split_cells
+
+    model, mse, fit_s = fit_forest(hotspot_data, params, n_jobs)
+    flat = FlatForest.from_forest(model)
+    X_te = split_cells(hotspot_data)[1]
+    one = X_te.iloc[:1]
+    batch = X_te.sample(batch_rows, replace=True, random_state=0)
+    return dict(
+        params=params,
+        effective=model_params(params),
+        mse=float(mse),
+        fit_s=fit_s,
+        nodes=int(sum(t.tree_.node_count for t in model.estimators_)),
+        model_bytes=_joblib_bytes(model),
+        flat_bytes=flat.nbytes,
+        predict_us=_median_s(lambda: model.predict(one), repeats) * 1e6,
+        flat_us=_median_s(lambda: flat.predict(one), repeats) * 1e6,
+        batch_ms=_median_s(lambda: model.predict(batch), 3) * 1e3,
+        flat_batch_ms=_median_s(lambda: flat.predict(batch), 3) * 1e3,
+    )
+
+
+def sweep(hotspot_data, configs=CONFIGS, n_jobs: int = -1, **options) -> list[dict]:
+    """measure() every configuration, printing a row as each finishes."""
+    print(f"{'#':>2} {'MSE':>7} {'fit s':>6} {'nodes':>8} {'joblib MB':>9} {'flat MB':>7}"
+          f" {'1 row µs':>8} {'flat µs':>7} {'batch ms':>8} {'flat ms':>7}  params")
+    results = []
+    for i, params in enumerate(configs):
+        r = measure(hotspot_data, params, n_jobs, **options)
+        results.append(r)
+        print(f"{i:>2} {r['mse']:>7.4f} {r['fit_s']:>6.1f} {r['nodes']:>8} {r['model_bytes'] / 2**20:>9.2f}"
+              f" {r['flat_bytes'] / 2**20:>7.2f} {r['predict_us']:>8.0f} {r['flat_us']:>7.0f}"
+              f" {r['batch_ms']:>8.1f} {r['flat_batch_ms']:>7.1f}  {params or 'default'}", flush=True)
+    return results
+
+
+def pick(results: list[dict], tolerance: float = 0.02) -> dict:
+    """
+    The smallest configuration (then the fastest on one row) whose MSE is
+    within `tolerance` (relative) of the best one measured.
+    """
+    if not results:
+        raise ValueError("no configurations measured")
+    best = min(r['mse'] for r in results)
+    eligible = [r for r in results if r['mse'] <= best * (1 + tolerance)]
+    return min(eligible, key=lambda r: (r['model_bytes'], r['flat_us']))
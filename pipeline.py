@@ -0,0 +1,55 @@
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+_END = object()
+
+
+def prefetch_map(fn, items, width: int = 4):
+    """
+    Yield fn(item) for every item, strictly in order, while up to `width`
+    items are being computed ahead on a thread pool.
+
+    Work is only submitted as results are consumed, so a slow consumer holds
+    at most `width` results in flight (backpressure). Closing the generator –
+    e.g. the SSE client disconnects – cancels everything not yet started.
+    """
+    if width <= 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    it = iter(items)
+    pool = ThreadPoolExecutor(max_workers=width, thread_name_prefix="prefetch")
+    pending = deque(pool.submit(fn, item) for item in itertools.islice(it, width))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            nxt = next(it, _END)
+            if nxt is not _END:
+                pending.append(pool.submit(fn, nxt))
+            yield result
+    finally:
+        for fut in pending:
+            fut.cancel()
+        pool.shutdown(wait=False)
+
+
+async def aprefetch_map(afn, items, width: int = 4):
+    """
+    asyncio version of prefetch_map: awaits afn(item) for up to `width` items
+    ahead as tasks, yields results in order, cancels the look‑ahead on close.
+    """
+    it = iter(items)
+    pending = deque(asyncio.ensure_future(afn(item)) for item in itertools.islice(it, max(width, 1)))
+    try:
+        while pending:
+            result = await pending.popleft()
+            nxt = next(it, _END)
+            if nxt is not _END:
+                pending.append(asyncio.ensure_future(afn(nxt)))
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
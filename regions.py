@@ -0,0 +1,362 @@
+"""
+Crash data and hotspot zones split into regions (metros), each with its own
+model and hotspot index, loaded the first time a query touches the region.
+
+    regions/manifest.json
+    {"regions": [
+        {"name": "austin", "bbox": [-98.2, 29.9, -97.3, 30.7],
+         "data": "austin/data.csv", "hotspots": "austin/high_crash_zones.geojson"},
+        ...
+    ]}
+
+bbox is west, south, east, north; relative paths resolve against the
+manifest's directory. Each region's model artifact lives in
+<store_dir>/<name>/. Loaded regions are kept in LRU order and evicted once
+their (approximate) size exceeds the memory budget; a query spanning more
+regions than fit – a coast‑to‑coast route – still works, it just loads them
+in turn.
+
+ShardedModel and ShardedHotspotIndex route every point to its region, so
+calculate_safety_scores, is_in_hotspot and friends don't know the data is
+split. Points outside every region have no crash history: the model predicts
+NaN there (dropped from the route average) and no hotspot is reported.
+Hotspot lookups (the map, the voice alerts) load only a region's hotspot
+index; its model – which may have to be trained – loads when a route is
+scored there.
+"""
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from flat_forest import FlatForest
+from grid_model import FEATURES, GridLookupModel
+from hotspot_index import HotspotIndex, M_PER_DEG
+from risk_cube import RiskCube
+
+logger = logging.getLogger(__name__)
+
+
+class Region(NamedTuple):
+    name: str
+    bbox: tuple                  # west, south, east, north
+    data: str                    # crash CSV / Parquet
+    hotspots: str                # hotspot GeoJSON
+
+    def covers(self, west: float, south: float, east: float, north: float) -> bool:
+        w, s, e, n = self.bbox
+        return w <= east and west <= e and s <= north and south <= n
+
+    def overlap(self, west: float, south: float, east: float, north: float) -> float:
+        """Area (deg²) of the bbox inside the given box."""
+        w, s, e, n = self.bbox
+        return max(0.0, min(e, east) - max(w, west)) * max(0.0, min(n, north) - max(s, south))
+
+
+def load_manifest(path: str) -> list[Region]:
+    """Regions listed in a manifest file (ValueError if malformed)."""
+    root = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        entries = json.load(f).get("regions", [])
+    regions = []
+    for i, entry in enumerate(entries):
+        try:
+            w, s, e, n = (float(v) for v in entry["bbox"])
+            name, data, hotspots = entry["name"], entry["data"], entry["hotspots"]
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(f"region {i}: name, bbox [w, s, e, n], data and hotspots required") from exc
+        if not (w < e and s < n):
+            raise ValueError(f"region {name}: bbox must be west < east and south < north")
+        regions.append(Region(name, (w, s, e, n), os.path.join(root, data), os.path.join(root, hotspots)))
+    if len({r.name for r in regions}) != len(regions):
+        raise ValueError("region names must be unique")
+    return regions
+
+
+def approx_nbytes(obj) -> int:
+    """Rough resident size of a loaded model or hotspot index."""
+    if isinstance(obj, RiskCube):
+        return (obj.rows.nbytes + obj.values.nbytes + obj.base.nbytes
+                + (approx_nbytes(obj.fallback) if obj.fallback is not None else 0))
+    if isinstance(obj, GridLookupModel):
+        return obj.values.nbytes + (approx_nbytes(obj.fallback) if obj.fallback is not None else 0)
+    if isinstance(obj, FlatForest):
+        return obj.nbytes
+    if isinstance(obj, HotspotIndex):
+        # vertices of the polygons plus their buffered copies, ~16 B per coordinate each
+        n = int(shapely.get_num_coordinates(obj._geoms).sum()) if len(obj) else 0
+        return 16 * n * (1 + len(obj._buffered))
+    trees = getattr(obj, "estimators_", None)
+    if trees is not None:
+        return sum(t.tree_.node_count * (64 + 8 * t.tree_.value.shape[-1]) for t in trees)
+    return 0
+
+
+class _Shard(NamedTuple):
+    model: object                # None: only the hotspot index was asked for
+    index: HotspotIndex
+    nbytes: int
+
+
+class RegionSet:
+    """The regions of a manifest, loaded lazily and evicted LRU beyond `memory_budget_mb`."""
+
+    def __init__(self, regions: list[Region], store_dir: str = "model_store",
+                 memory_budget_mb: float = 1024, compile_grid: bool = False, time_cube: bool = False,
+                 params: Optional[dict] = None, flat: bool = False):
+        self.regions = list(regions)
+        self.store_dir = store_dir
+        self.budget = memory_budget_mb * 2**20
+        self.compile_grid = compile_grid
+        self.time_cube = time_cube
+        self.params = params
+        self.flat = flat
+        self._bboxes = np.array([r.bbox for r in self.regions], dtype=float).reshape(-1, 4)
+        self._loaded: OrderedDict[int, _Shard] = OrderedDict()
+        self._loading: dict = {}                  # i (full shard) or (i, "index") → Future
+        self._lock = threading.Lock()              # guards _loaded / _loading, never held while loading
+        self.loads = self.evictions = 0
+
+    @classmethod
+    def from_manifest(cls, path: str, **kwargs) -> "RegionSet":
+        return cls(load_manifest(path), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    @property
+    def version(self) -> str:
+        """Changes whenever any region's hotspot file does (HTTP ETags)."""
+        stamps = []
+        for r in self.regions:
+            try:
+                st = os.stat(r.hotspots)
+                stamps.append(f"{r.name}:{st.st_size:x}-{st.st_mtime_ns:x}")
+            except OSError:
+                stamps.append(f"{r.name}:none")
+        return ",".join(stamps)
+
+    # ─────────────────────────── lookup ───────────────────────────
+    def locate(self, lats, lngs) -> np.ndarray:
+        """Region number of every point (first match in manifest order), -1 outside all."""
+        lats = np.asarray(lats, dtype=float).ravel()
+        lngs = np.asarray(lngs, dtype=float).ravel()
+        out = np.full(lats.shape, -1, dtype=np.int64)
+        for i in range(len(self.regions) - 1, -1, -1):      # reversed: earlier entries win
+            w, s, e, n = self._bboxes[i]
+            out[(lngs >= w) & (lngs <= e) & (lats >= s) & (lats <= n)] = i
+        return out
+
+    def overlapping(self, west: float, south: float, east: float, north: float) -> list[int]:
+        """Region numbers whose bbox intersects the given box."""
+        return [i for i, r in enumerate(self.regions) if r.covers(west, south, east, north)]
+
+    # ─────────────────────────── loading ───────────────────────────
+    def _load(self, region: Region) -> _Shard:
+        from Route_Safety import load_or_train_model, _load_hotspot_index
+
+        model = load_or_train_model(region.data, store_dir=os.path.join(self.store_dir, region.name),
+                                    compile_grid=self.compile_grid, time_cube=self.time_cube,
+                                    params=self.params, flat=self.flat)
+        index = _load_hotspot_index(region.hotspots, os.path.splitext(region.hotspots)[0] + ".hotspots")
+        index.buffered_tree(50)                    # counted in the budget from the start
+        return _Shard(model, index, approx_nbytes(model) + approx_nbytes(index))
+
+    def _load_index(self, region: Region) -> _Shard:
+        from Route_Safety import _load_hotspot_index
+
+        index = _load_hotspot_index(region.hotspots, os.path.splitext(region.hotspots)[0] + ".hotspots")
+        index.buffered_tree(50)
+        return _Shard(None, index, approx_nbytes(index))
+
+    def shard(self, i: int) -> _Shard:
+        """
+        Loaded model + hotspot index of region `i`, loading (and evicting) as
+        needed. A load – possibly training a forest – runs outside the set's
+        lock: other regions stay available, and callers wanting the same
+        region wait for the one load in flight.
+        """
+        return self._resident(i, full=True)
+
+    def hotspot_index(self, i: int) -> HotspotIndex:
+        """Hotspot index of region `i`, loading only that – never the model – if not resident."""
+        return self._resident(i, full=False).index
+
+    def _resident(self, i: int, full: bool) -> _Shard:
+        key = i if full else (i, "index")
+        with self._lock:
+            shard = self._loaded.get(i)
+            if shard is not None and (shard.model is not None or not full):
+                self._loaded.move_to_end(i)
+                return shard
+            # an index-only caller can take a full load already in flight
+            pending = self._loading.get(i) or self._loading.get(key)
+            if pending is None:
+                pending = self._loading[key] = Future()
+                loader = True
+            else:
+                loader = False
+        if not loader:
+            return pending.result()
+
+        logger.info("Loading region %s%s …", self.regions[i].name, "" if full else " hotspots")
+        try:
+            shard = self._load(self.regions[i]) if full else self._load_index(self.regions[i])
+        except BaseException as exc:
+            with self._lock:
+                del self._loading[key]
+            pending.set_exception(exc)
+            raise
+        with self._lock:
+            current = self._loaded.get(i)
+            if current is not None and current.model is not None:
+                shard = current                    # a full load finished meanwhile
+            self._loaded[i] = shard
+            self._loaded.move_to_end(i)
+            del self._loading[key]
+            self.loads += 1
+            # callers hold their own reference, so evicting never pulls a shard from under them
+            while len(self._loaded) > 1 and self.resident_bytes() > self.budget:
+                self._loaded.popitem(last=False)
+                self.evictions += 1
+        pending.set_result(shard)
+        return shard
+
+    def resident_bytes(self) -> int:
+        return sum(s.nbytes for s in self._loaded.values())
+
+    def loaded(self) -> list[str]:
+        """Names of the resident regions, least recently used first."""
+        return [self.regions[i].name for i in self._loaded]
+
+    def warm(self) -> None:
+        """Load regions in manifest order while they fit the budget (e.g. before a fork)."""
+        for i in range(len(self.regions)):
+            if i not in self._loaded and self.resident_bytes() >= self.budget:
+                break
+            self.shard(i)
+
+    def stats(self) -> dict:
+        return dict(regions=len(self.regions), loaded=len(self._loaded),
+                    resident_mb=round(self.resident_bytes() / 2**20, 1),
+                    loads=self.loads, evictions=self.evictions)
+
+
+# ─────────────────────────── model ───────────────────────────
+class ShardedModel:
+    """predict() over [lat, lng] rows, each answered by its region's model."""
+
+    def __init__(self, regions: RegionSet):
+        self.regions = regions
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_at(X, None)
+
+    def predict_at(self, X, hours) -> np.ndarray:
+        """Time‑aware where the region's model has predict_at (a RiskCube); see RiskCube."""
+        X = np.asarray(X, dtype=float).reshape(-1, 2)
+        out = np.full(len(X), np.nan)
+        where = self.regions.locate(X[:, 0], X[:, 1])
+        if hours is not None:
+            hours = np.broadcast_to(np.asarray(hours), where.shape)
+        for i in np.unique(where[where >= 0]):
+            rows = where == i
+            model = self.regions.shard(int(i)).model
+            pts = pd.DataFrame(X[rows], columns=FEATURES)
+            if hours is not None and hasattr(model, "predict_at"):
+                out[rows] = model.predict_at(pts, hours[rows])
+            else:
+                out[rows] = model.predict(pts)
+        return out
+
+
+# ─────────────────────────── hotspots ───────────────────────────
+class ShardedHotspotIndex:
+    """The HotspotIndex lookups, answered by the index of each point's region."""
+
+    def __init__(self, regions: RegionSet):
+        self.regions = regions
+
+    @property
+    def version(self) -> str:
+        return self.regions.version
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    @property
+    def polygons(self):
+        raise AttributeError("a sharded hotspot index has no single polygon list; "
+                             "use shards(bbox) for each region's HotspotIndex")
+
+    def _index(self, i: int) -> HotspotIndex:
+        return self.regions.hotspot_index(i)
+
+    def _near(self, lats, lngs, pad_m: float) -> np.ndarray:
+        """Region of each point, or of a region within `pad_m` (zones are buffered past the bbox)."""
+        where = self.regions.locate(lats, lngs)
+        if pad_m and (where < 0).any():
+            pad = pad_m / M_PER_DEG
+            for k in np.flatnonzero(where < 0):
+                hits = self.regions.overlapping(lngs[k] - pad, lats[k] - pad, lngs[k] + pad, lats[k] + pad)
+                if hits:
+                    where[k] = hits[0]
+        return where
+
+    def contains(self, lat: float, lng: float, buffer_m: float = 50) -> bool:
+        return bool(self.mask([lat], [lng], buffer_m)[0])
+
+    def mask(self, lats, lngs, buffer_m: float = 50) -> np.ndarray:
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        out = np.zeros(lats.size, dtype=bool)
+        flat_lat, flat_lng = lats.ravel(), lngs.ravel()
+        where = self._near(flat_lat, flat_lng, buffer_m)
+        for i in np.unique(where[where >= 0]):
+            rows = where == i
+            out[rows] = self._index(int(i)).mask(flat_lat[rows], flat_lng[rows], buffer_m)
+        return out.reshape(lats.shape)
+
+    def nearest(self, lat: float, lng: float,
+                max_distance_m: Optional[float] = None) -> Optional[tuple[int, float]]:
+        """(polygon index within the point's region, metres), or None – see HotspotIndex.nearest."""
+        where = self.regions.locate([lat], [lng])[0]
+        return None if where < 0 else self._index(int(where)).nearest(lat, lng, max_distance_m)
+
+    def distances(self, lats, lngs, max_distance_m: Optional[float] = None) -> np.ndarray:
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        out = np.full(lats.size, np.inf)
+        flat_lat, flat_lng = lats.ravel(), lngs.ravel()
+        where = self.regions.locate(flat_lat, flat_lng)
+        for i in np.unique(where[where >= 0]):
+            rows = where == i
+            out[rows] = self._index(int(i)).distances(flat_lat[rows], flat_lng[rows], max_distance_m)
+        return out.reshape(lats.shape)
+
+    def buffered_within(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float,
+                        buffer_m: float = 50) -> np.ndarray:
+        parts = [self._index(i).buffered_within(min_lng, min_lat, max_lng, max_lat, buffer_m)
+                 for i in self.regions.overlapping(min_lng, min_lat, max_lng, max_lat)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=object)
+
+    def shards(self, bbox, limit: Optional[int] = None) -> list[tuple[str, HotspotIndex]]:
+        """
+        (name, index) of the regions overlapping bbox, in manifest order. With
+        `limit`, only that many are loaded: those with the most area in view.
+        """
+        hits = self.regions.overlapping(*bbox)
+        if limit is not None and len(hits) > limit:
+            by_area = sorted(hits, key=lambda i: -self.regions.regions[i].overlap(*bbox))
+            hits = sorted(by_area[:limit])
+        return [(self.regions.regions[i].name, self._index(i)) for i in hits]
+
+    def warm(self, buffer_m: float = 50) -> None:
+        self.regions.warm()
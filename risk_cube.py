@@ -0,0 +1,208 @@
+"""
+Crash severity by grid cell *and* hour of the week, for time‑aware scoring.
+
+    cube = RiskCube.compile(model, aggregate_cube_cells("data.csv"))
+    cube.predict_at(X, hour_of_week(departure, eta_seconds))
+
+Each occupied cell gets 168 values: the model's prediction for the cell
+scaled by how that hour compares with the cell's average. Hours with few
+crashes are shrunk toward the average (PRIOR_CRASHES), hours with none get
+it. Lookups read two arrays – a cell → row raster and the (rows × 168)
+cube – so they cost the same per sample as GridLookupModel; points in cells
+without recorded crashes go to `fallback`.
+"""
+import numpy as np
+import pandas as pd
+
+from crash_ingest import COLUMNS, DTYPES, _is_parquet
+from grid_model import FEATURES
+
+TIMESTAMP = 'Crash timestamp (US/Central)'
+TIMEZONE = 'US/Central'
+HOURS = 168                          # Monday 00:00 … Sunday 23:00
+PRIOR_CRASHES = 10                   # pseudo‑crashes at the cell average per hour
+
+
+def hour_of_week(when, offsets_s=0) -> np.ndarray:
+    """
+    Hour of the week (0 = Monday 00:00, local time) of `when` plus each of
+    `offsets_s` seconds. `when` is a datetime, Timestamp or string; naive
+    values are taken as US/Central wall time.
+    """
+    ts = pd.Timestamp(when)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(TIMEZONE).tz_localize(None)
+    start = ts.dayofweek * 86_400 + ts.hour * 3_600 + ts.minute * 60 + ts.second
+    return ((start + np.asarray(offsets_s, dtype=float)) // 3_600).astype(np.int64) % HOURS
+
+
+def parse_departure(value):
+    """Request value → Timestamp: ISO 8601 text, epoch seconds or "now" (ValueError if unreadable)."""
+    if value in (None, ""):
+        return None
+    try:
+        if value == "now":
+            return pd.Timestamp.now(tz=TIMEZONE)
+        if isinstance(value, (int, float)):
+            return pd.Timestamp(value, unit="s", tz="UTC")
+        return pd.Timestamp(value)
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"departure_time {value!r} is not a date/time") from exc
+
+
+# ───────────────────────────── ingest ─────────────────────────────
+def cube_partials(chunk: pd.DataFrame, grid_size: float) -> pd.DataFrame:
+    """Severity sum/count per (k_lat, k_lng, hour) of one chunk."""
+    when = pd.to_datetime(chunk[TIMESTAMP], format="mixed", errors="coerce")
+    chunk = chunk.assign(how=when.dt.dayofweek * 24 + when.dt.hour).dropna()
+    return (
+        pd.DataFrame({
+            'k_lat': chunk['latitude'].to_numpy() // grid_size,
+            'k_lng': chunk['longitude'].to_numpy() // grid_size,
+            'how': chunk['how'].to_numpy(dtype=np.int64),
+            'sev_sum': chunk['crash_sev_id'].to_numpy(dtype=np.float64),
+        })
+        .groupby(['k_lat', 'k_lng', 'how'], sort=False)['sev_sum']
+        .agg(['sum', 'count'])
+    )
+
+
+def aggregate_cube_cells(path: str, grid_size: float = 0.01, chunk_rows: int = 500_000) -> pd.DataFrame:
+    """Per (cell, hour of week) severity (sum, count) of a CSV or Parquet crash file."""
+    columns = COLUMNS + [TIMESTAMP]
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        chunks = (b.to_pandas() for b in
+                  pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns))
+    else:
+        chunks = pd.read_csv(path, usecols=columns, dtype=dict(DTYPES, **{TIMESTAMP: str}),
+                             chunksize=chunk_rows)
+    parts = [cube_partials(chunk, grid_size) for chunk in chunks]
+    if not parts:
+        raise ValueError(f"{path}: no crash records")
+    return pd.concat(parts).groupby(level=['k_lat', 'k_lng', 'how']).sum()
+
+
+# ───────────────────────────── model ─────────────────────────────
+class RiskCube:
+    """
+    rows   (n_lat, n_lng) int32 raster: row of each cell in `values`, -1 if empty
+    values (n_rows, 168) float32 severity per hour of week
+    base   (n_rows,) float32 the model's time‑agnostic prediction per cell
+    """
+
+    def __init__(self, rows: np.ndarray, values: np.ndarray, base: np.ndarray,
+                 lat_idx0: int, lng_idx0: int, grid_size: float, fallback=None):
+        self.rows = rows
+        self.values = values
+        self.base = base
+        self.lat_idx0 = int(lat_idx0)
+        self.lng_idx0 = int(lng_idx0)
+        self.grid_size = float(grid_size)
+        self.fallback = fallback
+
+    @classmethod
+    def compile(cls, model, cube_cells: pd.DataFrame, grid_size: float = 0.01,
+                prior: float = PRIOR_CRASHES) -> "RiskCube":
+        """Bake `model`'s per‑cell prediction × each hour's relative severity into the cube."""
+        k_lat = cube_cells.index.get_level_values('k_lat').to_numpy().astype(np.int64)
+        k_lng = cube_cells.index.get_level_values('k_lng').to_numpy().astype(np.int64)
+        how = cube_cells.index.get_level_values('how').to_numpy()
+        lat_idx0, lng_idx0 = int(k_lat.min()), int(k_lng.min())
+        shape = (int(k_lat.max()) - lat_idx0 + 1, int(k_lng.max()) - lng_idx0 + 1)
+
+        # one row per occupied cell
+        flat = (k_lat - lat_idx0) * shape[1] + (k_lng - lng_idx0)
+        cells, row = np.unique(flat, return_inverse=True)
+        rows = np.full(shape[0] * shape[1], -1, dtype=np.int32)
+        rows[cells] = np.arange(len(cells), dtype=np.int32)
+
+        sums = np.zeros((len(cells), HOURS))
+        counts = np.zeros((len(cells), HOURS))
+        np.add.at(sums, (row, how), cube_cells['sum'].to_numpy())
+        np.add.at(counts, (row, how), cube_cells['count'].to_numpy())
+        mean = sums.sum(axis=1) / counts.sum(axis=1)
+        hourly = (sums + prior * mean[:, None]) / (counts + prior)
+
+        origins = np.column_stack([(cells // shape[1] + lat_idx0) * grid_size,
+                                   (cells % shape[1] + lng_idx0) * grid_size])
+        base = np.asarray(model.predict(pd.DataFrame(origins, columns=FEATURES)), dtype=float)
+        values = (base[:, None] * hourly / mean[:, None]).astype(np.float32)
+        return cls(rows.reshape(shape), values, base.astype(np.float32), lat_idx0, lng_idx0,
+                   grid_size, fallback=model)
+
+    def with_cells(self, lat_k, lng_k, cell_values, fallback=None) -> "RiskCube":
+        """
+        Copy of this cube with cells (integer indices `x // grid_size`) moved to
+        `cell_values` (what GridLookupModel.with_cells stores for them): each
+        cell's hourly profile is rescaled to the new average. Cells the cube
+        doesn't cover are left to `fallback` (default: this cube's).
+        """
+        r = np.asarray(lat_k, dtype=np.int64) - self.lat_idx0
+        c = np.asarray(lng_k, dtype=np.int64) - self.lng_idx0
+        inside = (r >= 0) & (r < self.shape[0]) & (c >= 0) & (c < self.shape[1])
+        row = np.full(len(r), -1, dtype=np.int64)
+        row[inside] = self.rows[r[inside], c[inside]]
+        hit = row >= 0
+        row, new = row[hit], np.asarray(cell_values, dtype=float)[hit]
+
+        base, values = self.base.copy(), self.values.copy()
+        old = base[row].astype(float)
+        scale = np.divide(new, old, out=np.zeros_like(new), where=old > 0)
+        values[row] = np.where(old[:, None] > 0, values[row] * scale[:, None], new[:, None])
+        base[row] = new
+        return RiskCube(self.rows, values, base, self.lat_idx0, self.lng_idx0, self.grid_size,
+                        fallback=self.fallback if fallback is None else fallback)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.rows.shape
+
+    def _rows(self, X) -> tuple[np.ndarray, np.ndarray]:
+        if isinstance(X, pd.DataFrame):
+            X = X[FEATURES].to_numpy(dtype=float)
+        X = np.asarray(X, dtype=float).reshape(-1, 2)
+        # same binning as identify_crash_hotspots / GridLookupModel.cell_index
+        r = np.floor_divide(X[:, 0], self.grid_size).astype(np.int64) - self.lat_idx0
+        c = np.floor_divide(X[:, 1], self.grid_size).astype(np.int64) - self.lng_idx0
+        inside = (r >= 0) & (r < self.shape[0]) & (c >= 0) & (c < self.shape[1])
+        row = np.full(len(X), -1, dtype=np.int64)
+        row[inside] = self.rows[r[inside], c[inside]]
+        return X, row
+
+    def _fill(self, X, out, row) -> np.ndarray:
+        empty = row < 0
+        if empty.any():
+            out[empty] = (self.fallback.predict(pd.DataFrame(X[empty], columns=FEATURES))
+                          if self.fallback is not None else np.nan)
+        return out
+
+    def predict_at(self, X, hours) -> np.ndarray:
+        """Severity of each [lat, lng] at its hour of week (a scalar or one per row)."""
+        X, row = self._rows(X)
+        hours = np.broadcast_to(np.asarray(hours, dtype=np.int64) % HOURS, row.shape)
+        out = np.empty(len(X))
+        known = row >= 0
+        out[known] = self.values[row[known], hours[known]]
+        return self._fill(X, out, row)
+
+    def predict(self, X) -> np.ndarray:
+        """Time‑agnostic severity (what the model alone predicts for the cell)."""
+        X, row = self._rows(X)
+        out = np.empty(len(X))
+        known = row >= 0
+        out[known] = self.base[row[known]]
+        return self._fill(X, out, row)
+
+    # ────────────────────────── persistence ──────────────────────────
+    def save(self, path) -> None:
+        np.savez(path, rows=self.rows, values=self.values, base=self.base,
+                 origin=np.array([self.lat_idx0, self.lng_idx0], dtype=np.int64),
+                 grid_size=np.array(self.grid_size))
+
+    @classmethod
+    def load(cls, path: str, fallback=None) -> "RiskCube":
+        with np.load(path) as npz:
+            lat_idx0, lng_idx0 = npz['origin']
+            return cls(npz['rows'], npz['values'], npz['base'], lat_idx0, lng_idx0,
+                       float(npz['grid_size']), fallback=fallback)
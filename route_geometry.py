@@ -0,0 +1,73 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def decode_polyline(encoded: str) -> np.ndarray:
+    """
+    Decode a Google encoded polyline → (N, 2) array of (lat, lng).
+    Vectorised: no per-character Python loop.
+    """
+    if not encoded:
+        return np.empty((0, 2))
+    b = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    ends = (b & 0x20) == 0                       # last 5‑bit chunk of each value
+    value_id = np.concatenate(([0], np.cumsum(ends)[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    shift = 5 * (np.arange(len(b)) - starts[value_id])
+    values = np.bincount(value_id, weights=(b & 0x1F) << shift).astype(np.int64)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    return np.cumsum(deltas[: len(deltas) // 2 * 2].reshape(-1, 2), axis=0) / 1e5
+
+
+def haversine_m(lat1, lng1, lat2, lng2) -> np.ndarray:
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def route_path(route: dict, per_step: bool = False) -> np.ndarray:
+    """
+    (N, 2) lat/lng path of a Directions route: the overview polyline, the
+    per-step polylines (more detail) or, if neither is present, the step
+    start/end locations.
+    """
+    if not per_step and route.get("overview_polyline", {}).get("points"):
+        return decode_polyline(route["overview_polyline"]["points"])
+
+    parts = []
+    for leg in route["legs"]:
+        for step in leg["steps"]:
+            pts = step.get("polyline", {}).get("points")
+            if pts:
+                parts.append(decode_polyline(pts))
+            else:
+                locs = [step[k] for k in ("start_location", "end_location") if k in step]
+                parts.append(np.array([[p["lat"], p["lng"]] for p in locs]).reshape(-1, 2))
+    return np.concatenate(parts) if parts else np.empty((0, 2))
+
+
+def resample_path(path: np.ndarray, spacing_m: float = 100.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Resample a path every `spacing_m` metres.
+
+    Returns (samples (M, 2) lat/lng, weights (M,) metres). Each sample sits in
+    the middle of its stretch of road and is weighted by that stretch's length,
+    so the weights add up to the path length.
+    """
+    if spacing_m <= 0:
+        raise ValueError("spacing_m must be positive")
+    if len(path) < 2:
+        return path.reshape(-1, 2), np.ones(len(path))
+    seg = haversine_m(path[:-1, 0], path[:-1, 1], path[1:, 0], path[1:, 1])
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    total = cum[-1]
+    if total == 0:
+        return path[:1], np.ones(1)
+
+    edges = np.append(np.arange(0.0, total, spacing_m), total)
+    mids = (edges[:-1] + edges[1:]) / 2
+    samples = np.column_stack((np.interp(mids, cum, path[:, 0]),
+                               np.interp(mids, cum, path[:, 1])))
+    return samples, np.diff(edges)
@@ -20,12 +20,13 @@ let currentRouteObj   = null;
 let drawnPolyline     = null;
 let currentRoutes     = [];
 
-/* Heat‑map & crash‑zone layers */
+/* Heat‑map & crash‑zone layers (filled per viewport from /hotspots and the heat‑map pyramid) */
 let hotspotLayer     = null;  // google.maps.visualization.HeatmapLayer
-let hotspotsReady    = false;
-
 let crashZoneLayer   = null;  // google.maps.Data
-let crashZonesReady  = false;
+let hotspotIdle      = null;  // map 'idle' listener while the overlay is on
+let hotspotAbort     = null;  // AbortController of the in‑flight request
+let heatmapLevels    = undefined; // pyramid manifest levels, null if none was exported
+const heatmapCells   = new Map(); // level file → Promise<Float32Array> of (lat, lng, weight)
 
 /* Simulation timing */
 const SIM_TICK_MS = 6000;   // pause 6 s at each checkpoint
@@ -64,45 +65,115 @@ window.initMap = function () {
   simulateBtn.addEventListener('click', simulateDrive);
 };
 
-/* ──────────────── Heat‑map helpers ──────────────── */
-async function ensureHotspotLayer () {
-  if (hotspotsReady) return;
-  try {
-    const resp = await fetch('/static/hotspots.json');
-    const data = await resp.json();           // [{lat,lng,weight}]
-    const pts  = data.map(d => ({
-      location: new google.maps.LatLng(d.lat, d.lng),
-      weight  : d.weight
-    }));
-    hotspotLayer = new google.maps.visualization.HeatmapLayer({
-      data: pts,
-      radius: 9,
-      opacity: 0.45
-    });
-    hotspotsReady = true;
-  } catch (e) {
-    console.error('Failed to load hotspot heat‑map:', e);
+/* ──────────────── Heat‑map & crash‑zone helpers ──────────────── */
+function ensureHotspotLayers () {
+  if (hotspotLayer) return;
+  hotspotLayer = new google.maps.visualization.HeatmapLayer({
+    data: [],
+    radius: 9,
+    opacity: 0.45
+  });
+  crashZoneLayer = new google.maps.Data({ map: null });
+  crashZoneLayer.setStyle({
+    fillColor: '#ff0000',
+    fillOpacity: 0.25,
+    strokeColor: '#ff0000',
+    strokeOpacity: 0.6,
+    strokeWeight: 1
+  });
+}
+
+/* bbox snapped out to whole tiles (same as the server) so URLs – and the
+   browser's HTTP cache / ETag revalidation – are shared between nearby views */
+function hotspotQuery () {
+  const b = map.getBounds();
+  if (!b) return null;
+  const zoom = map.getZoom();
+  const step = 360 / 2 ** zoom;
+  const sw = b.getSouthWest(), ne = b.getNorthEast();
+  const bbox = [
+    Math.floor(sw.lng() / step) * step, Math.floor(sw.lat() / step) * step,
+    Math.ceil(ne.lng() / step) * step,  Math.ceil(ne.lat() / step) * step
+  ].map(v => v.toFixed(6)).join(',');
+  return new URLSearchParams({ bbox, zoom });
+}
+
+/* heat‑map pyramid (Route_Safety export-heatmap): levels finest first, each
+   used from its min_zoom up; fetched once per level and filtered to the view */
+async function heatmapLevel (zoom) {
+  if (heatmapLevels === undefined) {
+    const resp = await fetch('/static/heatmap/index.json');
+    heatmapLevels = resp.ok ? (await resp.json()).levels : null;
+  }
+  if (!heatmapLevels?.length) return null;
+  const level = heatmapLevels.find(l => zoom >= l.min_zoom) ?? heatmapLevels.at(-1);
+  if (!heatmapCells.has(level.file)) {
+    heatmapCells.set(level.file, fetch(`/static/heatmap/${level.file}`)
+      .then(r => r.ok ? r.arrayBuffer() : Promise.reject(new Error(`HTTP ${r.status}`)))
+      .then(buf => new Float32Array(buf))
+      .catch(e => { heatmapCells.delete(level.file); throw e; }));
+  }
+  return heatmapCells.get(level.file);
+}
+
+function heatmapPoints (cells, bounds) {
+  const points = [];
+  for (let i = 0; i < cells.length; i += 3) {
+    const location = new google.maps.LatLng(cells[i], cells[i + 1]);
+    if (bounds.contains(location)) points.push({ location, weight: cells[i + 2] });
   }
+  return points;
 }
 
-/* ──────────────── Crash‑zone helpers ──────────────── */
-async function ensureCrashZoneLayer () {
-  if (crashZonesReady) return;
+async function loadHotspotsForViewport () {
+  const query = hotspotQuery();
+  if (!query) return;
+  hotspotAbort?.abort();                      // a newer viewport wins
+  hotspotAbort = new AbortController();
+  const { signal } = hotspotAbort;
   try {
-    const resp = await fetch('/static/high_crash_zones.geojson');
-    const geo  = await resp.json();
-    crashZoneLayer = new google.maps.Data({ map: null });
-    crashZoneLayer.addGeoJson(geo);
-    crashZoneLayer.setStyle({
-      fillColor: '#ff0000',
-      fillOpacity: 0.25,
-      strokeColor: '#ff0000',
-      strokeOpacity: 0.6,
-      strokeWeight: 1
+    const [geo, cells] = await Promise.all([
+      fetch(`/hotspots?${query}`, { signal }).then(r => {
+        if (!r.ok) throw new Error(`HTTP ${r.status}`);
+        return r.json();                      // FeatureCollection, centroid in properties
+      }),
+      heatmapLevel(map.getZoom()).catch(e => {
+        console.error('Failed to load heat‑map level:', e);
+        return null;
+      })
+    ]);
+    if (signal.aborted) return;
+
+    hotspotLayer.setData(cells
+      ? heatmapPoints(cells, map.getBounds())
+      : geo.features.map(f => ({              // no pyramid exported: zone centroids
+          location: new google.maps.LatLng(f.properties.lat, f.properties.lng),
+          weight  : 1
+        })));
+
+    crashZoneLayer.forEach(f => crashZoneLayer.remove(f));
+    crashZoneLayer.addGeoJson({               // zoomed out the server sends centroids only
+      type: 'FeatureCollection',
+      features: geo.features.filter(f => f.geometry.type !== 'Point')
     });
-    crashZonesReady = true;
   } catch (e) {
-    console.error('Failed to load crash‑zone polygons:', e);
+    if (e.name !== 'AbortError') console.error('Failed to load hotspots:', e);
+  }
+}
+
+function showHotspots (on) {
+  if (on) {
+    ensureHotspotLayers();
+    hotspotLayer.setMap(map);
+    crashZoneLayer.setMap(map);
+    hotspotIdle ??= map.addListener('idle', loadHotspotsForViewport);
+    loadHotspotsForViewport();
+  } else {
+    hotspotIdle?.remove();
+    hotspotIdle = null;
+    hotspotAbort?.abort();
+    hotspotLayer?.setMap(null);
+    crashZoneLayer?.setMap(null);
   }
 }
 
@@ -314,14 +385,37 @@ function sendMessage() {
   btn.disabled = true; btn.textContent = 'Sending…';
   addMessageToChat(txt, 'user'); input.value = '';
 
+  // reply arrives as SSE `{delta}` events, rendered into one bubble as it grows
+  let bubble = null, reply = '';
+  const show = text => {
+    if (!bubble) bubble = addMessageToChat(text, 'bot');
+    else bubble.innerHTML = text.replace(/\n/g, '<br>');
+  };
+
   fetch('/chat', {
     method : 'POST',
     headers: { 'Content-Type': 'application/json' },
-    body   : JSON.stringify({ message: txt })
+    body   : JSON.stringify({ message: txt, stream: true })
   })
-  .then(r => r.ok ? r.json() : r.json().then(e => { throw e; }))
-  .then(d => addMessageToChat(d.response ?? `Error: ${d.error}`, 'bot'))
-  .catch(e => addMessageToChat(`Error: ${e.error || e}`, 'bot'))
+  .then(async r => {
+    if (!r.ok) throw await r.json();
+    const reader  = r.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      const events = buf.split('\n\n'); buf = events.pop();
+      for (const ev of events) {
+        if (!ev.startsWith('data: ')) continue;
+        const pkt = JSON.parse(ev.slice(6));
+        if (pkt.delta) { reply += pkt.delta; show(reply); }
+        if (pkt.error) throw pkt;
+      }
+    }
+  })
+  .catch(e => show(`${reply}${reply ? '\n' : ''}Error: ${e.error || e}`))
   .finally(() => {
     input.disabled   = false;
     btn.disabled     = false;
@@ -337,6 +431,7 @@ function addMessageToChat(msg, who) {
   el.innerHTML = msg.replace(/\n/g, '<br>');
   c.appendChild(el);
   el.scrollIntoView({ behavior: 'smooth', block: 'end' });
+  return el;
 }
 
 function handleVoicePacket(pkt) {
@@ -349,18 +444,7 @@ document.addEventListener('DOMContentLoaded', () => {
   /* Heat‑map + crash‑zone toggle */
   const toggle = document.getElementById('toggle-hotspots');   
   if (toggle) {
-    toggle.addEventListener('change', async e => {
-      if (e.target.checked) {
-        await ensureHotspotLayer();
-        hotspotLayer?.setMap(map);
-
-        await ensureCrashZoneLayer();
-        crashZoneLayer?.setMap(map);
-      } else {
-        hotspotLayer?.setMap(null);
-        crashZoneLayer?.setMap(null);
-      }
-    });
+    toggle.addEventListener('change', e => showHotspots(e.target.checked));
   }
 
   document.getElementById('start-button').addEventListener('click', findSafeRoute);
@@ -0,0 +1,37 @@
+import os
+import sys
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import Route_Safety
+from directions_client import DirectionsClient
+from llm_cache import LLMCache
+from stub_servers import FakeDirectionsServer, FakeOpenAIServer
+
+@pytest.fixture
+def directions_server(monkeypatch):
+    """Local Directions stand-in wired into get_google_routes (fresh cache per test)"""
+    with FakeDirectionsServer() as server:
+        client = DirectionsClient(base_url=server.url, retries=0)
+        monkeypatch.setattr(Route_Safety, "_directions_client", client)
+        yield server
+
+@pytest.fixture
+def client():
+    """Flask test client"""
+    from app import app
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    """Local OpenAI stand-in, fresh OpenAI clients and LLM cache, empty chat store"""
+    import assistant
+    with FakeOpenAIServer(reply="Keep left.") as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setattr(Route_Safety, "_llm_cache", LLMCache(maxsize=16))
+        monkeypatch.setattr(assistant, "_client", None)
+        monkeypatch.setattr(assistant, "_store", assistant.make_chat_store("memory"))
+        yield server
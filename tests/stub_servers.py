@@ -0,0 +1,125 @@
+"""Local stand-ins for the external HTTP APIs used in tests."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SAMPLE_ROUTE = {
+    'summary': 'I-35 N',
+    'legs': [{
+        'distance': {'text': '10 miles'},
+        'duration': {'value': 600},
+        'steps': [{
+            'end_location': {'lat': 30.2672, 'lng': -97.7431},
+            'html_instructions': 'Head <b>north</b>'
+        }]
+    }]
+}
+
+
+class FakeDirectionsServer:
+    """
+    Minimal Directions API on 127.0.0.1:<random port>.
+
+    `status`, `http_status`, `routes` and `latency` (seconds) can be changed
+    between requests; `requests` records the query string of every call.
+    """
+
+    def __init__(self, routes=None, status="OK", http_status=200, latency=0.0):
+        self.routes = [SAMPLE_ROUTE] if routes is None else routes
+        self.status = status
+        self.http_status = http_status
+        self.latency = latency
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(parse_qs(urlparse(self.path).query))
+                if server.latency:
+                    time.sleep(server.latency)
+                body = json.dumps(dict(status=server.status,
+                                       routes=server.routes if server.status == "OK" else [])).encode()
+                self.send_response(server.http_status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}/maps/api/directions/json"
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeOpenAIServer(FakeDirectionsServer):
+    """
+    Minimal OpenAI chat-completions API: answers every POST with `reply`
+    after `latency` seconds. Point the SDK at `base_url` (OPENAI_BASE_URL).
+    Requests with "stream": true get the reply word by word as SSE chunks,
+    `token_latency` seconds apart.
+    """
+
+    def __init__(self, reply="Keep left.", latency=0.0, token_latency=0.0):
+        self.reply = reply
+        self.latency = latency
+        self.token_latency = token_latency
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.requests.append(json.loads(body or b"{}"))
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.requests[-1].get("stream"):
+                    return self._stream()
+                out = json.dumps(dict(
+                    id="chatcmpl-test", object="chat.completion", created=0,
+                    model=server.requests[-1].get("model", ""),
+                    choices=[dict(index=0, finish_reason="stop",
+                                  message=dict(role="assistant", content=server.reply))],
+                )).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = server.reply.split(" ")
+                for i, word in enumerate(words):
+                    if i and server.token_latency:
+                        time.sleep(server.token_latency)
+                    self._chunk(dict(content=word if i == 0 else " " + word), None)
+                self._chunk({}, "stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def _chunk(self, delta, finish_reason):
+                chunk = dict(id="chatcmpl-test", object="chat.completion.chunk", created=0,
+                             model=server.requests[-1].get("model", ""),
+                             choices=[dict(index=0, delta=delta, finish_reason=finish_reason)])
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}/v1"
@@ -0,0 +1,137 @@
+import pytest
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("starlette")
+pytest.importorskip("a2wsgi")
+from starlette.testclient import TestClient
+
+@pytest.fixture
+def asgi_client():
+    """Starlette test client for the ASGI app"""
+    from asgi_app import app
+    with TestClient(app) as client:
+        yield client
+
+def _events(text):
+    return [json.loads(line[len("data: "):]) for line in text.splitlines() if line.startswith("data: ")]
+
+def test_stream_route_gps_sequence(asgi_client, openai_server):
+    """GPS points stream in order, then the arrival event"""
+    seq = [dict(latitude=30.40 + i * 0.001, longitude=-97.60) for i in range(5)]
+    resp = asgi_client.post("/stream_route", json=dict(gps_sequence=seq, pipeline_width=3))
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _events(resp.text)
+    assert [e["latitude"] for e in events[:-1]] == [p["latitude"] for p in seq]
+    assert "text" not in events[-1]
+    assert all(e["text"] for e in events[:-1])
+
+def test_stream_route_directions(asgi_client, directions_server, openai_server):
+    """start/end mode streams one event per route step"""
+    resp = asgi_client.post("/stream_route", json=dict(start="A", end="B"))
+    assert resp.status_code == 200
+    events = _events(resp.text)
+    assert len(events) == 2
+    assert events[0]["latitude"] == 30.2672
+    assert len(directions_server.requests) == 1
+
+def test_stream_route_validation(asgi_client):
+    """Missing endpoints or a bad pipeline width are rejected"""
+    assert asgi_client.post("/stream_route", json={}).status_code == 400
+    resp = asgi_client.post("/stream_route", json=dict(gps_sequence=[dict(latitude=1, longitude=2)],
+                                                       pipeline_width="many"))
+    assert resp.status_code == 400
+
+def test_analyze_route(asgi_client, directions_server):
+    """Routes are scored off the event loop with the shared helpers"""
+    import app as flask_app
+    class Model:
+        def predict(self, X):
+            return [2.0] * len(X)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(flask_app, "get_safety_model", lambda: Model())
+        resp = asgi_client.post("/analyze_route", json=dict(start="A", end="B"))
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["safest_index"] == 0
+    assert body["route_details"][0]["distance"] == "10 miles"
+
+def test_analyze_route_requires_endpoints(asgi_client, client):
+    """Missing start/end gives the same 400 body as the Flask endpoint"""
+    resp = asgi_client.post("/analyze_route", json=dict(start="A"))
+    assert resp.status_code == 400
+    assert resp.json() == client.post("/analyze_route", json=dict(start="A")).get_json()
+
+def test_analyze_route_no_routes(asgi_client, directions_server):
+    """No routes from Directions gives a 404"""
+    directions_server.status = "ZERO_RESULTS"
+    resp = asgi_client.post("/analyze_route", json=dict(start="A", end="B"))
+    assert resp.status_code == 404
+
+def test_chat_keeps_history(asgi_client, openai_server):
+    """Both sides of the conversation are sent back on the next turn"""
+    assert asgi_client.post("/chat", json=dict(message="hi")).json() == dict(response="Keep left.")
+    asgi_client.post("/chat", json=dict(message="again"))
+    roles = [m["role"] for m in openai_server.requests[-1]["messages"]]
+    assert roles == ["system", "user", "assistant", "user"]
+
+def test_chat_streams_tokens(asgi_client, openai_server):
+    """stream=true relays the reply as SSE deltas and stores the whole reply"""
+    openai_server.reply = "Take the next exit."
+    resp = asgi_client.post("/chat", json=dict(message="hi", stream=True))
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _events(resp.text)
+    assert "".join(e.get("delta", "") for e in events) == "Take the next exit."
+    assert events[-1] == {"done": True}
+    asgi_client.post("/chat", json=dict(message="again"))
+    assert openai_server.requests[-1]["messages"][2]["content"] == "Take the next exit."
+
+def test_flask_routes_still_served(asgi_client):
+    """Anything not handled natively falls through to the Flask app"""
+    resp = asgi_client.get("/clear_session")
+    assert resp.status_code == 200
+    assert resp.json() == dict(status="session cleared")
+
+def test_analyze_route_server_timing(asgi_client, directions_server, monkeypatch):
+    """The native endpoints report their spans, including work run in the threadpool"""
+    import app as flask_app
+    import metrics
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "server_timing", True)
+    class Model:
+        def predict(self, X):
+            return [2.0] * len(X)
+    monkeypatch.setattr(flask_app, "get_safety_model", lambda: Model())
+    resp = asgi_client.post("/analyze_route", json=dict(start="A", end="B"))
+    names = [part.split(";")[0] for part in resp.headers["server-timing"].split(", ")]
+    assert names == ["google_routes", "safety_score", "total"]
+
+def _off_loop(fn, calls):
+    """Wrap `fn` to record whether each call ran outside an event loop"""
+    import asyncio
+    def wrapper(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            calls.append("loop")
+        except RuntimeError:
+            calls.append("thread")
+        return fn(*args, **kwargs)
+    return wrapper
+
+def test_blocking_work_runs_off_the_loop(asgi_client, openai_server, monkeypatch):
+    """Hotspot checks and chat-store reads/writes run in the threadpool"""
+    import asgi_app
+    import assistant
+    calls = []
+    monkeypatch.setattr(asgi_app, "hotspot_mask", _off_loop(lambda lats, lngs: [False] * len(lats), calls))
+    monkeypatch.setattr(asgi_app, "track_hotspots", _off_loop(lambda lats, lngs: [(False, None)] * len(lats), calls))
+    store = assistant.get_chat_store()
+    monkeypatch.setattr(store, "history", _off_loop(store.history, calls))
+    monkeypatch.setattr(store, "append", _off_loop(store.append, calls))
+    seq = [dict(latitude=30.40, longitude=-97.60)]
+    asgi_client.post("/stream_route", json=dict(gps_sequence=seq))
+    asgi_client.post("/chat", json=dict(message="hi"))
+    asgi_client.post("/chat", json=dict(message="hi again", stream=True))
+    assert len(calls) >= 5 and set(calls) == {"thread"}
@@ -0,0 +1,120 @@
+import pytest
+import json
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import assistant
+import metrics
+from assistant import ChatStore, make_chat_store
+from cache import LRUCache
+
+def _events(body):
+    return [json.loads(line[6:]) for line in body.split("\n") if line.startswith("data: ")]
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_keeps_last_messages(backend, tmp_path, monkeypatch):
+    """Each backend keeps only the newest CHAT_HISTORY messages per session"""
+    monkeypatch.setenv("SESSION_DB", str(tmp_path / "chat.sqlite"))
+    monkeypatch.setenv("CHAT_HISTORY", "4")
+    store = make_chat_store(backend)
+    for i in range(3):
+        store.append("a", f"q{i}", f"r{i}")
+    assert [m["content"] for m in store.history("a")] == ["q1", "r1", "q2", "r2"]
+    assert store.history("b") == []
+    store.clear("a")
+    assert store.history("a") == []
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_concurrent_turns_all_land(backend, tmp_path, monkeypatch):
+    """Turns appended at once to one session (threads, separate sqlite connections) are all kept"""
+    import threading
+    monkeypatch.setenv("SESSION_DB", str(tmp_path / "chat.sqlite"))
+    monkeypatch.setenv("CHAT_HISTORY", "1000")
+    shared = make_chat_store(backend)
+    stores = [shared if backend == "memory" else make_chat_store(backend) for _ in range(4)]
+    start = threading.Barrier(len(stores))
+
+    def talk(k, store):
+        start.wait()
+        for i in range(25):
+            store.append("a", f"q{k}.{i}", f"r{k}.{i}")
+    threads = [threading.Thread(target=talk, args=(k, store)) for k, store in enumerate(stores)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(shared.history("a")) == 4 * 25 * 2
+
+def test_store_bounds_sessions_and_expires():
+    """The memory store evicts the oldest conversation and drops idle ones"""
+    store = ChatStore(LRUCache(maxsize=2, ttl=0.05))
+    for sid in ("a", "b", "c"):
+        store.append(sid, "hi", "hello")
+    assert store.history("a") == [] and store.history("c")
+    time.sleep(0.06)
+    assert store.history("c") == []
+
+def test_default_backend_is_shared(tmp_path, monkeypatch):
+    """Without SESSION_BACKEND, every worker's store reads the same history"""
+    monkeypatch.delenv("SESSION_BACKEND", raising=False)
+    monkeypatch.setenv("SESSION_DB", str(tmp_path / "chat.sqlite"))
+    make_chat_store().append("a", "hi", "hello")
+    assert [m["content"] for m in make_chat_store().history("a")] == ["hi", "hello"]
+
+def test_unknown_backend():
+    """A misspelt SESSION_BACKEND fails loudly"""
+    with pytest.raises(ValueError):
+        make_chat_store("redis")
+
+def test_system_prompt_read_once(monkeypatch):
+    """The prompt file is opened once, not per message"""
+    assistant.system_prompt.cache_clear()
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda *a, **k: opened.append(a[0]) or real_open(*a, **k))
+    assistant.chat_messages([], "a")
+    assistant.chat_messages([], "b")
+    assert opened.count(assistant.CHAT_PROMPT) == 1
+
+def test_chat_streams_tokens(client, openai_server):
+    """stream=true returns SSE deltas, then done; the full reply joins the history"""
+    openai_server.reply = "Turn left at the light."
+    resp = client.post('/chat', json={'message': 'Where now?', 'stream': True})
+    assert resp.mimetype == "text/event-stream"
+    events = _events(resp.get_data(as_text=True))
+    assert len(events) > 2
+    assert "".join(e.get("delta", "") for e in events) == "Turn left at the light."
+    assert events[-1] == {"done": True}
+
+    sid = client.get_cookie(assistant.SESSION_COOKIE).value
+    assert assistant.get_chat_store().history(sid) == [
+        {"role": "user", "content": "Where now?"},
+        {"role": "assistant", "content": "Turn left at the light."},
+    ]
+
+def test_chat_stream_error(client, openai_server, monkeypatch):
+    """An API failure mid-stream ends with an error event and stores nothing"""
+    def broken(messages):
+        yield "Turn"
+        raise RuntimeError("upstream closed")
+    monkeypatch.setattr(assistant, "stream_reply", broken)
+    events = _events(client.post('/chat', json={'message': 'hi', 'stream': True}).get_data(as_text=True))
+    assert events == [{"delta": "Turn"}, {"error": "upstream closed"}]
+    sid = client.get_cookie(assistant.SESSION_COOKIE).value
+    assert assistant.get_chat_store().history(sid) == []
+
+def test_first_token_span(openai_server, monkeypatch):
+    """Time to first token is recorded as its own span"""
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "SPANS", metrics.Histogram("t", "t", "span"))
+    assert "".join(assistant.stream_reply(assistant.chat_messages([], "hi"))) == "Keep left."
+    assert "llm_first_token" in metrics.SPANS._series
+
+def test_clear_session_forgets_history(client, openai_server):
+    """After /clear_session the next question goes out without the old turns"""
+    client.post('/chat', json={'message': 'first'})
+    client.get('/clear_session')
+    client.post('/chat', json={'message': 'second'})
+    roles = [m['role'] for m in openai_server.requests[-1]['messages']]
+    assert roles == ['system', 'user']
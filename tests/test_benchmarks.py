@@ -0,0 +1,31 @@
+import json
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.suite import compare, main
+
+def _report(**cases):
+    return {"results": [dict(name=name, size=1, p50_ms=p50, p95_ms=p95, ops_per_s=ops)
+                        for name, (p50, p95, ops) in cases.items()]}
+
+def test_compare_flags_regressions():
+    """Slower percentiles or lower throughput beyond the tolerance are reported"""
+    base = _report(a=(10, 20, 100), b=(10, 20, 100), c=(10, 20, 100))
+    new = _report(a=(11, 21, 95), b=(10, 30, 100), c=(10, 20, 50), d=(99, 99, 1))
+    problems = compare(new, base, tolerance=0.2)
+    assert len(problems) == 2
+    assert problems[0].startswith("b[1] p95_ms")
+    assert problems[1].startswith("c[1] ops_per_s")
+
+def test_suite_writes_json(tmp_path):
+    """A quick run records p50/p95/throughput and passes against itself"""
+    out = str(tmp_path / "bench.json")
+    main(["--quick", "--only", "identify_crash_hotspots", "--out", out])
+    with open(out) as f:
+        report = json.load(f)
+    [result] = report["results"]
+    assert result["name"] == "identify_crash_hotspots"
+    assert 0 < result["p50_ms"] <= result["p95_ms"]
+    assert result["ops_per_s"] > 0
+    main(["--quick", "--only", "identify_crash_hotspots", "--compare", out, "--tolerance", "100"])
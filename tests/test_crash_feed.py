@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Route_Safety
+from Route_Safety import apply_crash_feed, load_or_train_model, build_model_artifact, model_key
+from grid_model import GridLookupModel
+from model_store import ModelStore
+from benchmarks.synthetic import make_crash_data
+
+@pytest.fixture
+def trained(tmp_path, monkeypatch):
+    """Small crash history with a stored model artifact"""
+    monkeypatch.setattr(Route_Safety, "MODEL_PARAMS", dict(n_estimators=5, random_state=0))
+    data_path = str(tmp_path / "history.csv")
+    make_crash_data(2_000, seed=1, spread=0.05).to_csv(data_path, index=False)
+    store_dir = str(tmp_path / "store")
+    build_model_artifact(data_path, store_dir=store_dir, compile_grid=True)
+    return data_path, store_dir
+
+def _feed(tmp_path, rows, name="feed.csv"):
+    path = str(tmp_path / name)
+    pd.DataFrame(rows, columns=['latitude', 'longitude', 'crash_sev_id']).to_csv(path, index=False)
+    return path
+
+def test_feed_refreshes_only_touched_cells(trained, tmp_path):
+    """Cells in the feed get the merged mean; every other cell is unchanged"""
+    data_path, store_dir = trained
+    before = load_or_train_model(data_path, store_dir=store_dir, compile_grid=True)
+    history = pd.read_csv(data_path)
+    lat, lng = history.loc[0, 'latitude'], history.loc[0, 'longitude']
+    feed = _feed(tmp_path, [[lat, lng, 5], [lat, lng, 5]])
+
+    grid, n_cells = apply_crash_feed(feed, data_path, store_dir=store_dir, model=before)
+    assert n_cells == 1
+
+    same_cell = ((history['latitude'] // 0.01 == lat // 0.01)
+                 & (history['longitude'] // 0.01 == lng // 0.01))
+    sev = history.loc[same_cell, 'crash_sev_id']
+    expected = (sev.sum() + 10) / (len(sev) + 2)
+    assert grid.predict([[lat, lng]])[0] == pytest.approx(expected, rel=1e-6)
+
+    changed = grid.values != before.values
+    assert changed.sum() == 1
+    assert before.predict([[lat, lng]])[0] != grid.predict([[lat, lng]])[0]
+
+def test_feed_grows_the_raster(trained, tmp_path):
+    """Crashes outside the trained area extend the grid"""
+    data_path, store_dir = trained
+    before = load_or_train_model(data_path, store_dir=store_dir, compile_grid=True)
+    feed = _feed(tmp_path, [[31.5, -97.7431, 4]])
+    grid, _ = apply_crash_feed(feed, data_path, store_dir=store_dir, model=before)
+    assert grid.shape[0] > before.shape[0]
+    assert grid.predict([[31.5, -97.7431]])[0] == pytest.approx(4)
+
+def test_feed_is_persisted_and_idempotent(trained, tmp_path):
+    """A restart sees the update; the same feed twice is applied once"""
+    data_path, store_dir = trained
+    feed = _feed(tmp_path, [[30.27, -97.74, 5]])
+    _, first = apply_crash_feed(feed, data_path, store_dir=store_dir)
+    _, again = apply_crash_feed(feed, data_path, store_dir=store_dir)
+    assert (first, again) == (1, 0)
+
+    cells, feeds = ModelStore(store_dir).load_cells(model_key(data_path, store_dir=store_dir))
+    assert len(feeds) == 1
+    assert cells['count'].sum() == 2_001
+
+    # even without compile_grid the served model includes the feed
+    reloaded = load_or_train_model(data_path, store_dir=store_dir)
+    assert isinstance(reloaded, GridLookupModel)
+
+def test_with_cells_copies():
+    """with_cells never mutates the raster a server may be reading"""
+    grid = GridLookupModel(np.zeros((2, 2), dtype=np.float32), 10, 20, 0.01)
+    new = grid.with_cells([12], [19], [3.0])
+    assert grid.values.sum() == 0 and grid.shape == (2, 2)
+    assert new.shape == (3, 3)
+    assert (new.lat_idx0, new.lng_idx0) == (10, 19)
+    assert new.values[2, 0] == 3.0
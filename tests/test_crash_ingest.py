@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Route_Safety import load_crash_data, identify_crash_hotspots
+from crash_ingest import aggregate_cells, aggregate_hotspots, coarsen, _read_block, _csv_ranges
+from benchmarks.synthetic import make_crash_data
+
+@pytest.fixture
+def crash_csv(tmp_path):
+    """Crash export with extra columns and some missing values"""
+    data = make_crash_data(5_000, seed=3)
+    data['Crash timestamp (US/Central)'] = '2023-01-01'
+    data.loc[::37, 'latitude'] = np.nan
+    data.loc[::53, 'crash_sev_id'] = np.nan
+    path = tmp_path / "crashes.csv"
+    data.to_csv(path, index=False)
+    return str(path)
+
+@pytest.mark.parametrize("chunk_rows", [100, 1_000, 1_000_000])
+def test_streamed_matches_in_memory(crash_csv, chunk_rows):
+    """Chunked aggregation gives exactly the in-memory hotspot frame"""
+    expected = identify_crash_hotspots(load_crash_data(crash_csv))
+    result = aggregate_hotspots(crash_csv, chunk_rows=chunk_rows)
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+
+def test_parallel_matches_in_memory(crash_csv):
+    """Byte-range blocks parsed in worker processes give the same frame"""
+    expected = identify_crash_hotspots(load_crash_data(crash_csv), grid_size=0.02)
+    result = aggregate_hotspots(crash_csv, grid_size=0.02, chunk_rows=700, workers=2)
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+
+def test_blocks_cover_every_line_once(crash_csv):
+    """Line-aligned blocks partition the file body with no overlap or gap"""
+    names, ranges = _csv_ranges(crash_csv, block_bytes=997)
+    body = b"".join(_read_block(crash_csv, s, e) for s, e in ranges)
+    with open(crash_csv, "rb") as f:
+        f.readline()
+        assert body == f.read()
+    assert names[:3] == ['latitude', 'longitude', 'crash_sev_id']
+
+def test_empty_file(tmp_path):
+    """A header-only export yields an empty hotspot frame"""
+    path = tmp_path / "empty.csv"
+    path.write_text("latitude,longitude,crash_sev_id\n")
+    result = aggregate_hotspots(str(path))
+    assert list(result.columns) == ['lat_bin', 'lng_bin', 'crash_sev_id']
+    assert len(result) == 0
+
+def test_parquet_matches_csv(crash_csv, tmp_path):
+    """Parquet input is read by batch / row group with identical output"""
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "crashes.parquet")
+    pd.read_csv(crash_csv).to_parquet(path, row_group_size=1_000)
+    expected = aggregate_hotspots(crash_csv)
+    pd.testing.assert_frame_equal(aggregate_hotspots(path, chunk_rows=500), expected, check_exact=True)
+    pd.testing.assert_frame_equal(aggregate_hotspots(path, workers=2), expected, check_exact=True)
+
+@pytest.mark.parametrize("factor", [2, 4, 8])
+def test_coarsen_matches_direct_aggregation(crash_csv, factor):
+    """Merging fine cells gives the partials of a coarser grid"""
+    fine = aggregate_cells(crash_csv, grid_size=0.01)
+    direct = aggregate_cells(crash_csv, grid_size=0.01 * factor)
+    coarse = coarsen(fine, factor)
+    assert coarse['count'].sum() == fine['count'].sum()
+    pd.testing.assert_frame_equal(coarse, direct, check_exact=False)
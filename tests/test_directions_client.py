@@ -0,0 +1,68 @@
+import pytest
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import LRUCache, SqliteCache
+from directions_client import DirectionsClient
+from stub_servers import FakeDirectionsServer
+
+def test_concurrent_identical_requests_coalesce():
+    """Simultaneous lookups for the same trip share a single HTTP request"""
+    with FakeDirectionsServer(latency=0.2) as server:
+        client = DirectionsClient(base_url=server.url, retries=0)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: client.routes("k", "Austin", "Houston"), range(8)))
+        assert all(r == results[0] for r in results)
+        assert len(server.requests) == 1
+
+def test_sqlite_cache_shared_between_clients(tmp_path):
+    """Two clients (e.g. two workers) share responses through the sqlite backend"""
+    path = str(tmp_path / "directions.sqlite")
+    with FakeDirectionsServer() as server:
+        a = DirectionsClient(base_url=server.url, cache=SqliteCache(path))
+        b = DirectionsClient(base_url=server.url, cache=SqliteCache(path))
+        assert a.routes("k", "Austin", "Houston") == b.routes("k", "Austin", "Houston")
+        assert len(server.requests) == 1
+
+def test_lru_cache_ttl_and_eviction():
+    """Entries expire after their TTL and the least recently used is evicted"""
+    cache = LRUCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+
+def test_sqlite_cache_bounded(tmp_path):
+    """The sqlite backend keeps at most `maxsize` entries"""
+    cache = SqliteCache(str(tmp_path / "c.sqlite"), maxsize=3)
+    for i in range(5):
+        cache.set(str(i), {"i": i})
+    assert len(cache) == 3
+    assert cache.get("4") == {"i": 4} and cache.get("0") is None
+
+def test_cancelled_request_does_not_cancel_coalesced_waiters():
+    """The request that started a shared async lookup can go away; the others still get routes"""
+    import asyncio
+
+    async def run(client):
+        first = asyncio.create_task(client.routes_async("k", "Austin", "Houston"))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(client.routes_async("k", "Austin", "Houston"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        routes = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return routes
+
+    with FakeDirectionsServer(latency=0.3) as server:
+        client = DirectionsClient(base_url=server.url, retries=0)
+        routes = asyncio.run(run(client))
+        assert routes and len(server.requests) == 1
+        assert client.cache.get(client.cache_key("Austin", "Houston", "driving")) == routes
@@ -0,0 +1,116 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Route_Safety
+from Route_Safety import identify_crash_hotspots, train_model, load_or_train_model, model_key, main
+from flat_forest import FlatForest
+from model_store import ModelStore
+from model_tuning import measure, pick
+from unittest.mock import patch
+
+@pytest.fixture
+def hotspots():
+    """Hotspot grid built from a few thousand synthetic crashes"""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'latitude': 30.2 + rng.uniform(0, 0.2, 3000),
+        'longitude': -97.8 + rng.uniform(0, 0.2, 3000),
+        'crash_sev_id': rng.integers(1, 5, 3000),
+    })
+    return identify_crash_hotspots(data)
+
+@pytest.fixture
+def crash_csv(tmp_path):
+    """Small crash CSV on disk"""
+    rng = np.random.default_rng(1)
+    path = tmp_path / "crashes.csv"
+    pd.DataFrame({
+        'latitude': 30.2 + rng.uniform(0, 0.1, 300),
+        'longitude': -97.8 + rng.uniform(0, 0.1, 300),
+        'crash_sev_id': rng.integers(1, 5, 300),
+    }).to_csv(path, index=False)
+    return str(path)
+
+def test_flat_predict_matches_sklearn(hotspots):
+    """Same predictions as the forest, on cell origins (split thresholds) and anywhere else"""
+    forest = train_model(hotspots, out_path=None, params=dict(n_estimators=20))
+    flat = FlatForest.from_forest(forest)
+    rng = np.random.default_rng(2)
+    X = pd.concat([hotspots[['lat_bin', 'lng_bin']],
+                   pd.DataFrame({'lat_bin': 30.1 + rng.uniform(0, 0.4, 500),
+                                 'lng_bin': -97.9 + rng.uniform(0, 0.4, 500)})])
+    np.testing.assert_allclose(flat.predict(X), forest.predict(X), rtol=1e-12)
+    one = pd.DataFrame([[30.25, -97.75]], columns=['lat_bin', 'lng_bin'])
+    assert flat.predict([30.25, -97.75])[0] == pytest.approx(forest.predict(one)[0])
+    flat.chunk_rows = 7                          # chunked batches give the same answer
+    np.testing.assert_allclose(flat.predict(X), forest.predict(X), rtol=1e-12)
+    assert len(flat) == 20
+
+def test_flat_roundtrip(hotspots, tmp_path):
+    """save / load keeps every array"""
+    flat = FlatForest.from_forest(train_model(hotspots, out_path=None, params=dict(n_estimators=5)))
+    flat.save(tmp_path / "flat.npz")
+    again = FlatForest.load(str(tmp_path / "flat.npz"))
+    X = hotspots[['lat_bin', 'lng_bin']] + 0.003
+    assert np.array_equal(again.predict(X), flat.predict(X))
+
+def test_capped_parallel_training(hotspots):
+    """params cap the trees, n_jobs is used for the fit only"""
+    forest = train_model(hotspots, out_path=None, params=dict(n_estimators=10, max_depth=4), n_jobs=-1)
+    assert len(forest.estimators_) == 10
+    assert max(t.tree_.max_depth for t in forest.estimators_) <= 4
+    assert forest.n_jobs is None
+
+def test_params_change_the_key(crash_csv, tmp_path):
+    """A tuned model is its own artifact; the default one is untouched"""
+    store = str(tmp_path / "store")
+    assert model_key(crash_csv, store_dir=store) != model_key(crash_csv, store_dir=store,
+                                                              params=dict(max_depth=8))
+    assert model_key(crash_csv, store_dir=store) == model_key(crash_csv, store_dir=store,
+                                                              params=dict(Route_Safety.MODEL_PARAMS))
+
+def test_cli_builds_flat_artifact(crash_csv, tmp_path):
+    """`build-model --max-depth --flat` is served as a FlatForest without retraining"""
+    store = str(tmp_path / "store")
+    main(["build-model", "--data", crash_csv, "--store", store, "--n-estimators", "10",
+          "--max-depth", "6", "--flat", "--n-jobs", "1"])
+    params = dict(n_estimators=10, max_depth=6)
+    key = model_key(crash_csv, store_dir=store, params=params)
+    assert os.path.exists(ModelStore(store).flat_path(key))
+    with patch('Route_Safety.train_model', side_effect=AssertionError("retrained")):
+        flat = load_or_train_model(crash_csv, store_dir=store, params=params, flat=True)
+        forest = load_or_train_model(crash_csv, store_dir=store, params=params)
+    assert isinstance(flat, FlatForest) and len(flat) == 10
+    X = pd.DataFrame([[30.25, -97.75], [30.21, -97.79]], columns=['lat_bin', 'lng_bin'])
+    np.testing.assert_allclose(flat.predict(X), forest.predict(X), rtol=1e-12)
+
+def test_flat_exported_from_existing_artifact(crash_csv, tmp_path):
+    """Asking for flat on an artifact built without it converts the stored forest"""
+    store = str(tmp_path / "store")
+    params = dict(n_estimators=5)
+    load_or_train_model(crash_csv, store_dir=store, params=params)
+    with patch('Route_Safety.train_model', side_effect=AssertionError("retrained")):
+        assert isinstance(load_or_train_model(crash_csv, store_dir=store, params=params, flat=True),
+                          FlatForest)
+
+def test_measure_reports_size_and_latency(hotspots):
+    """measure() fits one configuration and reports accuracy, size and timings"""
+    r = measure(hotspots, dict(n_estimators=5, max_depth=6), n_jobs=1, repeats=3, batch_rows=100)
+    assert r['effective']['max_depth'] == 6 and r['mse'] >= 0
+    assert r['model_bytes'] > r['flat_bytes'] > 0
+    assert r['predict_us'] > 0 and r['flat_us'] > 0
+
+def test_pick_smallest_within_tolerance():
+    """The smallest model within the MSE tolerance wins; ties go to the faster one"""
+    results = [dict(params={}, mse=1.00, model_bytes=900, flat_us=50),
+               dict(params=dict(max_depth=12), mse=1.01, model_bytes=300, flat_us=40),
+               dict(params=dict(max_depth=12, n_estimators=50), mse=1.015, model_bytes=300, flat_us=20),
+               dict(params=dict(max_depth=4), mse=1.30, model_bytes=10, flat_us=5)]
+    assert pick(results, tolerance=0.02)['params'] == dict(max_depth=12, n_estimators=50)
+    assert pick(results, tolerance=0.0)['params'] == {}
+    assert pick(results, tolerance=0.5)['params'] == dict(max_depth=4)
+    with pytest.raises(ValueError):
+        pick([])
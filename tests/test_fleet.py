@@ -0,0 +1,159 @@
+import io
+import json
+import time
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Route_Safety
+import fleet
+from cache import SqliteCache
+from directions_client import DirectionsClient
+from stub_servers import FakeDirectionsServer, SAMPLE_ROUTE
+
+SECOND_ROUTE = {
+    'summary': 'US-183',
+    'legs': [{
+        'distance': {'text': '12 miles'},
+        'duration': {'value': 900},
+        'steps': [{'end_location': {'lat': 30.40, 'lng': -97.70}, 'html_instructions': 'Merge'},
+                  {'end_location': {'lat': 30.45, 'lng': -97.65}, 'html_instructions': 'Exit'}]
+    }]
+}
+
+class LatitudeModel:
+    """Risk grows with latitude, so the two sample routes score differently"""
+    def predict(self, X):
+        return [(lat - 30.0) * 10 for lat in X['lat_bin']]
+
+TRIPS = [dict(id=i, origin=f"Depot {i}", destination="Houston, TX") for i in range(10)]
+
+def test_read_trips(tmp_path):
+    """CSV and JSONL trip lists; start/end are accepted as aliases"""
+    csv_path = tmp_path / "trips.csv"
+    csv_path.write_text("id,origin,destination\nA,Austin,Waco\nB,Austin,Dallas\n")
+    assert fleet.read_trips(str(csv_path))[1] == dict(id="B", origin="Austin", destination="Dallas")
+    jsonl_path = tmp_path / "trips.jsonl"
+    jsonl_path.write_text('{"start": "Austin", "end": "Waco"}\n\n')
+    assert fleet.read_trips(str(jsonl_path)) == [dict(id=0, origin="Austin", destination="Waco")]
+    with pytest.raises(ValueError):
+        fleet.parse_trips([{"origin": "Austin"}])
+
+def test_rate_limiter():
+    """Calls beyond the burst are spaced at the configured rate"""
+    limiter = fleet.RateLimiter(rate=50, burst=1)
+    t0 = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+    assert time.monotonic() - t0 >= 0.19
+
+def test_rate_zero_is_no_limit():
+    """A rate of 0 means no limiter (as on the CLI); RateLimiter itself rejects it"""
+    assert fleet.rate_limiter(0) is None
+    assert isinstance(fleet.rate_limiter(5), fleet.RateLimiter)
+    with pytest.raises(ValueError):
+        fleet.RateLimiter(0)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_analyze_trips_in_order(workers):
+    """Every trip comes back once, in order, with both routes scored"""
+    with FakeDirectionsServer(routes=[SAMPLE_ROUTE, SECOND_ROUTE], latency=0.01) as server:
+        client = DirectionsClient(base_url=server.url, retries=0)
+        results = list(fleet.analyze_trips(TRIPS, LatitudeModel(), client, concurrency=4,
+                                           workers=workers, batch_size=3))
+    assert [r["id"] for r in results] == list(range(10))
+    first = results[0]
+    assert [r["summary"] for r in first["routes"]] == ["I-35 N", "US-183"]
+    assert first["routes"][0]["safety_score"] > first["routes"][1]["safety_score"]
+    assert first["safest_index"] == 0
+    assert first["routes"][1]["distance"] == "12 miles"
+    assert len(server.requests) == 10
+
+def test_record_then_replay_offline(tmp_path, monkeypatch):
+    """A recorded run can be repeated with no Directions server at all"""
+    monkeypatch.setattr(Route_Safety, "load_or_train_model", lambda *a, **k: LatitudeModel())
+    trips_path = tmp_path / "trips.jsonl"
+    trips_path.write_text("".join(json.dumps(t) + "\n" for t in TRIPS[:4]))
+    record = str(tmp_path / "directions.sqlite")
+
+    with FakeDirectionsServer() as server:
+        monkeypatch.setenv("DIRECTIONS_URL", server.url)
+        online = str(tmp_path / "online.jsonl")
+        assert Route_Safety.run_fleet(str(trips_path), online, record=record, rate=0, workers=1) == 4
+
+    # one trip the recording never saw
+    with open(trips_path, "a") as f:
+        f.write(json.dumps(dict(id="new", origin="Austin", destination="El Paso")) + "\n")
+    offline = str(tmp_path / "offline.jsonl")
+    Route_Safety.run_fleet(str(trips_path), offline, record=record, offline=True, workers=1)
+    with open(online) as a, open(offline) as b:
+        online_rows, offline_rows = a.readlines(), b.readlines()
+    assert offline_rows[:4] == online_rows
+    assert json.loads(offline_rows[4])["error"] == "No routes found"
+    assert len(SqliteCache(record)) == 4
+
+def test_parquet_output(tmp_path):
+    """Parquet gets one row per route with the safest one flagged"""
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    results = [dict(id=1, origin="A", destination="B", safest_index=1,
+                    routes=[dict(safety_score=5.0, duration=10.0, distance="1 mi", summary="x"),
+                            dict(safety_score=7.0, duration=12.0, distance="2 mi", summary="y")]),
+               dict(id=2, origin="A", destination="C", routes=[], error="No routes found")]
+    path = str(tmp_path / "out.parquet")
+    assert fleet.write_parquet(iter(results), path) == 2
+    df = pd.read_parquet(path)
+    assert df["safest"].tolist() == [False, True, None]
+    assert df["error"].tolist()[2] == "No routes found"
+
+def test_bulk_endpoint(client, directions_server, monkeypatch):
+    """/analyze_routes streams one JSON line per trip"""
+    import app as app_module
+    monkeypatch.setattr(app_module, "get_safety_model", lambda: LatitudeModel())
+    response = client.post('/analyze_routes', json={"trips": TRIPS[:3]})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r["id"] for r in lines] == [0, 1, 2]
+    assert lines[0]["safest_index"] == 0
+
+    upload = io.BytesIO(b"origin,destination\nAustin,Waco\n")
+    response = client.post('/analyze_routes', data={"trips": (upload, "trips.csv")},
+                           content_type="multipart/form-data")
+    assert json.loads(response.get_data(as_text=True))["origin"] == "Austin"
+
+def test_bulk_endpoint_unlimited_rate(client, directions_server, monkeypatch):
+    """BULK_DIRECTIONS_RATE=0 streams every trip instead of failing on the second lookup"""
+    import app as app_module
+    monkeypatch.setattr(app_module, "get_safety_model", lambda: LatitudeModel())
+    monkeypatch.setattr(app_module, "_bulk_limiter", fleet.rate_limiter(0))
+    response = client.post('/analyze_routes', json={"trips": TRIPS[:3]})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r["id"] for r in lines] == [0, 1, 2] and all("error" not in r for r in lines)
+
+def test_bulk_endpoint_validation(client, monkeypatch):
+    """Empty, malformed and oversized trip lists are rejected"""
+    import app as app_module
+    assert client.post('/analyze_routes', json={}).status_code == 400
+    assert client.post('/analyze_routes', json={"trips": ["Austin"]}).status_code == 400
+    monkeypatch.setattr(app_module, "BULK_MAX_TRIPS", 2)
+    assert client.post('/analyze_routes', json={"trips": TRIPS[:3]}).status_code == 413
+
+def test_cli_stdout_is_only_results(tmp_path, monkeypatch, capsys):
+    """`fleet --out -` leaves stdout to the JSONL results; training and API chatter go to stderr"""
+    np = pytest.importorskip("numpy")
+    pd = pytest.importorskip("pandas")
+    rng = np.random.default_rng(0)
+    data = tmp_path / "crashes.csv"
+    pd.DataFrame({'latitude': 30.2 + rng.uniform(0, 0.2, 300),
+                  'longitude': -97.8 + rng.uniform(0, 0.2, 300),
+                  'crash_sev_id': rng.integers(1, 5, 300)}).to_csv(data, index=False)
+    trips_path = tmp_path / "trips.jsonl"
+    trips_path.write_text("".join(json.dumps(t) + "\n" for t in TRIPS[:3]))
+    with FakeDirectionsServer() as server:
+        monkeypatch.setenv("DIRECTIONS_URL", server.url)
+        Route_Safety.main(["fleet", str(trips_path), "--data", str(data), "--store", str(tmp_path / "store"),
+                           "--record", str(tmp_path / "directions.sqlite"), "--rate", "0", "--workers", "1"])
+    out, err = capsys.readouterr()
+    assert [json.loads(line)["id"] for line in out.splitlines()] == [0, 1, 2]
+    assert "training" in err and "Google Maps API status" in err
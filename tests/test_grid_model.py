@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Route_Safety import identify_crash_hotspots, train_model, calculate_safety_scores
+from grid_model import GridLookupModel
+
+@pytest.fixture
+def hotspots():
+    """Hotspot grid built from a few hundred synthetic crashes"""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'latitude': 30.2 + rng.uniform(0, 0.1, 300),
+        'longitude': -97.8 + rng.uniform(0, 0.1, 300),
+        'crash_sev_id': rng.integers(1, 5, 300),
+    })
+    return identify_crash_hotspots(data)
+
+@pytest.fixture
+def forest(hotspots):
+    return train_model(hotspots)
+
+def test_grid_matches_forest_on_cells(hotspots, forest):
+    """Raster lookups equal the forest evaluated at each cell origin"""
+    grid = GridLookupModel.compile(forest, hotspots)
+    X = hotspots[['lat_bin', 'lng_bin']]
+    centres = X + 0.005
+    np.testing.assert_allclose(grid.predict(centres), forest.predict(X), rtol=1e-6)
+
+def test_grid_snaps_points_to_cells(hotspots, forest):
+    """Raw coordinates are scored by the cell they fall in"""
+    grid = GridLookupModel.compile(forest, hotspots)
+    lats = np.array([30.2512, 30.2288])
+    lngs = np.array([-97.7456, -97.7701])
+    binned = pd.DataFrame({'lat_bin': (lats // 0.01) * 0.01, 'lng_bin': (lngs // 0.01) * 0.01})
+    np.testing.assert_allclose(grid.predict(np.c_[lats, lngs]), forest.predict(binned), rtol=1e-6)
+
+def test_grid_deviation_from_raw_forest(hotspots, forest):
+    """On raw points the raster stays within the forest's own range across the point's cell"""
+    grid = GridLookupModel.compile(forest, hotspots)
+    rng = np.random.default_rng(3)
+    cells = np.rint(hotspots[['lat_bin', 'lng_bin']].to_numpy() / 0.01)[rng.integers(0, len(hotspots), 200)]
+    points = (cells + rng.uniform(0, 1, cells.shape)) * 0.01
+    raw = forest.predict(pd.DataFrame(points, columns=['lat_bin', 'lng_bin']))
+    deviation = np.abs(grid.predict(points) - raw)
+
+    # the forest sampled on a lattice over each point's cell (origin and the point included)
+    offsets = np.linspace(0, 0.999, 9)
+    lattice = (cells[:, None, None, :] + np.stack(np.meshgrid(offsets, offsets, indexing='ij'), -1)) * 0.01
+    across = forest.predict(pd.DataFrame(lattice.reshape(-1, 2), columns=['lat_bin', 'lng_bin']))
+    across = np.column_stack([across.reshape(len(points), -1), raw])
+    assert (deviation <= across.max(axis=1) - across.min(axis=1) + 1e-6).all()
+    assert deviation.mean() < grid.values.std()
+
+def test_grid_falls_back_outside_extent(hotspots, forest):
+    """Points off the raster are delegated to the forest"""
+    grid = GridLookupModel.compile(forest, hotspots)
+    far = pd.DataFrame([[32.78, -96.80]], columns=['lat_bin', 'lng_bin'])
+    assert grid.predict(far)[0] == pytest.approx(forest.predict(far)[0])
+
+def test_grid_save_load_and_score(hotspots, forest, tmp_path):
+    """A saved raster reloads and works as a drop-in model"""
+    grid = GridLookupModel.compile(forest, hotspots)
+    path = str(tmp_path / "grid.npz")
+    grid.save(path)
+    loaded = GridLookupModel.load(path, fallback=forest)
+    assert loaded.shape == grid.shape
+    np.testing.assert_array_equal(loaded.values, grid.values)
+
+    route = {'legs': [{'duration': {'value': 600},
+                       'steps': [{'end_location': {'lat': 30.2512, 'lng': -97.7456}}]}]}
+    (score, minutes), = calculate_safety_scores([route], loaded)
+    assert 1 <= score <= 10 and minutes == 10
@@ -0,0 +1,67 @@
+import json
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Route_Safety import (export_hotspot_json, export_hotspot_pyramid, heatmap_min_zoom,
+                          identify_crash_hotspots, main)
+from crash_ingest import aggregate_cells
+from benchmarks.synthetic import make_crash_data
+
+@pytest.fixture
+def crash_csv(tmp_path):
+    """Small crash export"""
+    path = tmp_path / "crashes.csv"
+    make_crash_data(5_000, seed=4).to_csv(path, index=False)
+    return str(path)
+
+def _level(out_dir, name):
+    return np.fromfile(os.path.join(out_dir, name), dtype='<f4').reshape(-1, 3)
+
+def test_levels_match_hotspot_grids(crash_csv, tmp_path):
+    """Each level holds the cell centres and mean severity of that grid size"""
+    out_dir = str(tmp_path / "heatmap")
+    levels = export_hotspot_pyramid(aggregate_cells(crash_csv), 0.01, out_dir, factors=(1, 4))
+    with open(os.path.join(out_dir, "index.json")) as f:
+        assert json.load(f)["levels"] == levels
+
+    data = pd.read_csv(crash_csv)
+    for level in levels:
+        size = level["grid_size"]
+        expected = identify_crash_hotspots(data.copy(), grid_size=size)
+        rows = _level(out_dir, level["file"])
+        assert len(rows) == level["cells"] == len(expected)
+        np.testing.assert_allclose(rows[:, 0], expected['lat_bin'] + size / 2, atol=1e-4)
+        np.testing.assert_allclose(rows[:, 1], expected['lng_bin'] + size / 2, atol=1e-4)
+        np.testing.assert_allclose(rows[:, 2], expected['crash_sev_id'], rtol=1e-6)
+
+def test_min_zoom_decreases_with_cell_size():
+    """Coarser levels take over as the map zooms out"""
+    zooms = [heatmap_min_zoom(0.01 * 2 ** i) for i in range(6)]
+    assert zooms == sorted(zooms, reverse=True)
+    assert zooms[0] == 10 and zooms[1] == 9
+
+def test_export_json_offset_follows_grid_size(tmp_path):
+    """Points sit at the cell centre for any grid size"""
+    df = pd.DataFrame({'lat_bin': [30.0], 'lng_bin': [-97.8], 'crash_sev_id': [2.5]})
+    out = str(tmp_path / "hotspots.json")
+    export_hotspot_json(df, grid_size=0.05, out_path=out)
+    with open(out) as f:
+        assert json.load(f) == [{"lat": 30.025, "lng": -97.775, "weight": 2.5}]
+
+def test_cli_export(crash_csv, tmp_path):
+    """export-heatmap writes the requested number of levels"""
+    out_dir = str(tmp_path / "heatmap")
+    main(["export-heatmap", "--data", crash_csv, "--levels", "3", "--out", out_dir])
+    with open(os.path.join(out_dir, "index.json")) as f:
+        assert [lv["grid_size"] for lv in json.load(f)["levels"]] == [0.01, 0.02, 0.04]
+
+def test_export_hotspot_json_positional_path(tmp_path):
+    """The original export_hotspot_json(df, path) call still writes to `path`"""
+    df = pd.DataFrame({'lat_bin': [30.26], 'lng_bin': [-97.75], 'crash_sev_id': [2.0]})
+    out = str(tmp_path / "points.json")
+    export_hotspot_json(df, out)
+    with open(out) as f:
+        assert json.load(f)[0]["lat"] == pytest.approx(30.265)
@@ -0,0 +1,137 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from shapely.geometry import Point, box
+from hotspot_index import HotspotIndex, HotspotTracker, M_PER_DEG
+
+@pytest.fixture
+def zones():
+    """Two small square hotspots (lng/lat boxes) near downtown Austin"""
+    return [
+        box(-97.745, 30.265, -97.740, 30.270),
+        box(-97.760, 30.280, -97.755, 30.285),
+    ]
+
+def _brute_force(polys, lat, lng, buffer_m=50):
+    buf_deg = buffer_m / M_PER_DEG
+    return any(p.buffer(buf_deg).contains(Point(lng, lat)) for p in polys)
+
+def test_contains_matches_brute_force(zones):
+    """Index lookups agree with buffering every polygon"""
+    index = HotspotIndex(zones)
+    points = [
+        (30.2675, -97.7425),   # inside zone 0
+        (30.2704, -97.7425),   # just outside zone 0, within 50 m
+        (30.2750, -97.7425),   # well outside both
+        (30.2825, -97.7575),   # inside zone 1
+    ]
+    for lat, lng in points:
+        assert index.contains(lat, lng) == _brute_force(zones, lat, lng)
+
+def test_buffered_tree_is_cached(zones):
+    """Each buffer size is buffered once and reused"""
+    index = HotspotIndex(zones)
+    assert index.buffered_tree(50) is index.buffered_tree(50)
+    assert index.buffered_tree(50) is not index.buffered_tree(100)
+
+def test_nearest(zones):
+    """Nearest returns the closest zone and a distance in metres"""
+    index = HotspotIndex(zones)
+    idx, dist = index.nearest(30.2675, -97.7425)
+    assert idx == 0 and dist == 0
+    idx, dist = index.nearest(30.2860, -97.7575)
+    assert idx == 1
+    assert dist == pytest.approx(0.001 * M_PER_DEG)
+    assert index.nearest(30.2860, -97.7575, max_distance_m=10) is None
+
+def test_empty_index():
+    """An empty index never reports a hotspot"""
+    index = HotspotIndex([])
+    assert index.contains(30.0, -97.0) is False
+    assert index.nearest(30.0, -97.0) is None
+
+def test_mask_matches_contains(zones):
+    """Batch mask agrees with per-point lookups"""
+    index = HotspotIndex(zones)
+    lats, lngs = np.meshgrid(np.linspace(30.26, 30.29, 40), np.linspace(-97.765, -97.735, 40))
+    lats, lngs = lats.ravel(), lngs.ravel()
+    mask = index.mask(lats, lngs)
+    assert mask.dtype == bool and mask.shape == lats.shape
+    assert mask.tolist() == [index.contains(a, b) for a, b in zip(lats, lngs)]
+    assert mask.any()
+
+def test_distances_match_nearest(zones):
+    """Batch distances agree with per-point nearest queries"""
+    index = HotspotIndex(zones)
+    lats = np.array([30.2675, 30.2860, 30.3500])
+    lngs = np.array([-97.7425, -97.7575, -97.7000])
+    dists = index.distances(lats, lngs, max_distance_m=1000)
+    assert dists[0] == 0
+    assert dists[1] == pytest.approx(index.nearest(lats[1], lngs[1])[1])
+    assert np.isinf(dists[2])
+
+def test_query_bbox(zones):
+    """Viewport queries return only the zones intersecting the box"""
+    index = HotspotIndex(zones)
+    assert index.query_bbox(-97.750, 30.260, -97.735, 30.275).tolist() == [0]
+    assert index.query_bbox(-97.800, 30.200, -97.700, 30.300).tolist() == [0, 1]
+    assert index.query_bbox(-90.0, 20.0, -89.0, 21.0).size == 0
+    assert HotspotIndex([]).query_bbox(-98, 30, -97, 31).size == 0
+
+def test_simplified_and_centroids(zones):
+    """Simplified geometry is cached per tolerance; centroids are lng/lat"""
+    index = HotspotIndex(zones)
+    assert index.simplified(0.001) is index.simplified(0.001)
+    assert index.simplified(0) is index._geoms
+    assert np.allclose(index.centroids[0], [-97.7425, 30.2675])
+
+def _track(tracker, lat, lngs):
+    return [tracker.update(lat, lng) for lng in lngs]
+
+def test_tracker_warns_ahead(zones):
+    """Driving east toward zone 0: distance ahead shrinks, then inside"""
+    tracker = HotspotTracker(HotspotIndex(zones), lookahead_m=300, buffer_m=0)
+    step = 10 / (M_PER_DEG * np.cos(np.radians(30.2675)))      # 10 m east per fix
+    start = -97.745 - 40 * step
+    states = _track(tracker, 30.2675, start + step * np.arange(45))
+    assert states[0] == (False, None)                 # no heading yet
+    assert states[1][1] is None                       # 390 m away: beyond the look‑ahead
+    assert states[20][0] is False and states[20][1] == pytest.approx(200, abs=1)
+    assert states[-1][0] is True
+    assert tracker.refreshes == 1
+
+def test_tracker_ignores_zones_behind(zones):
+    """A zone behind the vehicle is not 'ahead'"""
+    tracker = HotspotTracker(HotspotIndex(zones), lookahead_m=300, buffer_m=0)
+    step = 10 / (M_PER_DEG * np.cos(np.radians(30.2675)))
+    states = _track(tracker, 30.2675, -97.7395 + step * np.arange(10))
+    assert all(s == (False, None) for s in states)
+
+def test_tracker_refreshes_on_leaving_neighbourhood(zones):
+    """The candidate set is re-queried only near the neighbourhood edge"""
+    tracker = HotspotTracker(HotspotIndex(zones), lookahead_m=100, radius_m=500)
+    lngs = -97.80 + np.arange(0, 0.05, 0.0001)          # ~4.8 km east, ~10 m steps
+    states = _track(tracker, 30.2675, lngs)
+    assert 5 <= tracker.refreshes <= 20 < len(lngs)
+    assert [s[0] for s in states] == list(HotspotIndex(zones).mask(np.full(lngs.size, 30.2675), lngs))
+
+def test_tracker_jitter_keeps_heading(zones):
+    """Sub-metre GPS jitter does not swing the heading around"""
+    tracker = HotspotTracker(HotspotIndex(zones), min_move_m=3)
+    tracker.update(30.2675, -97.750)
+    tracker.update(30.2675, -97.7499)
+    heading = tracker.heading
+    tracker.update(30.267501, -97.749901)
+    assert tracker.heading == heading
+
+def test_trackers_share_prepared_zones(zones, monkeypatch):
+    """Buffered zones are prepared once when cached; trackers never prepare (mutate) them"""
+    import shapely
+    index = HotspotIndex(zones)
+    assert shapely.is_prepared(index.buffered_tree(0).geometries).all()
+    monkeypatch.setattr(shapely, "prepare", lambda *a, **k: pytest.fail("tracker prepared shared zones"))
+    lngs = np.linspace(-97.7490, -97.7445, 20)          # east into zone 0, as above
+    for _ in range(3):
+        assert _track(HotspotTracker(index, lookahead_m=300, buffer_m=0), 30.2675, lngs)[-1][0]
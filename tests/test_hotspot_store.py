@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+import json
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hotspot_store import (build_hotspot_store, load_hotspot_store, polygons_from_arrays,
+                           is_current, geojson_to_arrays)
+from hotspot_index import HotspotIndex
+from Route_Safety import load_hotspot_polygons
+
+@pytest.fixture
+def geojson(tmp_path):
+    """Three small zones, stored lat/lng like the real export"""
+    def square(lat, lng, d=0.001):
+        return [[lat, lng], [lat + d, lng], [lat + d, lng + d], [lat, lng + d], [lat, lng]]
+    features = [{"type": "Feature", "properties": {"cluster_id": i},
+                 "geometry": {"type": "Polygon", "coordinates": [square(30.2 + i * 0.01, -97.7)]}}
+                for i in range(3)]
+    path = tmp_path / "zones.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    return str(path)
+
+def test_roundtrip_matches_geojson(geojson, tmp_path):
+    """Polygons built from the binary store equal the GeoJSON ones exactly"""
+    out = str(tmp_path / "store")
+    build_hotspot_store(geojson, out)
+    arrays = load_hotspot_store(out)
+    assert isinstance(arrays.coords, np.memmap)
+    polys = polygons_from_arrays(arrays)
+    expected = load_hotspot_polygons(geojson)
+    assert len(polys) == len(expected) == 3
+    assert all(p.equals_exact(q, 0) for p, q in zip(polys, expected))
+    assert np.allclose(arrays.bboxes[0], [-97.7, 30.2, -97.699, 30.201])
+
+def test_staleness(geojson, tmp_path):
+    """The store is current until the GeoJSON changes"""
+    out = str(tmp_path / "store")
+    assert not is_current(geojson, out)
+    build_hotspot_store(geojson, out)
+    assert is_current(geojson, out)
+    later = time.time() + 5
+    os.utime(geojson, (later, later))
+    assert not is_current(geojson, out)
+
+def test_real_export_roundtrip():
+    """The shipped high-crash-zone export converts without loss"""
+    path = "output_files/high_crash_zones.geojson"
+    if not os.path.exists(path):
+        pytest.skip("no hotspot export")
+    polys = polygons_from_arrays(geojson_to_arrays(path))
+    expected = load_hotspot_polygons(path)
+    assert len(polys) == len(expected)
+    assert all(p.equals_exact(q, 0) for p, q in zip(polys, expected))
+
+def test_extent_prefilter_keeps_results(geojson, tmp_path):
+    """Index built from the store answers like one built from the GeoJSON"""
+    out = str(tmp_path / "store")
+    arrays = build_hotspot_store(geojson, out)
+    fast = HotspotIndex(polygons_from_arrays(arrays), bboxes=arrays.bboxes)
+    slow = HotspotIndex(load_hotspot_polygons(geojson))
+    lats, lngs = np.meshgrid(np.linspace(30.19, 30.23, 60), np.linspace(-97.71, -97.69, 60))
+    lats = np.append(lats.ravel(), 45.0)             # far outside every zone
+    lngs = np.append(lngs.ravel(), -120.0)
+    assert fast.mask(lats, lngs).any()
+    assert (fast.mask(lats, lngs) == slow.mask(lats, lngs)).all()
+    assert fast.extent == slow.extent
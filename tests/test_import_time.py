@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# generous enough for a cold CI runner; pandas alone is ~0.3 s warm
+IMPORT_BUDGET_S = float(os.getenv("IMPORT_BUDGET_S", "1.5"))
+
+_PROBE = """
+import json, os, sys, time
+t0 = time.perf_counter()
+import Route_Safety
+elapsed = time.perf_counter() - t0
+print(json.dumps(dict(
+    elapsed=elapsed,
+    heavy=[m for m in ("sklearn", "openai", "joblib", "dotenv") if m in sys.modules],
+    hotspots_loaded=Route_Safety._hotspot_index is not None,
+)))
+"""
+
+def _probe():
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return out.stdout
+
+def test_import_has_no_side_effects():
+    """Importing Route_Safety prints nothing, parses no hotspots, writes no files"""
+    heatmap = os.path.join(ROOT, "static", "hotspots.json")
+    before = os.path.getmtime(heatmap) if os.path.exists(heatmap) else None
+    lines = _probe().strip().splitlines()
+    assert len(lines) == 1, f"unexpected output at import: {lines[:-1]}"
+    result = json.loads(lines[0])
+    assert result["heavy"] == []
+    assert result["hotspots_loaded"] is False
+    after = os.path.getmtime(heatmap) if os.path.exists(heatmap) else None
+    assert before == after
+
+def test_import_time_budget():
+    """Importing Route_Safety stays within the start-up budget"""
+    best = min(json.loads(_probe().strip().splitlines()[-1])["elapsed"] for _ in range(3))
+    assert best < IMPORT_BUDGET_S, f"import took {best:.2f}s (budget {IMPORT_BUDGET_S}s)"
@@ -0,0 +1,84 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Route_Safety
+from Route_Safety import generate_voice_update, generate_enhanced_instruction, load_voice_prompt
+from llm_cache import LLMCache, completion_key
+from unittest.mock import patch, MagicMock
+
+def _reply(text):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=f"  {text} "))])
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Fresh in-memory LLM cache with the OpenAI call mocked out"""
+    cache = LLMCache(maxsize=16)
+    monkeypatch.setattr(Route_Safety, "_llm_cache", cache)
+    with patch('openai.chat.completions.create', return_value=_reply("Proceed straight.")) as create:
+        yield cache, create
+
+def test_repeat_voice_updates_hit_cache(llm):
+    """The same GPS tick twice makes one API call"""
+    cache, create = llm
+    for _ in range(3):
+        text = generate_voice_update(30.30, -97.70, 30.29, -97.70, in_hotspot=False)
+    assert text == "Proceed straight."
+    assert create.call_count == 1
+    assert cache.stats() == dict(hits=2, misses=1, size=1, calls=1)
+
+def test_voice_update_warns_ahead(llm):
+    """A zone on the heading is announced without an API call"""
+    cache, create = llm
+    text = generate_voice_update(30.30, -97.70, 30.29, -97.70, in_hotspot=False, ahead_m=184)
+    assert text == "High‑crash zone in about 180 metres. Prepare to slow down."
+    assert create.call_count == 0
+
+def test_long_instruction_rewrite_cached(llm):
+    """Condensing a long instruction is memoised on the plain-text prompt"""
+    cache, create = llm
+    long_html = "Continue onto <b>I-35 N</b> " + "and keep following the signs " * 6
+    first = generate_enhanced_instruction(long_html, 30.3, -97.7, in_hotspot=False)
+    second = generate_enhanced_instruction(long_html, 30.3, -97.7, in_hotspot=False)
+    assert first == second == "Proceed straight."
+    assert create.call_count == 1
+
+def test_key_includes_model_and_sampling():
+    """Different models or sampling parameters never share a cache entry"""
+    msgs = [{"role": "user", "content": "hi"}]
+    base = completion_key("gpt-3.5-turbo", msgs, temperature=0)
+    assert base == completion_key("gpt-3.5-turbo", msgs, temperature=0)
+    assert base != completion_key("gpt-4o", msgs, temperature=0)
+    assert base != completion_key("gpt-3.5-turbo", msgs, temperature=0.3)
+
+def test_persistent_tier_survives_restart(tmp_path):
+    """A new process (new LLMCache) is served from the sqlite tier"""
+    path = str(tmp_path / "llm.sqlite")
+    msgs = [{"role": "user", "content": "hi"}]
+    with patch('openai.chat.completions.create', return_value=_reply("hello")) as create:
+        LLMCache(persistent_path=path).complete("m", msgs)
+        again = LLMCache(persistent_path=path)
+        assert again.complete("m", msgs) == "hello"
+    assert create.call_count == 1
+    assert again.hits == 1
+
+def test_voice_prompt_parsed_once():
+    """The voice prompt template is read from disk once, not per GPS tick"""
+    load_voice_prompt()
+    with patch('builtins.open', side_effect=AssertionError("re-read prompt")):
+        sys_msg, usr_tmpl = load_voice_prompt()
+    assert "You are SmartDrive Voice Assistant" in sys_msg
+    assert "{latitude}" in usr_tmpl
+
+def test_async_sqlite_tier_off_loop(tmp_path, monkeypatch):
+    """complete_async reads and writes the sqlite tier from a worker thread"""
+    import asyncio
+    import threading
+    cache = LLMCache(persistent_path=str(tmp_path / "llm.sqlite"))
+    threads = []
+    get, put = cache.cache.get, cache.cache.set
+    monkeypatch.setattr(cache.cache, "get", lambda k: threads.append(threading.current_thread()) or get(k))
+    monkeypatch.setattr(cache.cache, "set", lambda k, v: threads.append(threading.current_thread()) or put(k, v))
+    put(completion_key("m", [{"role": "user", "content": "hi"}]), "cached")
+    assert asyncio.run(cache.complete_async("m", [{"role": "user", "content": "hi"}])) == "cached"
+    assert threads and threading.main_thread() not in threads
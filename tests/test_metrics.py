@@ -0,0 +1,71 @@
+import json
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from unittest.mock import patch
+import metrics
+
+@pytest.fixture
+def enabled(monkeypatch):
+    """Metrics and Server-Timing on, with empty histograms and counters"""
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "server_timing", True)
+    monkeypatch.setattr(metrics, "SPANS", metrics.Histogram("smartdrive_span_seconds", "h", "span"))
+    monkeypatch.setattr(metrics, "REQUESTS", metrics.Histogram("smartdrive_request_seconds", "h", "endpoint"))
+    monkeypatch.setattr(metrics, "FAILURES", metrics.Counter("smartdrive_external_failures_total", "h", "service"))
+
+def test_disabled_spans_are_free(enabled, monkeypatch):
+    """With metrics off every span is the same no-op object and nothing is recorded"""
+    monkeypatch.setattr(metrics, "enabled", False)
+    assert metrics.span("a") is metrics.span("b")
+    items = iter([1, 2])
+    assert metrics.timed_iter("x", items) is items
+    with metrics.span("a"):
+        metrics.failure("openai")
+    assert "span=" not in metrics.render() and "service=" not in metrics.render()
+
+def test_histogram_render(enabled):
+    """Buckets are cumulative, with +Inf, _sum and _count per label"""
+    metrics.SPANS.observe("llm", 0.003)
+    metrics.SPANS.observe("llm", 0.2)
+    metrics.failure("directions")
+    text = metrics.render()
+    assert 'smartdrive_span_seconds_bucket{span="llm",le="0.0025"} 0' in text
+    assert 'smartdrive_span_seconds_bucket{span="llm",le="0.005"} 1' in text
+    assert 'smartdrive_span_seconds_bucket{span="llm",le="+Inf"} 2' in text
+    assert 'smartdrive_span_seconds_count{span="llm"} 2' in text
+    assert 'smartdrive_external_failures_total{service="directions"} 1' in text
+
+def test_timed_iter_closes_source(enabled):
+    """Closing the timed stream closes the generator it wraps"""
+    closed = []
+    def source():
+        try:
+            yield from range(10)
+        finally:
+            closed.append(True)
+    stream = metrics.timed_iter("sse_event", source())
+    assert next(stream) == 0
+    stream.close()
+    assert closed == [True]
+    assert 'smartdrive_span_seconds_count{span="sse_event"} 1' in metrics.render()
+
+def test_analyze_route_server_timing(enabled, client, directions_server):
+    """Spans of the request come back in Server-Timing and show up on /metrics"""
+    with patch('app.get_safety_model'), patch('app.calculate_safety_scores', return_value=[(8.5, 10.0)]):
+        response = client.post('/analyze_route', json={'start': 'Austin, TX', 'end': 'Houston, TX'})
+    assert response.status_code == 200
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('google_routes;dur=') and 'total;dur=' in timing
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'smartdrive_span_seconds_count{span="google_routes"} 1' in text
+    assert 'smartdrive_request_seconds_count{endpoint="analyze_route"} 1' in text
+    assert 'smartdrive_cache_misses_total{cache="directions"} 1' in text
+
+def test_metrics_endpoint_disabled(client, monkeypatch):
+    """/metrics is not served unless METRICS=1"""
+    monkeypatch.setattr(metrics, "enabled", False)
+    assert client.get('/metrics').status_code == 404
+    assert 'Server-Timing' not in client.get('/').headers
@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Route_Safety
+from Route_Safety import load_or_train_model, MODEL_PARAMS, main
+from grid_model import GridLookupModel
+from model_store import ModelStore
+from unittest.mock import patch
+
+@pytest.fixture
+def crash_csv(tmp_path):
+    """Small crash CSV on disk"""
+    rng = np.random.default_rng(1)
+    path = tmp_path / "crashes.csv"
+    pd.DataFrame({
+        'latitude': 30.2 + rng.uniform(0, 0.1, 200),
+        'longitude': -97.8 + rng.uniform(0, 0.1, 200),
+        'crash_sev_id': rng.integers(1, 5, 200),
+    }).to_csv(path, index=False)
+    return str(path)
+
+def test_model_trained_once_then_loaded(crash_csv, tmp_path):
+    """A second start-up loads the stored artifact instead of retraining"""
+    store = str(tmp_path / "store")
+    first = load_or_train_model(crash_csv, store_dir=store)
+    with patch('Route_Safety.train_model', side_effect=AssertionError("retrained")):
+        second = load_or_train_model(crash_csv, store_dir=store)
+    X = pd.DataFrame([[30.25, -97.75]], columns=['lat_bin', 'lng_bin'])
+    assert second.predict(X)[0] == pytest.approx(first.predict(X)[0])
+
+def test_key_tracks_data_and_params(crash_csv, tmp_path):
+    """Changing the crash data or grid_size yields a different artifact key"""
+    store = ModelStore(str(tmp_path / "store"))
+    key = store.key(store.key_meta(crash_csv, 0.01, MODEL_PARAMS))
+    assert key == store.key(store.key_meta(crash_csv, 0.01, MODEL_PARAMS))
+    assert key != store.key(store.key_meta(crash_csv, 0.02, MODEL_PARAMS))
+
+    with open(crash_csv, "a") as f:
+        f.write("30.21,-97.71,4\n")
+    assert key != store.key(store.key_meta(crash_csv, 0.01, MODEL_PARAMS))
+
+def test_cli_builds_grid_artifact(crash_csv, tmp_path):
+    """`build-model --grid` writes an artifact the app can load without training"""
+    store = str(tmp_path / "store")
+    main(["build-model", "--data", crash_csv, "--store", store, "--grid"])
+    with patch('Route_Safety.train_model', side_effect=AssertionError("retrained")):
+        model = load_or_train_model(crash_csv, store_dir=store, compile_grid=True)
+    assert isinstance(model, GridLookupModel)
+    assert model.fallback is not None
@@ -0,0 +1,51 @@
+import pytest
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import prefetch_map
+from unittest.mock import patch
+
+def test_results_stay_in_order():
+    """Results come back in input order even when later items finish first"""
+    def slow_first(i):
+        time.sleep(0.05 if i == 0 else 0)
+        return i * i
+    assert list(prefetch_map(slow_first, range(10), width=4)) == [i * i for i in range(10)]
+
+def test_pipelining_overlaps_calls():
+    """Total time shrinks roughly by the pool width"""
+    def call(i):
+        time.sleep(0.05)
+        return i
+    t0 = time.perf_counter()
+    list(prefetch_map(call, range(12), width=4))
+    assert time.perf_counter() - t0 < 12 * 0.05 / 2
+
+def test_lookahead_is_bounded_and_cancelled_on_close():
+    """At most `width` items are started ahead; closing stops the rest"""
+    started = []
+    lock = threading.Lock()
+    def call(i):
+        with lock:
+            started.append(i)
+        time.sleep(0.01)
+        return i
+    stream = prefetch_map(call, range(100), width=3)
+    assert next(stream) == 0
+    stream.close()
+    time.sleep(0.05)
+    assert len(started) <= 4
+
+def test_stream_route_pipelined(client):
+    """/stream_route emits every update in order with the look-ahead pool"""
+    seq = [dict(latitude=30.0 + i / 100, longitude=-97.7) for i in range(6)]
+    def fake_update(lat, lng, prev_lat, prev_lng, model_name=None, in_hotspot=None, ahead_m=None):
+        time.sleep(0.02 * (6 - round((lat - 30.0) * 100)))   # later points finish sooner
+        return f"at {lat:.2f}"
+    with patch('app.generate_voice_update', side_effect=fake_update):
+        resp = client.post('/stream_route', json=dict(gps_sequence=seq, pipeline_width=4))
+        body = resp.get_data(as_text=True)
+    texts = [line for line in body.split("\n") if '"text"' in line]
+    assert [f"at {p['latitude']:.2f}" in t for p, t in zip(seq, texts)] == [True] * 6
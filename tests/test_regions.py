@@ -0,0 +1,163 @@
+import pytest
+import json
+import time
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+import pandas as pd
+import Route_Safety
+from Route_Safety import calculate_safety_scores
+from hotspot_index import HotspotTracker, M_PER_DEG
+from regions import RegionSet, ShardedModel, ShardedHotspotIndex, load_manifest
+from benchmarks.synthetic import make_crash_data
+
+AUSTIN = (30.27, -97.74)
+BOSTON = (42.36, -71.06)
+
+def _region(root, name, centre, seed):
+    """Crash CSV around `centre` plus one square hotspot on it (GeoJSON stores lat/lng)"""
+    os.makedirs(root / name)
+    data = make_crash_data(1_000, seed=seed, spread=0.05)
+    data['latitude'] += centre[0] - 30.2672
+    data['longitude'] += centre[1] + 97.7431
+    data.to_csv(root / name / "data.csv", index=False)
+    lat, lng = centre
+    ring = [[lat, lng], [lat + 0.005, lng], [lat + 0.005, lng + 0.005], [lat, lng + 0.005], [lat, lng]]
+    with open(root / name / "zones.geojson", "w") as f:
+        json.dump(dict(type="FeatureCollection", features=[
+            dict(type="Feature", properties={}, geometry=dict(type="Polygon", coordinates=[ring]))]), f)
+    return dict(name=name, bbox=[lng - 0.5, lat - 0.5, lng + 0.5, lat + 0.5],
+                data=f"{name}/data.csv", hotspots=f"{name}/zones.geojson")
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    """Two metros far apart, tiny forests"""
+    monkeypatch.setattr(Route_Safety, "MODEL_PARAMS", dict(n_estimators=5, random_state=0))
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(dict(regions=[_region(tmp_path, "austin", AUSTIN, 1),
+                                             _region(tmp_path, "boston", BOSTON, 2)])))
+    return str(path)
+
+@pytest.fixture
+def regions(manifest, tmp_path):
+    """RegionSet over the manifest, model artifacts in a scratch store"""
+    return RegionSet.from_manifest(manifest, store_dir=str(tmp_path / "store"))
+
+def _route(points):
+    steps = [dict(end_location=dict(lat=lat, lng=lng), duration=dict(value=60)) for lat, lng in points]
+    return dict(legs=[dict(steps=steps, duration=dict(value=60 * len(steps)))])
+
+def test_manifest_validation(tmp_path):
+    """Malformed entries fail with the region named"""
+    path = tmp_path / "m.json"
+    path.write_text(json.dumps(dict(regions=[dict(name="x", bbox=[1, 1, 0, 2], data="d", hotspots="h")])))
+    with pytest.raises(ValueError, match="x"):
+        load_manifest(str(path))
+
+def test_regions_load_on_first_use(regions):
+    """Nothing is loaded up front; a query loads only the region it touches"""
+    assert regions.loaded() == []
+    model = ShardedModel(regions)
+    model.predict([[AUSTIN[0] + 0.01, AUSTIN[1] + 0.01]])
+    assert regions.loaded() == ["austin"]
+    model.predict([[AUSTIN[0] + 0.02, AUSTIN[1]]])
+    assert regions.stats()["loads"] == 1
+
+def test_predict_matches_region_model(regions):
+    """Each point is answered by its own region's model; outside every region is NaN"""
+    pts = np.array([[AUSTIN[0] + 0.01, AUSTIN[1]], [BOSTON[0], BOSTON[1] + 0.01], [39.0, -90.0]])
+    preds = ShardedModel(regions).predict(pts)
+    austin = regions.shard(0).model.predict(pd.DataFrame(pts[:1], columns=["lat_bin", "lng_bin"]))
+    boston = regions.shard(1).model.predict(pd.DataFrame(pts[1:2], columns=["lat_bin", "lng_bin"]))
+    assert preds[0] == pytest.approx(austin[0]) and preds[1] == pytest.approx(boston[0])
+    assert np.isnan(preds[2])
+
+def test_eviction_under_budget(regions):
+    """With room for one region, the least recently used one is dropped"""
+    regions.budget = 1
+    regions.shard(0)
+    regions.shard(1)
+    assert regions.loaded() == ["boston"]
+    assert regions.evictions == 1
+
+def test_slow_load_blocks_only_its_region(regions, monkeypatch):
+    """While one region loads, loaded regions answer and the same region loads once"""
+    regions.shard(0)
+    release, calls = threading.Event(), []
+    real_load = regions._load
+
+    def slow_load(region):
+        calls.append(region.name)
+        release.wait(5)
+        return real_load(region)
+    monkeypatch.setattr(regions, "_load", slow_load)
+    waiters = [threading.Thread(target=regions.shard, args=(1,)) for _ in range(3)]
+    for t in waiters:
+        t.start()
+    t0 = time.monotonic()
+    assert regions.shard(0).model is not None
+    assert time.monotonic() - t0 < 1
+    release.set()
+    for t in waiters:
+        t.join()
+    assert calls == ["boston"] and regions.stats()["loads"] == 2
+
+def test_coast_to_coast_route(regions):
+    """A route crossing both regions and the gap between them scores, under any budget"""
+    regions.budget = 1
+    route = _route([AUSTIN, (35.0, -85.0), BOSTON])
+    (score, minutes), = calculate_safety_scores([route], ShardedModel(regions))
+    expected = ShardedModel(regions).predict([AUSTIN, BOSTON]).mean()
+    assert score == pytest.approx(min(max(10 - expected, 1), 10), abs=1e-3)
+    assert minutes == 3
+
+def test_sharded_hotspots(regions):
+    """Hotspot lookups go to the point's region; nothing is reported in between"""
+    index = ShardedHotspotIndex(regions)
+    lats = [AUSTIN[0] + 0.002, BOSTON[0] + 0.002, 35.0, AUSTIN[0] + 0.2]
+    lngs = [AUSTIN[1] + 0.002, BOSTON[1] + 0.002, -85.0, AUSTIN[1] + 0.2]
+    assert index.mask(lats, lngs).tolist() == [True, True, False, False]
+    assert index.contains(*BOSTON)
+    assert np.isinf(index.distances([35.0], [-85.0])[0])
+    assert [name for name, _ in index.shards((-98, 30, -97, 31))] == ["austin"]
+
+def test_hotspot_lookups_do_not_load_models(regions, monkeypatch):
+    """Viewport and hotspot queries read only the hotspot index; a viewport is capped by area in view"""
+    monkeypatch.setattr(regions, "_load", lambda region: pytest.fail(f"model loaded for {region.name}"))
+    index = ShardedHotspotIndex(regions)
+    whole = (-100, 25, -70.8, 45)                # all of Austin's bbox, part of Boston's
+    assert [name for name, _ in index.shards(whole, limit=1)] == ["austin"]
+    assert regions.loaded() == ["austin"]
+    assert index.contains(*BOSTON)
+    assert regions.loaded() == ["austin", "boston"]
+    monkeypatch.undo()
+    assert regions.shard(0).model is not None    # the model loads when a route needs it
+
+def test_sharded_index_has_no_polygon_list(manifest, tmp_path, monkeypatch):
+    """_HOTSPOT_POLYGONS fails with a clear message instead of a bare AttributeError under sharding"""
+    monkeypatch.setenv("MODEL_STORE", str(tmp_path / "store"))
+    monkeypatch.setenv("REGIONS_MANIFEST", manifest)
+    monkeypatch.setattr(Route_Safety, "_region_set", None)
+    monkeypatch.setattr(Route_Safety, "_hotspot_index", None)
+    with pytest.raises(AttributeError, match="shards"):
+        Route_Safety._HOTSPOT_POLYGONS
+
+def test_tracker_over_regions(regions):
+    """The per-stream tracker works unchanged on the sharded index"""
+    tracker = HotspotTracker(ShardedHotspotIndex(regions), lookahead_m=300, buffer_m=0)
+    step = 10 / (M_PER_DEG * np.cos(np.radians(BOSTON[0])))
+    states = [tracker.update(BOSTON[0] + 0.002, BOSTON[1] - (30 - i) * step) for i in range(35)]
+    assert states[10][1] == pytest.approx(200, abs=1)
+    assert states[-1][0] is True
+
+def test_app_serves_regions(manifest, tmp_path, monkeypatch):
+    """With REGIONS_MANIFEST set, hotspot features come from every region in view"""
+    monkeypatch.setenv("MODEL_STORE", str(tmp_path / "store"))
+    monkeypatch.setenv("REGIONS_MANIFEST", manifest)
+    monkeypatch.setattr(Route_Safety, "_region_set", None)
+    monkeypatch.setattr(Route_Safety, "_hotspot_index", None)
+    fc = json.loads(Route_Safety.hotspot_features((-100, 25, -70, 45), 12))
+    assert sorted(f["id"] for f in fc["features"]) == ["austin:0", "boston:0"]
+    assert Route_Safety.is_in_hotspot(AUSTIN[0] + 0.001, AUSTIN[1] + 0.001)
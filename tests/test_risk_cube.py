@@ -0,0 +1,134 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+import pandas as pd
+import Route_Safety
+from Route_Safety import apply_crash_feed, calculate_safety_score, load_or_train_model, model_key
+from grid_model import GridLookupModel
+from model_store import ModelStore
+from risk_cube import (RiskCube, aggregate_cube_cells, hour_of_week, parse_departure,
+                       TIMESTAMP, HOURS, PRIOR_CRASHES)
+from unittest.mock import patch
+
+CELL = (30.265, -97.745)             # inside cell (3026, -9775) at 0.01°
+FRIDAY_5PM = "2024-03-08 17:10"      # hour of week 4 * 24 + 17 = 113
+TUESDAY_3AM = "2024-03-05 03:10"     # 27
+
+class ConstantModel:
+    """Predicts the same severity everywhere"""
+    def __init__(self, value=2.0):
+        self.value = value
+    def predict(self, X):
+        return np.full(len(X), self.value)
+
+def _crashes(path, rows):
+    pd.DataFrame(rows, columns=['latitude', 'longitude', 'crash_sev_id', TIMESTAMP]).to_csv(path, index=False)
+    return str(path)
+
+@pytest.fixture
+def rush_hour_data(tmp_path):
+    """One cell whose crashes are severe on Friday evenings and mild on Tuesday nights"""
+    rows = ([[*CELL, 4, FRIDAY_5PM]] * 30 + [[*CELL, 1, TUESDAY_3AM]] * 30
+            + [[CELL[0] + 0.02, CELL[1], 2, "2024-03-06 12:00"]])
+    return _crashes(tmp_path / "crashes.csv", rows)
+
+def test_hour_of_week():
+    """Monday 00:00 is 0; offsets roll over the end of the week"""
+    assert hour_of_week("2024-03-04 00:30") == 0
+    assert hour_of_week(FRIDAY_5PM) == 113
+    assert hour_of_week("2024-03-10 23:30", [0, 3600]).tolist() == [167, 0]
+    # aware times are converted to Central: 23:10 UTC Friday is 17:10 CST
+    assert hour_of_week(pd.Timestamp("2024-03-08 23:10", tz="UTC")) == 113
+
+def test_parse_departure():
+    """ISO text, epoch seconds and 'now' are accepted; junk is a ValueError"""
+    assert parse_departure(None) is None
+    assert hour_of_week(parse_departure(FRIDAY_5PM)) == 113
+    assert hour_of_week(parse_departure(1709939400)) == 113     # 2024-03-08 23:10 UTC
+    assert parse_departure("now").tzinfo is not None
+    with pytest.raises(ValueError):
+        parse_departure("next tuesday-ish")
+
+def test_cube_follows_the_hour(rush_hour_data):
+    """The risky hour scores above the model's average, the quiet one below"""
+    cube = RiskCube.compile(ConstantModel(2.0), aggregate_cube_cells(rush_hour_data))
+    friday, tuesday, other = cube.predict_at([CELL] * 3, [113, 27, 60])
+    assert friday > 2.0 > tuesday
+    assert other == pytest.approx(2.0)            # no crashes that hour: the cell's average
+    mean = (30 * 4 + 30 * 1) / 60
+    assert friday == pytest.approx(2.0 * (30 * 4 + PRIOR_CRASHES * mean) / (30 + PRIOR_CRASHES) / mean)
+    assert cube.predict([CELL])[0] == pytest.approx(2.0)
+    assert cube.values.shape == (2, HOURS) and cube.values.dtype == np.float32
+
+def test_empty_cells_use_fallback(rush_hour_data):
+    """Cells without recorded crashes are answered by the fallback model"""
+    cube = RiskCube.compile(ConstantModel(2.0), aggregate_cube_cells(rush_hour_data))
+    cube.fallback = ConstantModel(7.0)
+    assert cube.predict_at([[CELL[0] + 0.01, CELL[1]], [40.0, -80.0]], 113).tolist() == [7.0, 7.0]
+    cube.fallback = None
+    assert np.isnan(cube.predict_at([[40.0, -80.0]], 113)[0])
+
+def test_departure_and_eta_pick_the_slice(rush_hour_data):
+    """Scoring uses the hour each step is reached: departure + summed step durations"""
+    cube = RiskCube.compile(ConstantModel(2.0), aggregate_cube_cells(rush_hour_data))
+    route = dict(legs=[dict(duration=dict(value=7200), steps=[
+        dict(end_location=dict(lat=CELL[0] + 0.03, lng=CELL[1]), duration=dict(value=3600)),
+        dict(end_location=dict(lat=CELL[0], lng=CELL[1]), duration=dict(value=3600)),
+    ])])
+    no_time = calculate_safety_score(route, cube)[0]
+    # leaving at 15:10 reaches the risky cell at 17:10
+    rush = calculate_safety_score(route, cube, departure="2024-03-08 15:10")[0]
+    night = calculate_safety_score(route, cube, departure="2024-03-05 01:10")[0]
+    assert rush < no_time < night
+    # a model without predict_at ignores the departure time
+    assert calculate_safety_score(route, ConstantModel(), departure=FRIDAY_5PM)[0] == 8.0
+
+def test_cube_artifact_roundtrip(rush_hour_data, tmp_path, monkeypatch):
+    """time_cube builds, stores and reloads the cube in front of the grid/forest"""
+    monkeypatch.setattr(Route_Safety, "MODEL_PARAMS", dict(n_estimators=5, random_state=0))
+    store = str(tmp_path / "store")
+    cube = load_or_train_model(rush_hour_data, store_dir=store, compile_grid=True, time_cube=True)
+    assert isinstance(cube, RiskCube) and isinstance(cube.fallback, GridLookupModel)
+    again = load_or_train_model(rush_hour_data, store_dir=store, compile_grid=True, time_cube=True)
+    assert np.array_equal(again.values, cube.values) and np.array_equal(again.rows, cube.rows)
+    assert again.predict_at([CELL], 113)[0] == cube.predict_at([CELL], 113)[0]
+
+def test_analyze_route_rejects_bad_departure(client):
+    """An unreadable departure_time is a 400, before any Directions call"""
+    resp = client.post('/analyze_route', json=dict(start="A", end="B", departure_time="soonish"))
+    assert resp.status_code == 400
+    assert "departure_time" in resp.get_json()["error"]
+
+def _feed(path, rows=30, severity=4):
+    """Crash feed of severe crashes in CELL (no timestamps needed)"""
+    pd.DataFrame([[*CELL, severity]] * rows, columns=['latitude', 'longitude', 'crash_sev_id']).to_csv(path, index=False)
+    return str(path)
+
+def test_feed_reaches_cube_in_every_worker(rush_hour_data, tmp_path, monkeypatch):
+    """After a crash feed the applying worker and a reloaded one give the same time-aware answer"""
+    monkeypatch.setattr(Route_Safety, "MODEL_PARAMS", dict(n_estimators=5, random_state=0))
+    store = str(tmp_path / "store")
+    served = load_or_train_model(rush_hour_data, store_dir=store, compile_grid=True, time_cube=True)
+    before = served.predict_at([CELL] * 2, [113, 27])
+    refreshed, n = apply_crash_feed(_feed(tmp_path / "feed.csv"), rush_hour_data, store_dir=store, model=served)
+    assert n == 1 and isinstance(refreshed, RiskCube)
+    reloaded = load_or_train_model(rush_hour_data, store_dir=store, compile_grid=True, time_cube=True)
+    after = refreshed.predict_at([CELL] * 2, [113, 27])
+    np.testing.assert_allclose(reloaded.predict_at([CELL] * 2, [113, 27]), after, rtol=1e-6)
+    assert not np.allclose(after, before)
+    assert after[0] > after[1]                       # the hourly profile survives the feed
+    assert refreshed.predict([CELL])[0] == pytest.approx(refreshed.fallback.predict([CELL])[0])
+
+def test_cube_added_to_fed_store_keeps_feeds(rush_hour_data, tmp_path, monkeypatch):
+    """Turning the cube on later builds it from the stored forest, keeping applied feeds"""
+    monkeypatch.setattr(Route_Safety, "MODEL_PARAMS", dict(n_estimators=5, random_state=0))
+    store = str(tmp_path / "store")
+    load_or_train_model(rush_hour_data, store_dir=store)
+    grid, _ = apply_crash_feed(_feed(tmp_path / "feed.csv"), rush_hour_data, store_dir=store)
+    with patch('Route_Safety.train_model', side_effect=AssertionError("retrained")):
+        cube = load_or_train_model(rush_hour_data, store_dir=store, time_cube=True)
+    key = model_key(rush_hour_data, store_dir=store)
+    assert len(ModelStore(store).load_cells(key)[1]) == 1
+    assert cube.predict([CELL])[0] == pytest.approx(grid.predict([CELL])[0], rel=1e-6)
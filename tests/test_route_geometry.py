@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from route_geometry import decode_polyline, haversine_m, route_path, resample_path
+from Route_Safety import calculate_safety_score, calculate_safety_scores
+from unittest.mock import MagicMock
+
+def _encode(points):
+    """Reference Google polyline encoder (for round-trip tests)"""
+    out, prev = [], (0, 0)
+    for lat, lng in points:
+        cur = (int(round(lat * 1e5)), int(round(lng * 1e5)))
+        for d in (cur[0] - prev[0], cur[1] - prev[1]):
+            v = ~(d << 1) if d < 0 else d << 1
+            while v >= 0x20:
+                out.append(chr((0x20 | (v & 0x1F)) + 63))
+                v >>= 5
+            out.append(chr(v + 63))
+        prev = cur
+    return "".join(out)
+
+@pytest.fixture
+def austin_houston_route():
+    """Two-step route with an overview polyline roughly following I-10 / SH-71"""
+    path = [(30.2672, -97.7431), (30.1, -97.3), (29.9, -96.6), (29.7604, -95.3698)]
+    return {
+        'overview_polyline': {'points': _encode(path)},
+        'legs': [{
+            'duration': {'value': 9000},
+            'steps': [
+                {'end_location': {'lat': 30.1, 'lng': -97.3}},
+                {'end_location': {'lat': 29.7604, 'lng': -95.3698}},
+            ]
+        }]
+    }
+
+def test_decode_polyline_reference():
+    """Decodes Google's documented example polyline"""
+    pts = decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+    np.testing.assert_allclose(pts, [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]])
+
+def test_decode_polyline_round_trip():
+    """Random paths survive encode → decode at 1e-5 precision"""
+    rng = np.random.default_rng(0)
+    path = np.column_stack((rng.uniform(-80, 80, 500), rng.uniform(-179, 179, 500))).round(5)
+    np.testing.assert_allclose(decode_polyline(_encode(path)), path, atol=1e-9)
+
+def test_resample_weights_cover_path(austin_houston_route):
+    """Samples are spaced evenly and weights sum to the path length"""
+    path = route_path(austin_houston_route)
+    samples, weights = resample_path(path, spacing_m=100)
+    length = haversine_m(path[:-1, 0], path[:-1, 1], path[1:, 0], path[1:, 1]).sum()
+    assert weights.sum() == pytest.approx(length)
+    assert len(samples) == int(np.ceil(length / 100))
+    assert np.all(weights[:-1] == 100)
+
+def test_polyline_mode_scores_every_sample(austin_houston_route):
+    """Polyline mode predicts once over all samples and keeps the duration"""
+    model = MagicMock()
+    model.predict.side_effect = lambda X: np.full(len(X), 2.0)
+    score, minutes = calculate_safety_score(austin_houston_route, model, mode="polyline", spacing_m=500)
+    assert score == 8.0 and minutes == 150
+    assert model.predict.call_count == 1
+    assert len(model.predict.call_args[0][0]) > 300
+
+def test_unknown_mode_rejected(austin_houston_route):
+    with pytest.raises(ValueError):
+        calculate_safety_scores([austin_houston_route], MagicMock(), mode="teleport")
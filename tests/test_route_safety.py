@@ -4,8 +4,8 @@ import pandas as pd
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from Route_Safety import load_crash_data, identify_crash_hotspots, train_model, calculate_safety_score, get_google_routes
-from unittest.mock import patch
+from Route_Safety import load_crash_data, identify_crash_hotspots, train_model, calculate_safety_score, calculate_safety_scores, get_google_routes
+from unittest.mock import patch, MagicMock
 
 @pytest.fixture
 def sample_crash_data():
@@ -86,26 +86,51 @@ def test_calculate_safety_score(sample_route):
         assert 1 <= score <= 10
         assert duration > 0
 
-def test_get_google_routes():
+def test_calculate_safety_scores_batches_all_routes(sample_crash_data, sample_route):
+    """Batched scoring uses one predict and matches per-route scoring"""
+    model = train_model(identify_crash_hotspots(sample_crash_data))
+    second = {
+        'legs': [{
+            'duration': {'value': 1200},
+            'steps': [
+                {'end_location': {'lat': 30.3072, 'lng': -97.7831}},
+                {'end_location': {'lat': 30.3572, 'lng': -97.8331}},
+            ]
+        }]
+    }
+    routes = [sample_route, second]
+    assert calculate_safety_scores(routes, model) == [calculate_safety_score(r, model) for r in routes]
+
+    spy = MagicMock(wraps=model)
+    calculate_safety_scores(routes, spy)
+    assert spy.predict.call_count == 1
+
+def test_get_google_routes(directions_server):
     """Test Google Maps API route fetching"""
-    with patch('requests.get') as mock_get:
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {
-            "routes": [{
-                "legs": [{
-                    "distance": {"text": "10 miles"},
-                    "duration": {"value": 600},
-                    "steps": [{"html_instructions": "Test step"}]
-                }]
-            }]
-        }
-        routes = get_google_routes("test_key", "Austin, TX", "Houston, TX")
-        assert isinstance(routes, list)
-        assert len(routes) == 1
+    routes = get_google_routes("test_key", "Austin, TX", "Houston, TX")
+    assert isinstance(routes, list)
+    assert len(routes) == 1
+    query = directions_server.requests[0]
+    assert query["origin"] == ["Austin, TX"] and query["key"] == ["test_key"]
 
-def test_get_google_routes_error():
+def test_get_google_routes_error(directions_server):
     """Test Google Maps API error handling"""
-    with patch('requests.get') as mock_get:
-        mock_get.return_value.status_code = 400
-        routes = get_google_routes("test_key", "Austin, TX", "Houston, TX")
-        assert routes == [] 
\ No newline at end of file
+    directions_server.status = "REQUEST_DENIED"
+    directions_server.http_status = 400
+    routes = get_google_routes("test_key", "Austin, TX", "Houston, TX")
+    assert routes == []
+
+def test_get_google_routes_cached(directions_server):
+    """Repeat lookups (after whitespace/case normalisation) hit the cache"""
+    first = get_google_routes("test_key", "Austin, TX", "Houston, TX")
+    again = get_google_routes("test_key", "  austin,  tx", "HOUSTON, TX ")
+    assert again == first
+    assert len(directions_server.requests) == 1
+
+def test_get_google_routes_errors_not_cached(directions_server):
+    """A failed lookup is retried on the next call"""
+    directions_server.status = "OVER_QUERY_LIMIT"
+    assert get_google_routes("test_key", "Austin, TX", "Houston, TX") == []
+    directions_server.status = "OK"
+    assert len(get_google_routes("test_key", "Austin, TX", "Houston, TX")) == 1
+    assert len(directions_server.requests) == 2 
\ No newline at end of file